@@ -1,18 +1,38 @@
+import time
+_INICIO_IMPORT = time.perf_counter()
+
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
 import sys
+import itertools
 import json
+import threading
 from datetime import datetime
+from functools import lru_cache
 
 # ✅ FIX: Agregar directorio raíz al path (compatible con Render)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.main import Lisabella
 from src.wrapper import Result
+from src.planner import format_part
+from src.plantilla_nota import RenderizadorNota
+from src.secciones import titulos_de
+from src import estaticos, lanes, ngramas, snapshot
+from src.lanes import CarrilSaturado
+from src.fair import ClienteExcedido, generacion, identificar_cliente
+from src.degradacion import NIVEL_RECORTE, ProveedorDegradado, degradacion
+from src.deepseek import ERRORES_STREAM, SENAL_TRUNCADA
+from src.almacen import almacen, clave_respuesta, token_respuesta
+from src.tokens import estimar_tokens
 
 # ✅ Flask configurado para servir HTML desde templates/
 app = Flask(__name__, static_folder='templates', static_url_path='')
+# Tamaño máximo del cuerpo de la petición (las historias muy largas se condensan
+# por map-reduce; más allá de este límite se responde 413)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 2 * 1024 * 1024))
 
 # CORS abierto
 CORS(app, resources={
@@ -23,13 +43,333 @@ CORS(app, resources={
     }
 })
 
-# Inicializar Lisabella
-try:
-    lisabella = Lisabella()
-    print(f"✅ [{datetime.now()}] Lisabella inicializada correctamente")
-except Exception as e:
-    print(f"❌ [{datetime.now()}] Error al inicializar Lisabella: {str(e)}")
-    lisabella = None
+# Preguntas máximas por petición a /classify_batch
+MAX_LOTE_CLASIFICACION = int(os.environ.get("MAX_LOTE_CLASIFICACION", "10000"))
+# Veredictos por turno del carril rápido: un lote grande no lo acapara
+TURNO_LOTE_CLASIFICACION = 512
+
+# Vista previa de /classify: entradas del cache y largo máximo cacheado (las
+# notas pegadas se clasifican sin cache)
+VISTA_PREVIA_CACHE = int(os.environ.get("VISTA_PREVIA_CACHE", "4096"))
+VISTA_PREVIA_MAX_CACHE_CHARS = 500
+
+# Segundos entre reintentos de inicialización si falló al arrancar
+REINTENTO_INIT_S = float(os.environ.get("REINTENTO_INIT_S", "10"))
+
+
+def _crear_lisabella():
+    """Inicializar Lisabella; None si falla (se reintenta en peticiones posteriores)"""
+    try:
+        instancia = Lisabella()
+        print(f"✅ [{datetime.now()}] Lisabella inicializada correctamente")
+        return instancia
+    except Exception as e:
+        print(f"❌ [{datetime.now()}] Error al inicializar Lisabella: {str(e)}")
+        return None
+
+
+# Inicializar Lisabella (barato: el SDK y el cliente del proveedor se crean en
+# la primera llamada; con preload se hace una vez en el maestro de gunicorn)
+lisabella = _crear_lisabella()
+_init_lock = threading.Lock()
+_ultimo_intento_init = time.monotonic()
+
+
+@app.before_request
+def reintentar_inicializacion():
+    """Un fallo al arrancar ya no deja el worker con lisabella = None para siempre"""
+    global lisabella, _ultimo_intento_init
+    if lisabella is not None or time.monotonic() - _ultimo_intento_init < REINTENTO_INIT_S:
+        return
+    with _init_lock:
+        if lisabella is None and time.monotonic() - _ultimo_intento_init >= REINTENTO_INIT_S:
+            _ultimo_intento_init = time.monotonic()
+            lisabella = _crear_lisabella()
+
+
+STREAM_SIGNALS = ("__STREAM_DONE__", "[STREAM_COMPLETE]")
+
+
+def frame_stream(tokens, start_index=0):
+    """
+    Agrupa tokens del proveedor en líneas NDJSON (chunk/done).
+    Separado de /ask_stream para poder medirlo sin llamar a la API.
+    El done lleva "cacheable": terminó con señal, sin error del proveedor ni
+    corte por max_tokens (el navegador sólo guarda esas respuestas).
+    """
+    buffer = ""
+    chunk_index = start_index
+    completa = True
+    previo = ""
+    
+    for token in tokens:
+        if token == SENAL_TRUNCADA:
+            completa = False
+            continue
+        
+        # ✅ DETECTAR SEÑALES DE FINALIZACIÓN (tanto texto como constante)
+        if token in STREAM_SIGNALS:
+            # El error del proveedor llega como último token antes de la señal:
+            # se mira una sola vez aquí y no en cada token
+            if previo.startswith(ERRORES_STREAM):
+                completa = False
+
+            # Enviar buffer final si hay algo
+            if buffer:
+                yield json.dumps({
+                    "type": "chunk",
+                    "index": chunk_index,
+                    "content": buffer
+                }) + '\n'
+            
+            # Enviar señal de done al frontend
+            yield json.dumps({"type": "done", "cacheable": completa}) + '\n'
+            print(f"✅ STREAM [{datetime.now()}] Completado correctamente")
+            return
+        
+        buffer += token
+        previo = token
+        
+        # Enviar chunks cuando tengamos contenido razonable
+        # (≥30 caracteres O puntos/saltos de línea)
+        if len(buffer) >= 30 or token in ['.', '!', '?', '\n\n']:
+            yield json.dumps({
+                "type": "chunk",
+                "index": chunk_index,
+                "content": buffer
+            }) + '\n'
+            chunk_index += 1
+            buffer = ""
+    
+    # Fallback: Si termina sin señal de done, enviar buffer y done
+    if buffer:
+        yield json.dumps({
+            "type": "chunk",
+            "index": chunk_index,
+            "content": buffer
+        }) + '\n'
+    
+    yield json.dumps({"type": "done", "cacheable": False}) + '\n'
+    print(f"⚠️ STREAM [{datetime.now()}] Completado sin señal explícita")
+
+
+def respuesta_local(question, classification, mode=None):
+    """
+    Respuesta completa que no requiere al proveedor (rechazo, reformulación,
+    dosis local, pregunta demasiado amplia), o None.
+    """
+    if classification["result"] in [Result.REJECTED, Result.REFORMULATE]:
+        return lisabella.ask(question, classification=classification)
+    domain = classification.get("domain", "medicina general")
+    special_cmd = classification.get("special_command")
+    if not classification.get("note_analysis") and lisabella.plan_expansion(question, domain, special_cmd, mode):
+        return None
+    return lisabella.check_dosis(question, classification) or lisabella.check_amplitude(question, classification)
+
+
+def costo_generacion(question):
+    """Costo en la cola justa: las entradas grandes cuentan más"""
+    return 1.0 + estimar_tokens(question) / 4000
+
+
+def respuesta_rechazo_carril(e, endpoint):
+    """429 si el cliente excede su parte, 503 si el carril está lleno o el proveedor saturado"""
+    excedido = isinstance(e, ClienteExcedido)
+    print(f"⏳ [{datetime.now()}] {endpoint}: {'cliente excede su parte' if excedido else f'carril {e.carril} saturado'}")
+    if excedido:
+        mensaje = "Tienes demasiadas consultas en curso o recientes."
+    elif isinstance(e, ProveedorDegradado):
+        mensaje = "El servicio de IA está respondiendo con errores de saturación; no se aceptan consultas nuevas por ahora."
+    else:
+        mensaje = "Hay demasiadas respuestas en curso."
+    return jsonify({
+        "status": "busy",
+        "retry_after": e.retry_after,
+        "response": f"⏳ **Sistema temporalmente saturado**\n\n{mensaje} "
+                    f"Intenta nuevamente en {e.retry_after} segundos."
+    }), 429 if excedido else 503, {"Retry-After": str(e.retry_after)}
+
+
+def respuesta_degradada(question, classification):
+    """
+    Con el proveedor saturado: respuesta casi idéntica reciente, None para
+    generar, o ProveedorDegradado (503 con ETA) antes de ocupar el carril.
+    """
+    return degradacion.admitir(question, classification.get("domain") or "medicina general",
+                               lisabella.special_command_for(classification))
+
+
+def token_cache(question, classification, mode=None):
+    """Token del cache del navegador para esta respuesta; None si no se cachea allí (notas)"""
+    if classification.get("note_analysis"):
+        return None
+    return token_respuesta(question, classification.get("domain") or "medicina general",
+                           lisabella.special_command_for(classification), mode)
+
+
+def respuesta_almacenada(question, classification, mode=None):
+    """Respuesta ya generada por cualquier worker para la misma pregunta, o None"""
+    special_cmd = lisabella.special_command_for(classification)
+    if special_cmd is not None:
+        return None
+    domain = classification.get("domain") or "medicina general"
+    respuesta = almacen.obtener(clave_respuesta(question, domain, special_cmd, mode))
+    if respuesta is None:
+        return None
+    return {
+        "status": "success",
+        "domain": domain,
+        "special_command": None,
+        "cached": True,
+        "cache_token": token_cache(question, classification, mode),
+        "response": respuesta
+    }
+
+
+def guardar_respuesta(question, domain, special_cmd, mode, respuesta):
+    """
+    Respuesta completa → cache de degradación (del worker) y almacén
+    compartido (del host). Al almacén sólo van preguntas sin comando, sin
+    errores del proveedor y generadas sin recorte de max_tokens (nivel de
+    degradación < recorte).
+    """
+    degradacion.guardar(question, domain, special_cmd, respuesta)
+    if degradacion.nivel >= NIVEL_RECORTE:
+        return
+    if special_cmd is None and respuesta and not respuesta.lstrip().startswith(("⚠️", "⏳")):
+        almacen.guardar(clave_respuesta(question, domain, special_cmd, mode), respuesta)
+
+
+def guardar_tokens(tokens, question, domain, special_cmd, mode=None):
+    """
+    Pasa los tokens del stream y guarda la respuesta completa (no si el
+    proveedor cortó con un mensaje de error o por max_tokens)
+    """
+    partes = []
+    truncada = False
+    for token in tokens:
+        if token == SENAL_TRUNCADA:
+            truncada = True
+        elif token not in STREAM_SIGNALS:
+            partes.append(token)
+        elif partes and not truncada and not partes[-1].lstrip().startswith(("⚠️", "⏳")):
+            guardar_respuesta(question, domain, special_cmd, mode, "".join(partes))
+            partes = []
+        yield token
+
+
+def stream_generacion(question, classification, mode=None):
+    """Pasos del stream que llaman al proveedor (carril de generación)"""
+    domain = classification.get("domain", "medicina general")
+    # Notas pegadas sin comando → valoracion, igual que /ask (habilita el map-reduce)
+    special_cmd = lisabella.special_command_for(classification)
+    # Con max_tokens recortado la respuesta puede quedar incompleta: el navegador no la guarda
+    cache_token = token_cache(question, classification, mode) if degradacion.nivel < NIVEL_RECORTE else None
+    
+    # 3. Modo expand: partes en paralelo bajo una sola respuesta
+    subquestions = None
+    if not classification.get("note_analysis"):
+        subquestions = lisabella.plan_expansion(question, domain, special_cmd, mode)
+    if subquestions:
+        yield json.dumps({
+            "type": "init",
+            "domain": domain,
+            "special_command": special_cmd,
+            "status": "approved",
+            "cache_token": cache_token,
+            "mode": "expand",
+            "parts": subquestions
+        }) + '\n'
+        completa = True
+        for part in lisabella.planner.execute(question, domain, subquestions):
+            completa = completa and part["ok"]
+            yield json.dumps({
+                "type": "chunk",
+                "index": part["index"],
+                "content": format_part(part) + "\n\n"
+            }) + '\n'
+        yield json.dumps({"type": "done", "cacheable": completa}) + '\n'
+        print(f"✅ STREAM [{datetime.now()}] Expansión completada ({len(subquestions)} partes)")
+        return
+    
+    # 4. Modo secciones: una sola llamada con manifiesto; cada sección
+    #    se envía como evento "section" en cuanto termina
+    if lisabella.uses_sections(special_cmd, mode):
+        yield json.dumps({
+            "type": "init",
+            "domain": domain,
+            "special_command": special_cmd,
+            "status": "approved",
+            "cache_token": cache_token,
+            "mode": "secciones",
+            "sections": titulos_de(special_cmd)
+        }) + '\n'
+        estado = {}
+        for section in lisabella.generate_sections(question, domain, special_cmd, estado):
+            yield json.dumps({"type": "section", **section}) + '\n'
+        yield json.dumps({
+            "type": "done",
+            "cacheable": estado["completa"],
+            "input_tokens": lisabella.section_savings(question, domain, special_cmd)
+        }) + '\n'
+        print(f"✅ STREAM [{datetime.now()}] Secciones completadas")
+        return
+    
+    # 5. Aprobada → enviar metadata
+    yield json.dumps({
+        "type": "init",
+        "domain": domain,
+        "special_command": special_cmd,
+        "status": "approved",
+        "cache_token": cache_token
+    }) + '\n'
+    
+    # 6. Revisión de nota: componentes calculados localmente de inmediato,
+    #    el proveedor sólo recibe el resumen compacto
+    revision = lisabella.review_note_locally(question, special_cmd)
+    if revision:
+        yield json.dumps({
+            "type": "chunk",
+            "index": 0,
+            "content": revision["componentes"] + "\n\n"
+        }) + '\n'
+        yield from frame_stream(
+            lisabella.mistral.generate_stream(revision["prompt"], domain, "revision_nota_juicio"),
+            start_index=1
+        )
+        return
+    
+    # 7. Corrección por ediciones: el script es corto, se espera completo,
+    #    se valida y se envía la corrección renderizada; si no es
+    #    válido se sigue con la reescritura completa en streaming
+    correccion = lisabella.correct_note_with_edits(question, domain, special_cmd)
+    if correccion:
+        yield json.dumps({"type": "chunk", "index": 0, "content": correccion["response"]}) + '\n'
+        yield json.dumps({"type": "done"}) + '\n'
+        print(f"✅ STREAM [{datetime.now()}] Corrección por ediciones completada")
+        return
+    
+    # 8. Elaboración por campos: cada bloque de la plantilla se envía
+    #    en cuanto el modelo entrega sus campos
+    if lisabella.uses_field_template(special_cmd):
+        tokens = lisabella.mistral.generate_stream(question, domain, "elaboracion_nota_campos")
+        for index, bloque in enumerate(RenderizadorNota().stream(tokens)):
+            yield json.dumps({"type": "chunk", "index": index, "content": bloque}) + '\n'
+        yield json.dumps({"type": "done"}) + '\n'
+        print(f"✅ STREAM [{datetime.now()}] Nota por campos completada")
+        return
+    
+    # 9. Notas largas: map en paralelo, el comando final corre sobre la
+    #    versión condensada (reduce)
+    entrada = question
+    condensada = lisabella.condense_long_note(question, domain, special_cmd)
+    if condensada:
+        yield json.dumps({"type": "mapreduce", "etapas": condensada["etapas"]}) + '\n'
+        entrada = condensada["condensada"]
+    
+    # 10. 🚀 STREAMING REAL: Tokens conforme llegan de Mistral
+    tokens = lisabella.mistral.generate_stream(entrada, domain, special_cmd)
+    yield from frame_stream(guardar_tokens(tokens, question, domain, special_cmd, mode))
 
 
 @app.route('/ask', methods=['POST', 'OPTIONS'])
@@ -55,9 +395,23 @@ def ask():
             }), 400
         
         print(f"📥 [{datetime.now()}] /ask: {question[:50]}...")
-        result = lisabella.ask(question)
+        mode = data.get('mode')
+        with lanes.rapido.turno():
+            classification = lisabella.wrapper.classify(question)
+            result = respuesta_local(question, classification, mode)
+            if not result:
+                result = respuesta_almacenada(question, classification, mode) or respuesta_degradada(question, classification)
+        if not result:
+            with generacion.turno(*identificar_cliente(request), costo=costo_generacion(question)):
+                result = lisabella.ask(question, mode=mode, classification=classification, local_checked=True)
+            if result.get("status") == "success" and result.get("mode") != "expand":
+                guardar_respuesta(question, result.get("domain"), result.get("special_command"), mode, result["response"])
         return jsonify(result)
     
+    except CarrilSaturado as e:
+        return respuesta_rechazo_carril(e, "/ask")
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         print(f"❌ [{datetime.now()}] Error en /ask: {str(e)}")
         return jsonify({
@@ -81,83 +435,35 @@ def ask_stream():
     try:
         data = request.get_json()
         question = data.get('question', '')
+        mode = data.get('mode')
         
         if not question:
             return jsonify({"status": "error", "response": "Pregunta vacía"}), 400
         
         print(f"📥 STREAM [{datetime.now()}] Procesando: {question[:50]}...")
         
+        # 1-2. Clasificar; rechazo, reformulación, dosis local o amplitud se
+        #      responden completos en el carril rápido
+        with lanes.rapido.turno():
+            classification = lisabella.wrapper.classify(question)
+            response_obj = respuesta_local(question, classification, mode)
+            if not response_obj:
+                response_obj = (respuesta_almacenada(question, classification, mode)
+                                or respuesta_degradada(question, classification))
+        if response_obj:
+            return Response(
+                json.dumps({"type": "complete", "data": response_obj}) + '\n',
+                mimetype='application/x-ndjson'
+            )
+        
+        # 3+. Todo lo que llama al proveedor espera su turno justo en el carril de
+        #     generación y lo conserva hasta que el stream se cierra
+        turno = generacion.entrar(*identificar_cliente(request), costo=costo_generacion(question))
+        
         def generate():
             """Generator con streaming REAL de Mistral (16000 tokens)"""
             try:
-                # 1. Clasificar pregunta (rápido, <1s)
-                classification = lisabella.wrapper.classify(question)
-                result = classification["result"]
-                
-                # 2. Si rechazada/reformular → enviar completo
-                if result in [Result.REJECTED, Result.REFORMULATE]:
-                    response_obj = lisabella.ask(question)
-                    yield json.dumps({"type": "complete", "data": response_obj}) + '\n'
-                    return
-                
-                # 3. Aprobada → enviar metadata
-                domain = classification.get("domain", "medicina general")
-                special_cmd = classification.get("special_command")
-                
-                yield json.dumps({
-                    "type": "init",
-                    "domain": domain,
-                    "special_command": special_cmd,
-                    "status": "approved"
-                }) + '\n'
-                
-                # 4. 🚀 STREAMING REAL: Tokens conforme llegan de Mistral
-                buffer = ""
-                chunk_index = 0
-                stream_done = False
-                
-                for token in lisabella.mistral.generate_stream(question, domain, special_cmd):
-                    # ✅ DETECTAR SEÑALES DE FINALIZACIÓN (tanto texto como constante)
-                    if token in ["__STREAM_DONE__", "[STREAM_COMPLETE]"]:
-                        # Enviar buffer final si hay algo
-                        if buffer:
-                            yield json.dumps({
-                                "type": "chunk",
-                                "index": chunk_index,
-                                "content": buffer
-                            }) + '\n'
-                        
-                        # Enviar señal de done al frontend
-                        yield json.dumps({"type": "done"}) + '\n'
-                        print(f"✅ STREAM [{datetime.now()}] Completado correctamente")
-                        stream_done = True
-                        return
-                    
-                    buffer += token
-                    
-                    # Enviar chunks cuando tengamos contenido razonable
-                    # (≥150 caracteres O puntos/saltos de línea)
-                    if len(buffer) >= 30 or token in ['.', '!', '?', '\n\n']:
-                        yield json.dumps({
-                            "type": "chunk",
-                            "index": chunk_index,
-                            "content": buffer
-                        }) + '\n'
-                        chunk_index += 1
-                        buffer = ""
-                
-                # Fallback: Si termina sin señal de done, enviar buffer y done
-                if not stream_done:
-                    if buffer:
-                        yield json.dumps({
-                            "type": "chunk",
-                            "index": chunk_index,
-                            "content": buffer
-                        }) + '\n'
-                    
-                    yield json.dumps({"type": "done"}) + '\n'
-                    print(f"⚠️ STREAM [{datetime.now()}] Completado sin señal explícita")
-                
+                yield from stream_generacion(question, classification, mode)
             except Exception as e:
                 print(f"❌ Error en stream: {str(e)}")
                 yield json.dumps({
@@ -165,7 +471,7 @@ def ask_stream():
                     "message": f"Error del sistema: {str(e)[:150]}"
                 }) + '\n'
         
-        return Response(
+        response = Response(
             generate(),
             mimetype='application/x-ndjson',
             headers={
@@ -173,7 +479,13 @@ def ask_stream():
                 'X-Accel-Buffering': 'no'
             }
         )
+        response.call_on_close(lambda: generacion.liberar(turno))
+        return response
         
+    except CarrilSaturado as e:
+        return respuesta_rechazo_carril(e, "/ask_stream")
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         print(f"❌ [{datetime.now()}] Error crítico en /ask_stream: {str(e)}")
         return jsonify({
@@ -182,23 +494,212 @@ def ask_stream():
         }), 500
 
 
+def leer_lote(req):
+    """
+    Preguntas de un arreglo JSON o de NDJSON (una por línea). Cada elemento
+    es el texto o un objeto {"question": ...}; ValueError si no es válido.
+    """
+    cuerpo = req.get_data(as_text=True).strip()
+    if cuerpo.startswith("["):
+        elementos = json.loads(cuerpo)
+    else:
+        elementos = [json.loads(linea) for linea in cuerpo.splitlines() if linea.strip()]
+    preguntas = []
+    for elemento in elementos:
+        if isinstance(elemento, dict):
+            elemento = elemento.get("question")
+        if not isinstance(elemento, str):
+            raise ValueError(f"el elemento {len(preguntas)} no es una pregunta de texto")
+        preguntas.append(elemento)
+    return preguntas
+
+
+def veredicto(indice, classification):
+    """Línea NDJSON de /classify_batch"""
+    return json.dumps({
+        "type": "verdict",
+        "index": indice,
+        "result": classification["result"].value,
+        "domain": classification.get("domain"),
+        "confidence": classification.get("confidence"),
+        "special_command": lisabella.special_command_for(classification),
+        "reason": classification.get("reason")
+    }, ensure_ascii=False) + '\n'
+
+
+@app.route('/classify_batch', methods=['POST', 'OPTIONS'])
+def classify_batch():
+    """Veredictos del Wrapper para un banco de preguntas, en orden y por streaming (NDJSON)"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    if not lisabella:
+        return jsonify({
+            "status": "error",
+            "response": "Sistema no inicializado"
+        }), 500
+    
+    try:
+        preguntas = leer_lote(request)
+    except ValueError as e:
+        return jsonify({"status": "error", "response": f"Lote inválido: {e}"}), 400
+    if not preguntas:
+        return jsonify({"status": "error", "response": "Lote vacío"}), 400
+    if len(preguntas) > MAX_LOTE_CLASIFICACION:
+        return jsonify({
+            "status": "error",
+            "response": f"El lote excede {MAX_LOTE_CLASIFICACION} preguntas; divídelo en varias peticiones."
+        }), 413
+    
+    print(f"📥 [{datetime.now()}] /classify_batch: {len(preguntas)} preguntas")
+    wrapper = lisabella.wrapper
+    
+    def generate():
+        veredictos = wrapper.classify_many(preguntas)
+        for inicio in range(0, len(preguntas), TURNO_LOTE_CLASIFICACION):
+            try:
+                with lanes.rapido.turno():
+                    tramo = itertools.islice(veredictos, TURNO_LOTE_CLASIFICACION)
+                    lineas = "".join(veredicto(inicio + i, c) for i, c in enumerate(tramo))
+            except CarrilSaturado as e:
+                print(f"⏳ [{datetime.now()}] /classify_batch: carril {e.carril} saturado en {inicio}")
+                yield json.dumps({
+                    "type": "error",
+                    "index": inicio,
+                    "retry_after": e.retry_after,
+                    "message": f"Sistema saturado; reenviar desde la pregunta {inicio} en {e.retry_after} s"
+                }) + '\n'
+                return
+            yield lineas
+        yield json.dumps({"type": "done", "total": len(preguntas)}) + '\n'
+    
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+
+def vista_previa(question, mode=None):
+    """
+    Veredicto, dominio, sugerencia (reformulación o amplitud) y token del
+    cache del navegador como JSON, sin proveedor
+    """
+    classification = lisabella.wrapper.classify(question, shadow=False)
+    reason, suggestion = classification.get("reason"), classification.get("suggestion")
+    cache_token = None
+    if classification["result"] == Result.APPROVED:
+        amplitud = lisabella.amplitud.sugerencia(question, classification)
+        if amplitud:
+            reason, suggestion = "amplitud", amplitud
+        else:
+            cache_token = token_cache(question, classification, mode)
+    return json.dumps({
+        "result": classification["result"].value,
+        "domain": classification.get("domain"),
+        "confidence": classification.get("confidence"),
+        "special_command": lisabella.special_command_for(classification),
+        "reason": reason,
+        "suggestion": suggestion,
+        "cache_token": cache_token
+    }, ensure_ascii=False)
+
+
+@lru_cache(maxsize=VISTA_PREVIA_CACHE)
+def vista_previa_cacheada(question, mode, diccionarios):
+    """`diccionarios` (versión del snapshot) invalida el cache tras una recarga en caliente"""
+    return vista_previa(question, mode)
+
+
+@app.route('/classify', methods=['GET', 'POST', 'OPTIONS'])
+def classify_preview():
+    """Vista previa del veredicto mientras se escribe (GET ?q= o POST {"question"})"""
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    if not lisabella:
+        return jsonify({
+            "status": "error",
+            "response": "Sistema no inicializado"
+        }), 500
+    
+    if request.method == 'GET':
+        question, mode = request.args.get('q', ''), request.args.get('mode')
+    else:
+        data = request.get_json(silent=True) or {}
+        question, mode = data.get('question', ''), data.get('mode')
+    if not isinstance(question, str) or not question.strip():
+        return jsonify({"status": "error", "response": "Pregunta vacía"}), 400
+    if mode is not None and not isinstance(mode, str):
+        return jsonify({"status": "error", "response": "mode inválido"}), 400
+    
+    try:
+        with lanes.rapido.turno():
+            inicio = time.perf_counter()
+            if len(question) <= VISTA_PREVIA_MAX_CACHE_CHARS:
+                cuerpo = vista_previa_cacheada(question, mode, snapshot.actual()["diccionarios"])
+            else:
+                cuerpo = vista_previa(question, mode)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+    except CarrilSaturado as e:
+        return respuesta_rechazo_carril(e, "/classify")
+    
+    return Response(cuerpo, mimetype='application/json', headers={
+        'Server-Timing': f'clasificar;dur={duracion_ms:.3f}',
+        'Cache-Control': 'private, max-age=60' if request.method == 'GET' else 'no-store'
+    })
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Cuerpo mayor a MAX_REQUEST_BYTES"""
+    limite = app.config['MAX_CONTENT_LENGTH']
+    print(f"⚠️ [{datetime.now()}] Petición rechazada por tamaño (límite {limite} bytes)")
+    return jsonify({
+        "status": "error",
+        "response": f"La petición excede el tamaño máximo permitido ({limite / 1024:.0f} KB). "
+                    "Envía sólo la parte relevante de la historia clínica."
+    }), 413
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check"""
-    status = "ok" if lisabella else "error"
-    return jsonify({
-        "status": status,
-        "message": "Lisabella funcionando" if lisabella else "Sistema no inicializado",
-        "version": "1.0-streaming-16k",  # ✅ ACTUALIZADO de 8k a 16k
-        "timestamp": str(datetime.now())
-    }), 200 if lisabella else 500
+    try:
+        with lanes.rapido.turno():
+            status = "ok" if lisabella else "error"
+            return jsonify({
+                "status": status,
+                "message": "Lisabella funcionando" if lisabella else "Sistema no inicializado",
+                "version": "1.0-streaming-16k",  # ✅ ACTUALIZADO de 8k a 16k
+                "amplitud": lisabella.amplitud.get_stats() if lisabella else None,
+                "dosis": lisabella.dosis.get_stats() if lisabella else None,
+                "lanes": {"rapido": lanes.rapido.get_stats(), "generacion": generacion.get_stats()},
+                "degradacion": degradacion.get_stats(),
+                "almacen": almacen.get_stats(),
+                "diccionarios": snapshot.get_stats(),
+                "ngramas": ngramas.sombra.get_stats(),
+                "arranque": {"import_ms": IMPORT_MS, "pid": os.getpid()},
+                "timestamp": str(datetime.now())
+            }), 200 if lisabella else 500
+    except CarrilSaturado as e:
+        # Sin turno sólo se informa el estado de los carriles (sin tocar el resto)
+        return jsonify({
+            "status": "busy",
+            "retry_after": e.retry_after,
+            "lanes": {"rapido": lanes.rapido.get_stats(), "generacion": generacion.get_stats()},
+            "timestamp": str(datetime.now())
+        }), 503, {"Retry-After": str(e.retry_after)}
 
 
 @app.route('/', methods=['GET'])
 def home():
-    """Servir HTML"""
+    """Servir HTML (minificado y precomprimido, ver src/estaticos.py)"""
     try:
-        return app.send_static_file('lisabella.html')
+        with lanes.rapido.turno():
+            return estaticos.respuesta(request)
+    except CarrilSaturado as e:
+        return respuesta_rechazo_carril(e, "/")
     except Exception as e:
         return jsonify({
             "error": "Frontend no encontrado",
@@ -206,11 +707,23 @@ def home():
             "endpoints": {
                 "/ask": "POST - Consultar (legacy)",
                 "/ask_stream": "POST - Consultar con streaming 16000 tokens",
+                "/classify": "GET/POST - Vista previa del veredicto (sin proveedor)",
+                "/classify_batch": "POST - Clasificar un lote de preguntas (JSON o NDJSON)",
                 "/health": "GET - Estado"
             }
         }), 404
 
 
+# Variantes del frontend en memoria (con preload, una vez en el maestro)
+estaticos.precargar()
+
+# Tiempo de importación de la app (dependencias, diccionarios, inicialización)
+IMPORT_MS = round((time.perf_counter() - _INICIO_IMPORT) * 1000, 1)
+print(f"⏱️ App importada en {IMPORT_MS} ms")
+
+
 if __name__ == '__main__':
+    snapshot.vigilar()
+    snapshot.instalar_senal()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,121 @@
+"""
+Tasa de aciertos: cache por worker vs almacén compartido
+========================================================
+
+Simula el tráfico de preguntas (popularidad Zipf) repartido al azar entre
+N procesos, como hace gunicorn con sus workers. Cada fallo cuenta como una
+llamada al proveedor y guarda la respuesta. Compara:
+
+- cache privada LRU por proceso (lo que tendría un cache en memoria de
+  Lisabella), con la misma memoria total que el almacén repartida entre los
+  N procesos, y con el presupuesto completo en cada uno (N× memoria)
+- almacén compartido (src/almacen.py) sobre un archivo temporal
+- almacén compartido tras un "reinicio": procesos nuevos, mismo archivo
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.almacen
+    python -m benchmarks.almacen --workers 1,2,4,8 --peticiones 40000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.almacen import AlmacenCompartido
+
+RESPUESTA = ("La metformina disminuye la producción hepática de glucosa y aumenta la "
+             "sensibilidad periférica a la insulina. ") * 25
+
+
+def _trafico(preguntas, peticiones, workers, semilla):
+    """Peticiones Zipf(1) repartidas al azar: lista de listas por worker"""
+    rng = random.Random(semilla)
+    pesos = [1 / (i + 1) for i in range(preguntas)]
+    secuencia = rng.choices(range(preguntas), weights=pesos, k=peticiones)
+    reparto = [[] for _ in range(workers)]
+    for pregunta in secuencia:
+        reparto[rng.randrange(workers)].append(pregunta)
+    return reparto
+
+
+def _worker_privado(claves, capacidad, resultados):
+    cache = OrderedDict()
+    aciertos = 0
+    for clave in claves:
+        if clave in cache:
+            cache.move_to_end(clave)
+            aciertos += 1
+            continue
+        cache[clave] = RESPUESTA
+        if len(cache) > capacidad:
+            cache.popitem(last=False)
+    resultados.put((aciertos, len(claves), 0.0))
+
+
+def _worker_compartido(claves, path, mb, resultados):
+    almacen = AlmacenCompartido(path=path, mb=mb, activo=True)
+    aciertos = 0
+    lectura = 0.0
+    for clave in claves:
+        inicio = time.perf_counter()
+        valor = almacen.obtener(f"pregunta {clave}")
+        lectura += time.perf_counter() - inicio
+        if valor is not None:
+            aciertos += 1
+        else:
+            almacen.guardar(f"pregunta {clave}", RESPUESTA)
+    resultados.put((aciertos, len(claves), lectura))
+
+
+def _correr(objetivo, reparto, *args):
+    """(tasa de aciertos, µs por lectura) sumando todos los procesos"""
+    contexto = multiprocessing.get_context("fork")
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=objetivo, args=(claves, *args, resultados)) for claves in reparto]
+    for p in procesos:
+        p.start()
+    totales = [resultados.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    aciertos = sum(t[0] for t in totales)
+    peticiones = sum(t[1] for t in totales)
+    return aciertos / peticiones, sum(t[2] for t in totales) / peticiones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tasa de aciertos con 1 vs N workers")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--preguntas", type=int, default=5000, help="preguntas distintas")
+    parser.add_argument("--peticiones", type=int, default=20000)
+    parser.add_argument("--mb", type=float, default=8, help="presupuesto del almacén")
+    args = parser.parse_args()
+
+    geometria = AlmacenCompartido(mb=args.mb)
+    capacidad = geometria.conjuntos * geometria.vias
+    print(f"🗄️ {args.preguntas} preguntas distintas, {args.peticiones} peticiones Zipf, "
+          f"{args.mb:g} MB = {capacidad} ranuras")
+    print(f"  {'workers':>7} {'privada':>9} {'privada N×':>11} {'compartido':>11} {'tras reinicio':>14} {'lectura':>10}")
+    for workers in (int(x) for x in args.workers.split(",")):
+        reparto = _trafico(args.preguntas, args.peticiones, workers, semilla=42)
+        privada, _ = _correr(_worker_privado, reparto, capacidad // workers)
+        privada_n, _ = _correr(_worker_privado, reparto, capacidad)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "almacen.bin")
+            compartido, lectura = _correr(_worker_compartido, reparto, path, args.mb)
+            reinicio, _ = _correr(_worker_compartido, _trafico(args.preguntas, args.peticiones, workers, semilla=7),
+                                  path, args.mb)
+        print(f"  {workers:>7} {privada:>8.1%} {privada_n:>10.1%} {compartido:>10.1%} {reinicio:>13.1%} "
+              f"{lectura:>8.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
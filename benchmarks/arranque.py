@@ -0,0 +1,124 @@
+"""
+Arranque en frío: importación por módulo y boot-to-ready
+========================================================
+
+1. `python -X importtime -c "import app"` en un intérprete nuevo: los
+   módulos con mayor tiempo acumulado de importación.
+2. Tiempo de `import app` con el snapshot de diccionarios en disco y sin él.
+3. Boot-to-ready de gunicorn (desde lanzar el proceso hasta el primer 200 de
+   /health) con gunicorn.conf.py, con y sin preload.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.arranque
+    python -m benchmarks.arranque --top 25 --repeticiones 5
+"""
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.snapshot import SNAPSHOT_PATH
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _entorno(**extra):
+    entorno = dict(os.environ, DEEPSEEK_API_KEY=os.environ.get("DEEPSEEK_API_KEY", "benchmark-sin-red"))
+    entorno.update(extra)
+    return entorno
+
+
+def _importtime():
+    """[(acumulado_us, propio_us, modulo)] de los módulos de primer nivel importados por app"""
+    salida = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT_DIR,
+                            env=_entorno(), capture_output=True, text=True).stderr
+    modulos = []
+    for linea in salida.splitlines():
+        match = IMPORTTIME_RE.match(linea)
+        if match:
+            propio, acumulado, sangria, modulo = match.groups()
+            modulos.append((int(acumulado), int(propio), len(sangria), modulo))
+    return modulos
+
+
+def _tiempo_import(sin_snapshot):
+    """Segundos de `import app` en un intérprete nuevo"""
+    if sin_snapshot and os.path.exists(SNAPSHOT_PATH):
+        os.remove(SNAPSHOT_PATH)
+    codigo = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=ROOT_DIR, env=_entorno(),
+                            capture_output=True, text=True).stdout
+    return float(salida.strip().splitlines()[-1])
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _boot_to_ready(preload):
+    """Segundos hasta el primer 200 de /health"""
+    puerto = _puerto_libre()
+    comando = [sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn.conf.py",
+               "--bind", f"127.0.0.1:{puerto}", "--log-level", "warning"]
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(comando, cwd=ROOT_DIR, env=_entorno(GUNICORN_PRELOAD="1" if preload else "0"),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - inicio < 30:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{puerto}/health", timeout=1).read()
+                return time.perf_counter() - inicio
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.01)
+        return float("nan")
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque en frío de la app")
+    parser.add_argument("--top", type=int, default=15, help="módulos a mostrar")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    modulos = _importtime()
+    total = next((acumulado for acumulado, _, _, modulo in modulos if modulo == "app"), 0)
+    print(f"📦 import app: {total / 1000:.0f} ms (-X importtime)")
+    print(f"  {'acumulado':>10} {'propio':>9}  módulo")
+    for acumulado, propio, _, modulo in sorted(modulos, reverse=True)[1:args.top + 1]:
+        print(f"  {acumulado / 1000:>8.1f}ms {propio / 1000:>7.1f}ms  {modulo}")
+
+    print(f"\n⏱️ import app (mediana de {args.repeticiones})")
+    sin = statistics.median(_tiempo_import(sin_snapshot=True) for _ in range(args.repeticiones))
+    _tiempo_import(sin_snapshot=True)
+    con = statistics.median(_tiempo_import(sin_snapshot=False) for _ in range(args.repeticiones))
+    print(f"  compilando diccionarios desde JSON: {sin * 1000:>7.1f} ms")
+    print(f"  desde snapshot:                     {con * 1000:>7.1f} ms")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("\n⚠️ gunicorn no instalado: se omite boot-to-ready")
+        return
+    print(f"\n🚀 gunicorn boot-to-ready (mediana de {args.repeticiones})")
+    for preload in (True, False):
+        tiempo = statistics.median(_boot_to_ready(preload) for _ in range(args.repeticiones))
+        print(f"  preload={'sí' if preload else 'no':<3} {tiempo * 1000:>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Clasificación por lotes: /classify_batch contra una petición por pregunta
+=========================================================================
+
+Sobre N preguntas del corpus sintético (10 000 por defecto; los bancos de
+preguntas repiten enunciados, el corpus también):
+
+- `Wrapper.classify` pregunta por pregunta contra `Wrapper.classify_many`
+  (mismos veredictos, sombra de n-gramas por tramo)
+- /classify_batch con el lote completo (arreglo JSON y NDJSON) contra una
+  petición HTTP por pregunta, con el cliente de pruebas de Flask (sin red:
+  la diferencia real es mayor)
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.clasificacion_lote
+    python -m benchmarks.clasificacion_lote -n 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def _medir(nombre, n, funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre:<34} {segundos * 1000:>8.0f} ms  {n / segundos:>10,.0f} preguntas/s")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clasificación por lotes contra una petición por pregunta")
+    parser.add_argument("-n", type=int, default=10000, help="preguntas del lote")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-sin-red")
+    import app as aplicacion
+    from benchmarks.corpus import generar_preguntas_cortas, generar_preguntas_dos_palabras
+
+    preguntas = (generar_preguntas_cortas(args.n) + generar_preguntas_dos_palabras(args.n))[:args.n]
+    wrapper = aplicacion.lisabella.wrapper
+    cliente = aplicacion.app.test_client()
+    wrapper.classify(preguntas[0])
+    print(f"📋 {len(preguntas)} preguntas ({len(set(preguntas))} distintas)\n")
+
+    uno_a_uno = _medir("Wrapper.classify (una a una)", len(preguntas),
+                       lambda: [wrapper.classify(p) for p in preguntas])
+    lote = _medir("Wrapper.classify_many", len(preguntas), lambda: list(wrapper.classify_many(preguntas)))
+    assert lote == uno_a_uno, "classify_many no coincide con classify"
+
+    def post(cuerpo, tipo):
+        respuesta = cliente.post("/classify_batch", data=cuerpo, content_type=tipo)
+        return [json.loads(linea) for linea in respuesta.get_data(as_text=True).splitlines()]
+
+    arreglo = json.dumps(preguntas, ensure_ascii=False)
+    ndjson = "".join(json.dumps({"question": p}, ensure_ascii=False) + "\n" for p in preguntas)
+    lineas = _medir("/classify_batch (arreglo JSON)", len(preguntas), lambda: post(arreglo, "application/json"))
+    _medir("/classify_batch (NDJSON)", len(preguntas), lambda: post(ndjson, "application/x-ndjson"))
+    assert [l["result"] for l in lineas[:-1]] == [r["result"].value for r in lote]
+    _medir("una petición por pregunta", len(preguntas),
+           lambda: [post(json.dumps([p]), "application/json") for p in preguntas])
+
+
+if __name__ == "__main__":
+    main()
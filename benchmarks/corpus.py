@@ -0,0 +1,184 @@
+"""
+Corpus sintético para benchmarks
+================================
+
+Genera de forma determinista (semilla fija) preguntas cortas, preguntas
+de 2 palabras y notas médicas de ~5 KB parecidas a las que pegan los
+usuarios, usando los mismos diccionarios que consume el Wrapper.
+"""
+
+import json
+import os
+import random
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEMILLA = 2025
+
+PLANTILLAS_CORTAS = [
+    "¿Cuál es el mecanismo de acción del {farmaco}?",
+    "¿Dónde se ubica la {region}?",
+    "Describe la irrigación arterial del {region}",
+    "¿Cuáles son los síntomas de {kw}?",
+    "Explica la fisiopatología de {kw} y su tratamiento",
+    "Estructura anatómica del {organo}",
+    "Todo sobre el {organo}",
+    "¿Qué relación hay entre {kw} y {kw2}?",
+    "Diferencia entre {farmaco} y {farmaco2} en hipertensión",
+    "Estoy triste, ¿qué hago con mi {kw}?",
+    "¿Cómo invierto dinero en {farmaco}?",
+    "apoyo en estudio {kw}",
+    "calcular dosis de {farmaco} para paciente de 20 kg",
+]
+
+ORGANOS = ["corazón", "cerebro", "riñón", "hígado", "pulmón", "estómago", "intestino"]
+
+FARMACOS = [
+    "losartán", "metformina", "enalapril", "omeprazol", "ibuprofeno", "paracetamol",
+    "amlodipino", "furosemida", "amoxicilina", "vancomicina", "espironolactona"
+]
+
+SECCIONES_NOTA = [
+    "Fecha: {dia:02d}/{mes:02d}/2025 Hora: {hora:02d}:{minuto:02d}",
+    "Servicio: Medicina Interna  Médico: Dr. Pérez  Cédula Profesional: {cedula}",
+    "Nombre: Paciente {n}  Edad: {edad} años  Sexo: {sexo}  Expediente: {expediente}",
+    "Motivo de consulta: {motivo}",
+    "Padecimiento actual: inicia hace {dias} días con {motivo}, acompañado de {kw}. "
+    "Niega fiebre. Refiere tratamiento previo con {farmaco} {dosis} mg VO cada {intervalo} horas sin mejoría.",
+    "Antecedentes: HAS de {anios} años de evolución en tratamiento con {farmaco2} {dosis2} mg VO cada 24 horas. "
+    "Alergias negadas. Tabaquismo negado.",
+    "Exploración física: TA: {sis}/{dia_ta} mmHg FC: {fc} lpm FR: {fr} rpm Temp: {temp} °C SatO2: {sat}%. "
+    "Consciente, orientado, cardiopulmonar sin compromiso, abdomen blando depresible.",
+    "Impresión diagnóstica: {kw} (CIE-10 I10). Descartar {kw2}.",
+    "Plan: BH, QS, EGO, ECG. {farmaco} {dosis} mg VO cada {intervalo} horas por 7 días. "
+    "Cita de control en 2 semanas. Signos de alarma explicados.",
+]
+
+
+def _cargar_diccionarios():
+    with open(os.path.join(ROOT_DIR, "data", "domains.json"), "r", encoding="utf-8") as f:
+        domains = json.load(f)
+    keywords = [kw for kws in domains.get("keywords", {}).values() for kw in kws]
+    regiones = domains.get("anatomical_regions", [])
+    return keywords, regiones
+
+
+def generar_preguntas_cortas(n, semilla=SEMILLA):
+    """Preguntas de una línea (aprobadas, rechazadas, amplias y comandos)"""
+    rng = random.Random(semilla)
+    keywords, regiones = _cargar_diccionarios()
+    preguntas = []
+    for _ in range(n):
+        plantilla = rng.choice(PLANTILLAS_CORTAS)
+        preguntas.append(plantilla.format(
+            farmaco=rng.choice(FARMACOS),
+            farmaco2=rng.choice(FARMACOS),
+            region=rng.choice(regiones),
+            organo=rng.choice(ORGANOS),
+            kw=rng.choice(keywords),
+            kw2=rng.choice(keywords),
+        ))
+    return preguntas
+
+
+def generar_preguntas_dos_palabras(n, semilla=SEMILLA):
+    """Consultas de 1-2 palabras (nivel 3 del Wrapper)"""
+    rng = random.Random(semilla + 1)
+    keywords, regiones = _cargar_diccionarios()
+    terminos = keywords + regiones + ORGANOS + FARMACOS
+    preguntas = []
+    for _ in range(n):
+        if rng.random() < 0.5:
+            preguntas.append(rng.choice(terminos))
+        else:
+            preguntas.append(f"{rng.choice(['anatomía', 'función', 'dosis', 'causas'])} {rng.choice(terminos)}")
+    return preguntas
+
+
+PLANTILLAS_DOSIS = [
+    "calcular dosis de {farmaco} para paciente de {peso} kg",
+    "dosis por peso de {farmaco}, niño de {edad} años y {peso} kg",
+    "cálculo de dosis {farmaco} peso: {peso} edad {edad} años",
+    "ajuste de dosis de {farmaco} en paciente de {peso} kg con TFG 30",
+]
+
+
+def generar_preguntas_dosis(n, semilla=SEMILLA):
+    """Preguntas del comando calculo_dosis (locales y derivadas al LLM)"""
+    rng = random.Random(semilla + 4)
+    return [
+        rng.choice(PLANTILLAS_DOSIS).format(
+            farmaco=rng.choice(FARMACOS),
+            peso=rng.choice([4, 8.5, 12, 20, 35, 70]),
+            edad=rng.randint(1, 15),
+        )
+        for _ in range(n)
+    ]
+
+
+def generar_nota(rng, tamano=5 * 1024):
+    """Nota médica en texto libre de aproximadamente `tamano` bytes"""
+    keywords, _ = _cargar_diccionarios()
+    partes = []
+    total = 0
+    n = 0
+    while total < tamano:
+        for seccion in SECCIONES_NOTA:
+            linea = seccion.format(
+                dia=rng.randint(1, 28), mes=rng.randint(1, 12),
+                hora=rng.randint(0, 23), minuto=rng.randint(0, 59),
+                cedula=rng.randint(1000000, 9999999), n=n,
+                edad=rng.randint(1, 95), sexo=rng.choice("MF"),
+                expediente=rng.randint(10000, 99999),
+                motivo=rng.choice(keywords), kw=rng.choice(keywords), kw2=rng.choice(keywords),
+                dias=rng.randint(1, 30), anios=rng.randint(1, 20),
+                farmaco=rng.choice(FARMACOS), farmaco2=rng.choice(FARMACOS),
+                dosis=rng.choice([50, 100, 250, 500, 850]), dosis2=rng.choice([5, 10, 20, 50]),
+                intervalo=rng.choice([6, 8, 12, 24]),
+                sis=rng.randint(90, 180), dia_ta=rng.randint(50, 110),
+                fc=rng.randint(50, 130), fr=rng.randint(12, 30),
+                temp=round(rng.uniform(35.5, 39.5), 1), sat=rng.randint(85, 99),
+            )
+            partes.append(linea)
+            total += len(linea.encode("utf-8")) + 1
+            if total >= tamano:
+                break
+        n += 1
+    return "\n".join(partes)
+
+
+def generar_notas(n, tamano=5 * 1024, semilla=SEMILLA):
+    """Lista de `n` notas médicas de ~`tamano` bytes"""
+    rng = random.Random(semilla + 2)
+    return [generar_nota(rng, tamano) for _ in range(n)]
+
+
+def generar_textos_adversariales(tamano=1024 * 1024):
+    """
+    Textos de ~`tamano` caracteres que castigan al detector de notas:
+    indicadores repetidos que nunca completan su patrón, líneas enormes
+    y corridas de dígitos sin unidad.
+    """
+    return {
+        "vo_sin_cada": "vo " * (tamano // 3),
+        "digitos": "1" * tamano,
+        "edad_sin_numero": ("edad: " + " " * 50) * (tamano // 56),
+        "fecha_sin_separador": "fechas " * (tamano // 7),
+        "texto_plano": "a " * (tamano // 2),
+    }
+
+
+def generar_tokens_respuesta(n_tokens, semilla=SEMILLA):
+    """Simula los deltas de texto que entrega el proveedor en streaming"""
+    rng = random.Random(semilla + 3)
+    keywords, _ = _cargar_diccionarios()
+    piezas = ["## Definición\n\n", "**", " ", ".", "\n\n", ", ", " de ", " la ", "|", " - "]
+    tokens = []
+    for _ in range(n_tokens):
+        if rng.random() < 0.6:
+            palabra = rng.choice(keywords)
+            corte = rng.randint(1, max(1, len(palabra)))
+            tokens.append(" " + palabra[:corte])
+        else:
+            tokens.append(rng.choice(piezas))
+    return tokens
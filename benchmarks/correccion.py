@@ -0,0 +1,121 @@
+"""
+Corrección de notas: reescritura completa vs. script de ediciones
+=================================================================
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.correccion              # estimación local (sin red)
+    python -m benchmarks.correccion --live -n 3  # llamadas reales a DeepSeek
+
+La reescritura completa imprime la nota entera (tokens de salida >= tamaño
+de la nota); el script de ediciones sólo imprime los cambios. En modo local
+se estima, para notas de distinto tamaño con los mismos errores, los tokens
+de completion de cada modo y el costo de aplicar el script. En modo --live
+se miden tokens de completion (usage del proveedor) y latencia total.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import corpus
+from src.correccion import corregir_con_script, extraer_nota
+from src.tokens import estimar_tokens
+
+# Errores sembrados en las notas (fragmento con error, corrección, motivo, tipo)
+ERRORES = [
+    ("paracetamol 5 gr c/6", "Paracetamol 500 mg VO cada 6 horas", "Dosis y unidad incorrectas", "dosis"),
+    ("Dx: HAS", "Dx: Hipertensión arterial sistémica", "Abreviatura no estándar", "abreviatura"),
+    ("diabetis", "diabetes", "Ortografía médica", "ortografia"),
+]
+TAMANOS = (1024, 5 * 1024, 20 * 1024)
+
+
+def _nota_con_errores(tamano):
+    base = corpus.generar_notas(1, tamano=tamano)[0]
+    return "corregir nota médica:\n" + "\n".join(e[0] for e in ERRORES) + "\n" + base
+
+
+def _script():
+    return "\n".join(json.dumps({"buscar": b, "reemplazar": r, "motivo": m, "tipo": t}, ensure_ascii=False)
+                     for b, r, m, t in ERRORES)
+
+
+def estimacion_local():
+    script = _script()
+    t_script = estimar_tokens(script)
+    print("📏 Estimación local (mismos 3 errores, notas de distinto tamaño)")
+    print(f"  {'nota':>8} {'reescritura':>12} {'ediciones':>10} {'reducción':>10} {'aplicar':>10}")
+    for tamano in TAMANOS:
+        nota = extraer_nota(_nota_con_errores(tamano))
+        correccion = corregir_con_script(nota, script)
+        # La reescritura imprime la nota corregida más la lista de errores
+        t_reescritura = estimar_tokens(correccion["corregida"]) + t_script
+
+        inicio = time.perf_counter()
+        for _ in range(200):
+            corregir_con_script(nota, script)
+        aplicar_us = (time.perf_counter() - inicio) * 1e6 / 200
+
+        print(f"  {tamano // 1024:>6}KB {t_reescritura:>12} {t_script:>10} "
+              f"{1 - t_script / t_reescritura:>10.0%} {aplicar_us:>8.1f}µs")
+
+
+def _medir(client, question, special_command):
+    """Tokens de completion y latencia total de una llamada"""
+    inicio = time.perf_counter()
+    respuesta = client.client.chat.completions.create(
+        model=client.model,
+        messages=[
+            {"role": "system", "content": client._build_system_prompt("análisis clínico", special_command)},
+            {"role": "user", "content": client._build_user_prompt(question, "análisis clínico", special_command)}
+        ],
+        temperature=client.temp
+    )
+    total = time.perf_counter() - inicio
+    return respuesta.usage.completion_tokens, total, respuesta.choices[0].message.content
+
+
+def comparacion_live(repeticiones):
+    from src.deepseek import DeepSeekClient
+    client = DeepSeekClient()
+    resultados = {"reescritura": [], "ediciones": []}
+    invalidos = 0
+
+    for _ in range(repeticiones):
+        for tamano in TAMANOS:
+            question = _nota_con_errores(tamano)
+            nota = extraer_nota(question)
+            resultados["reescritura"].append(_medir(client, question, "correccion_nota")[:2])
+            tokens, total, script = _medir(client, nota, "correccion_nota_ediciones")
+            if corregir_con_script(nota, script) is None:
+                invalidos += 1
+            resultados["ediciones"].append((tokens, total))
+
+    print(f"\n{'modo':<14} {'completion':>11} {'total':>9}")
+    for nombre, filas in resultados.items():
+        tokens = statistics.median(f[0] or 0 for f in filas)
+        total = statistics.median(f[1] for f in filas)
+        print(f"{nombre:<14} {tokens:>11.0f} {total:>8.2f}s")
+    print(f"scripts inválidos (→ reescritura completa): {invalidos}/{len(resultados['ediciones'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara correccion_nota completa vs. por ediciones")
+    parser.add_argument("--live", action="store_true", help="Llamar a DeepSeek (requiere DEEPSEEK_API_KEY)")
+    parser.add_argument("-n", type=int, default=1, help="Repeticiones por tamaño en modo --live")
+    args = parser.parse_args()
+
+    estimacion_local()
+    if args.live:
+        comparacion_live(args.n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+/*
+ * Render incremental vs. render completo de respuestas en streaming
+ * =================================================================
+ *
+ * Genera respuestas markdown sintéticas (títulos, párrafos, listas y
+ * tablas, semilla fija) de 1k a 16k tokens, las parte en chunks como
+ * frame_stream (≥30 caracteres) y las entrega a:
+ *
+ * - completo: el handler anterior (formatMarkdown de todo lo acumulado en
+ *   cada chunk y un innerHTML por chunk en requestAnimationFrame)
+ * - incremental: StreamRenderer (templates/render.js)
+ *
+ * Lo usan index.html (tiempo de frame en el navegador) y node.js
+ * (equivalencia y trabajo de formateo sin layout).
+ */
+
+const ANSWER_TOKENS = [1000, 4000, 16000];
+const CHARS_PER_TOKEN = 4;
+
+function rng(seed) {
+    // mulberry32: determinista en navegador y node
+    return () => {
+        seed |= 0; seed = seed + 0x6D2B79F5 | 0;
+        let t = Math.imul(seed ^ seed >>> 15, 1 | seed);
+        t = t + Math.imul(t ^ t >>> 7, 61 | t) ^ t;
+        return ((t ^ t >>> 14) >>> 0) / 4294967296;
+    };
+}
+
+const WORDS = ('arteria vena nervio músculo irrigación inervación ventrículo aurícula válvula miocardio ' +
+    'fármaco dosis receptor mecanismo acción efecto adverso riñón glomérulo filtración ' +
+    'hipertensión diagnóstico tratamiento paciente síntoma signo pronóstico evolución').split(' ');
+
+function generateAnswer(tokens, seed = 2025) {
+    const random = rng(seed + tokens);
+    const pick = list => list[Math.floor(random() * list.length)];
+    const sentence = n => Array.from({ length: n }, () => pick(WORDS)).join(' ');
+    const target = tokens * CHARS_PER_TOKEN;
+    let text = '';
+    let section = 1;
+    while (text.length < target) {
+        text += `## ${section}. ${sentence(3)}\n\n`;
+        text += `${sentence(18)} **${sentence(2)}** ${sentence(12)}.\n\n`;
+        const kind = section % 3;
+        if (kind === 0) {
+            for (let i = 0; i < 5; i++) text += `- **${pick(WORDS)}**: ${sentence(8)}\n`;
+        } else if (kind === 1) {
+            for (let i = 1; i <= 4; i++) text += `${i}. ${sentence(10)}\n`;
+        } else {
+            text += `| Parámetro | Valor | Nota |\n|---|---|---|\n`;
+            for (let i = 0; i < 5; i++) text += `| ${pick(WORDS)} | ${Math.floor(random() * 100)} mg | ${sentence(3)} |\n`;
+        }
+        text += `\n${sentence(20)}.\n\n---\n\n`;
+        section++;
+    }
+    return text;
+}
+
+// Tokens de ~4 caracteres agrupados como frame_stream (≥30 caracteres o fin de oración)
+function toChunks(text) {
+    const chunks = [];
+    let buffer = '';
+    for (let i = 0; i < text.length; i += CHARS_PER_TOKEN) {
+        const token = text.slice(i, i + CHARS_PER_TOKEN);
+        buffer += token;
+        if (buffer.length >= 30 || /[.!?]$/.test(token)) {
+            chunks.push(buffer);
+            buffer = '';
+        }
+    }
+    if (buffer) chunks.push(buffer);
+    return chunks;
+}
+
+// Handler anterior: formatea todo lo acumulado en cada chunk
+function legacyHandler(container, schedule, onRender) {
+    let accumulated = '';
+    return {
+        append(chunk) {
+            accumulated += chunk;
+            const html = formatMarkdown(accumulated);
+            schedule(() => {
+                container.innerHTML = html;
+                if (onRender) onRender();
+            });
+        },
+        finish() {}
+    };
+}
+
+function incrementalHandler(container, schedule, onRender) {
+    return new StreamRenderer(container, { schedule, onRender });
+}
+
+const HANDLERS = { completo: legacyHandler, incremental: incrementalHandler };
+
+function percentile(values, p) {
+    const sorted = [...values].sort((a, b) => a - b);
+    return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))] || 0;
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { ANSWER_TOKENS, generateAnswer, toChunks, HANDLERS, percentile };
+}
@@ -0,0 +1,87 @@
+/*
+ * Render incremental vs. completo sin navegador
+ * =============================================
+ *
+ * Mide sólo el trabajo de JavaScript por frame (formatMarkdown y armado de
+ * strings; sin parseo de HTML ni layout, que en el navegador crecen igual)
+ * y verifica que StreamRenderer deje exactamente el HTML de
+ * formatMarkdown(respuesta completa), también en cada frame intermedio.
+ *
+ * Uso (desde la raíz del repositorio):
+ *
+ *     node benchmarks/frontend/node.js
+ *     node benchmarks/frontend/node.js 8      # chunks por frame
+ */
+
+const path = require('path');
+const { performance } = require('perf_hooks');
+
+const render = require(path.join(__dirname, '..', '..', 'templates', 'render.js'));
+Object.assign(globalThis, render);
+const { ANSWER_TOKENS, generateAnswer, toChunks, HANDLERS, percentile } = require('./bench.js');
+
+// Nodo mínimo: el HTML de la burbuja es el de sus hijos en orden
+class FakeNode {
+    constructor() { this.children = []; this.innerHTML = ''; this.style = {}; }
+    appendChild(node) { this.children.push(node); node.parent = this; }
+    insertAdjacentHTML(position, html) {
+        const siblings = this.parent.children;
+        siblings.splice(siblings.indexOf(this), 0, { html });
+    }
+    get html() {
+        return this.children.length
+            ? this.children.map(c => c instanceof FakeNode ? c.html : c.html).join('')
+            : this.innerHTML;
+    }
+}
+globalThis.document = { createElement: () => new FakeNode() };
+
+function runCase(mode, tokens, chunksPerFrame) {
+    const answer = generateAnswer(tokens);
+    const chunks = toChunks(answer);
+    const bubble = new FakeNode();
+    let queue = [];
+    const handler = HANDLERS[mode](bubble, cb => queue.push(cb), null);
+
+    const frames = [];
+    let delivered = '';
+    let mismatches = 0;
+    const start = performance.now();
+    for (let i = 0; i < chunks.length; i += chunksPerFrame) {
+        const frameStart = performance.now();
+        for (const chunk of chunks.slice(i, i + chunksPerFrame)) {
+            handler.append(chunk);
+            delivered += chunk;
+        }
+        const callbacks = queue;
+        queue = [];
+        callbacks.forEach(cb => cb());
+        frames.push(performance.now() - frameStart);
+        if (mode === 'incremental' && frames.length % 25 === 0) {
+            mismatches += bubble.html !== formatMarkdown(delivered);
+        }
+    }
+    handler.finish();
+    const total = performance.now() - start;
+    return {
+        tokens, mode, chunks: chunks.length,
+        p50: percentile(frames, 0.5), p95: percentile(frames, 0.95), max: Math.max(...frames),
+        total, identical: bubble.html === formatMarkdown(answer) && mismatches === 0
+    };
+}
+
+function main() {
+    const chunksPerFrame = Number(process.argv[2]) || 4;
+    console.log(`🖼️ Trabajo JS por frame (${chunksPerFrame} chunks por frame, sin layout)\n`);
+    console.log('tokens  modo         chunks  p50 (ms)  p95 (ms)  máx (ms)   total (ms)  HTML final');
+    for (const tokens of ANSWER_TOKENS) {
+        for (const mode of Object.keys(HANDLERS)) {
+            const r = runCase(mode, tokens, chunksPerFrame);
+            console.log(`${String(tokens).padStart(6)}  ${mode.padEnd(12)} ${String(r.chunks).padStart(6)}` +
+                `  ${r.p50.toFixed(3).padStart(8)}  ${r.p95.toFixed(3).padStart(8)}  ${r.max.toFixed(3).padStart(8)}` +
+                `  ${r.total.toFixed(1).padStart(11)}  ${r.identical ? '✅ idéntico' : '❌ difiere'}`);
+        }
+    }
+}
+
+main();
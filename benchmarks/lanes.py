@@ -0,0 +1,142 @@
+"""
+Latencia del carril rápido con streams largos abiertos
+======================================================
+
+Levanta gunicorn con la app real y un proveedor simulado (cada stream
+tarda BENCH_STREAM_S segundos, 20 por defecto) y mide la latencia de respuestas sin proveedor
+(pregunta rechazada y /health) mientras hay 0..N streams abiertos.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.lanes                         # gthread (Procfile)
+    python -m benchmarks.lanes --worker-class sync     # configuración anterior
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+STREAM_S = float(os.environ.get("BENCH_STREAM_S", "20"))
+
+
+def _proveedor_lento(question, domain, special_command=None):
+    """Stream simulado: un token por segundo durante STREAM_S segundos"""
+    for _ in range(int(STREAM_S)):
+        time.sleep(1)
+        yield "token "
+    yield "__STREAM_DONE__"
+
+
+def _crear_app():
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-sin-red")
+    import app as aplicacion
+    aplicacion.lisabella.mistral.generate_stream = _proveedor_lento
+    return aplicacion.app
+
+
+# Punto de entrada para gunicorn: benchmarks.lanes:app
+app = _crear_app() if os.environ.get("BENCH_LANES_SERVER") else None
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post(url, question, timeout=120):
+    data = json.dumps({"question": question}).encode()
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _abrir_streams(base, n, detener):
+    """N streams largos en hilos; cada uno reabre al terminar hasta `detener`"""
+    def ciclo():
+        while not detener.is_set():
+            try:
+                _post(f"{base}/ask_stream", "¿Cuál es la irrigación arterial del corazón?")
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+    hilos = [threading.Thread(target=ciclo, daemon=True) for _ in range(n)]
+    for h in hilos:
+        h.start()
+    return hilos
+
+
+def _medir(base, repeticiones):
+    muestras = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        try:
+            if i % 2:
+                urllib.request.urlopen(f"{base}/health", timeout=60).read()
+            else:
+                _post(f"{base}/ask_stream", "¿Cómo invierto en Pfizer?", timeout=60)
+        except (urllib.error.URLError, OSError):
+            pass
+        muestras.append((time.perf_counter() - inicio) * 1000)
+    muestras.sort()
+    return statistics.median(muestras), muestras[int(len(muestras) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia del carril rápido bajo streams largos")
+    parser.add_argument("--worker-class", default="gthread", choices=("gthread", "sync"))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--streams", default="0,4,12,24", help="streams abiertos por medición")
+    parser.add_argument("-n", type=int, default=40, help="peticiones rápidas por medición")
+    args = parser.parse_args()
+
+    puerto = _puerto_libre()
+    base = f"http://127.0.0.1:{puerto}"
+    comando = [sys.executable, "-m", "gunicorn", "benchmarks.lanes:app", "--timeout", "120",
+               "--workers", str(args.workers), "--worker-class", args.worker_class,
+               "--bind", f"127.0.0.1:{puerto}", "--log-level", "warning"]
+    if args.worker_class == "gthread":
+        # Con --threads > 1 gunicorn cambia sync por gthread; sólo se pasa en gthread
+        comando += ["--threads", str(args.threads)]
+    entorno = dict(os.environ, BENCH_LANES_SERVER="1", BENCH_STREAM_S=str(STREAM_S))
+    servidor = subprocess.Popen(comando, cwd=ROOT_DIR, env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"{base}/health", timeout=1).read()
+                break
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.1)
+
+        hilos = args.threads if args.worker_class == "gthread" else 1
+        print(f"🏁 {args.worker_class} workers={args.workers} threads={hilos} (streams de {STREAM_S:.0f}s)")
+        print(f"  {'streams':>8} {'p50':>10} {'p95':>10}")
+        for n in (int(x) for x in args.streams.split(",")):
+            detener = threading.Event()
+            _abrir_streams(base, n, detener)
+            time.sleep(1.5)
+            p50, p95 = _medir(base, args.n)
+            print(f"  {n:>8} {p50:>8.1f}ms {p95:>8.1f}ms")
+            detener.set()
+            time.sleep(STREAM_S + 1)
+        salud = json.loads(urllib.request.urlopen(f"{base}/health", timeout=30).read())
+        print(f"📊 carriles (un worker): {json.dumps(salud.get('lanes'), ensure_ascii=False)}")
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
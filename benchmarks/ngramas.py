@@ -0,0 +1,88 @@
+"""
+Clasificador de n-gramas: velocidad y concordancia con las reglas
+=================================================================
+
+Sobre el corpus sintético de preguntas cortas (benchmarks/corpus.py):
+
+- µs por pregunta con `clasificar` y preguntas/s con `clasificar_lote`
+- concordancia con el dominio que eligen las keywords en las aprobadas
+- empates de keywords (hoy decididos por el orden del diccionario)
+- reformuladas que el modelo clasificaría con confianza ≥ CONFIANZA_RESCATE
+
+Uso (desde la raíz del repositorio; entrenar antes con `python -m src.ngramas`):
+
+    python -m benchmarks.ngramas
+    python -m benchmarks.ngramas -n 10000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.corpus import generar_preguntas_cortas, generar_preguntas_dos_palabras
+from src import ngramas
+from src.wrapper import Result, Wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocidad y concordancia del clasificador de n-gramas")
+    parser.add_argument("-n", type=int, default=10000, help="preguntas del corpus")
+    args = parser.parse_args()
+
+    modelo = ngramas.modelo()
+    if modelo is None:
+        print("⚠️ Sin modelo: entrenar con `python -m src.ngramas`")
+        return
+    preguntas = generar_preguntas_cortas(args.n) + generar_preguntas_dos_palabras(args.n // 10)
+
+    muestras = []
+    for pregunta in preguntas[:2000]:
+        inicio = time.perf_counter()
+        modelo.clasificar(pregunta)
+        muestras.append((time.perf_counter() - inicio) * 1e6)
+    inicio = time.perf_counter()
+    predicciones = modelo.clasificar_lote(preguntas)
+    lote = time.perf_counter() - inicio
+    print(f"🔤 modelo {modelo.pesos.nbytes // 1024} KB, {len(modelo.clases)} dominios, "
+          f"{modelo.meta['muestras']} muestras de entrenamiento")
+    print(f"  clasificar:       p50 {statistics.median(muestras):.1f} µs/pregunta")
+    print(f"  clasificar_lote:  {len(preguntas) / lote:,.0f} preguntas/s ({len(preguntas)} en {lote * 1000:.0f} ms)")
+
+    wrapper = Wrapper()
+    comparadas = coincidencias = empates = empates_distintos = reformuladas = rescatables = 0
+    confusiones = Counter()
+    for pregunta, (dominio, confianza) in zip(preguntas, predicciones):
+        resultado = wrapper._classify_rules(pregunta)
+        if resultado["result"] == Result.REFORMULATE:
+            reformuladas += 1
+            rescatables += confianza >= ngramas.CONFIANZA_RESCATE
+            continue
+        if resultado["result"] != Result.APPROVED or resultado.get("special_command") not in (None, "study_mode") \
+                or resultado.get("note_analysis"):
+            continue
+        comparadas += 1
+        if dominio == resultado["domain"]:
+            coincidencias += 1
+        else:
+            confusiones[(resultado["domain"], dominio)] += 1
+        puntajes = wrapper._get_domain_scores(pregunta.lower().strip())
+        if list(puntajes.values()).count(max(puntajes.values())) > 1:
+            empates += 1
+            empatados = [d for d, p in puntajes.items() if p == max(puntajes.values())]
+            empates_distintos += modelo.desempatar(pregunta, empatados) != resultado["domain"]
+
+    print(f"\n📊 concordancia con las reglas: {coincidencias / max(comparadas, 1):.1%} de {comparadas} aprobadas")
+    print(f"  empates de keywords: {empates} ({empates_distintos} los decidiría distinto el modelo)")
+    print(f"  reformuladas: {reformuladas}, rescatables con confianza ≥ {ngramas.CONFIANZA_RESCATE}: {rescatables}")
+    for (reglas, modelo_dominio), veces in confusiones.most_common(5):
+        print(f"  {veces:>5}× reglas={reglas} modelo={modelo_dominio}")
+
+
+if __name__ == "__main__":
+    main()
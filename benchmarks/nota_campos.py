@@ -0,0 +1,136 @@
+"""
+Elaboración de notas: plantilla completa vs. campos renderizados localmente
+==========================================================================
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.nota_campos              # estimación local (sin red)
+    python -m benchmarks.nota_campos --live -n 3  # llamadas reales a DeepSeek
+
+En modo --live se mide, para cada modo, tokens de completion (usage del
+proveedor), tiempo al primer contenido visible y latencia total. En modo
+local se comparan los tokens estimados de la plantilla impresa por el
+modelo contra el NDJSON de campos equivalente.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.plantilla_nota import RenderizadorNota, renderizar_nota
+from src.tokens import estimar_tokens
+
+CASOS = [
+    "elaborar nota médica: masculino de 54 años, dolor torácico opresivo de 2 horas, diaforesis, "
+    "TA 150/90, FC 104, FR 22, SatO2 94%, diabético e hipertenso",
+    "elaborar nota médica: femenino de 28 años, fiebre de 3 días, disuria y dolor lumbar derecho, "
+    "Temp 38.9, FC 110, TA 100/60, Giordano positivo",
+    "elaborar nota médica: niño de 6 años, 20 kg, tos y rinorrea de 4 días, sin dificultad respiratoria, "
+    "Temp 37.8, SatO2 97%",
+]
+
+# Respuesta típica en modo campos (para la estimación sin red)
+CAMPOS_EJEMPLO = {
+    "fecha": "12/03/2025", "hora": "10:30", "nombre": "[COMPLETAR]", "edad": 54, "sexo": "M",
+    "motivo": "Dolor en el pecho desde hace dos horas",
+    "inicio": "Hace 2 horas", "sintomas": "Dolor torácico opresivo, diaforesis",
+    "evolucion": "Progresiva, sin mejoría con reposo",
+    "ant_patologicos": "Diabetes mellitus tipo 2, hipertensión arterial sistémica",
+    "ta": "150/90", "fc": 104, "fr": 22, "sato2": 94,
+    "habitus": "Diaforético, ansioso", "torax": "Ruidos cardiacos rítmicos, sin soplos",
+    "dx_principal": "Síndrome coronario agudo (CIE-10 I21.9)",
+    "justificacion": "Dolor opresivo típico en paciente con factores de riesgo cardiovascular",
+    "dx_diferencial": ["Disección aórtica", "Tromboembolia pulmonar", "Pericarditis"],
+    "estudios_solicitados": ["ECG de 12 derivaciones", "Troponina I seriada", "Radiografía de tórax"],
+    "tratamiento": ["Ácido acetilsalicílico 300 mg VO dosis única", "Atorvastatina 80 mg VO cada 24 h"],
+    "medidas": ["Reposo absoluto", "Monitorización continua"],
+    "pronostico": "Reservado a evolución", "signos_alarma": "Dolor persistente, disnea, síncope",
+}
+
+
+def estimacion_local():
+    ndjson = "\n".join(json.dumps({k: v}, ensure_ascii=False) for k, v in CAMPOS_EJEMPLO.items())
+    nota = renderizar_nota(CAMPOS_EJEMPLO)
+    t_campos, t_nota = estimar_tokens(ndjson), estimar_tokens(nota)
+
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        "".join(RenderizadorNota().stream([ndjson]))
+    render_us = (time.perf_counter() - inicio) * 1e3
+
+    print("📏 Estimación local (misma nota en ambos modos)")
+    print(f"  plantilla completa impresa por el modelo: ~{t_nota} tokens de completion")
+    print(f"  campos NDJSON:                            ~{t_campos} tokens de completion")
+    print(f"  reducción:                                {1 - t_campos / t_nota:.0%}")
+    print(f"  renderizado local:                        {render_us:.1f} µs/nota")
+
+
+def _medir(client, question, special_command, renderizar):
+    """Tokens de completion, tiempo al primer contenido visible y total"""
+    inicio = time.perf_counter()
+    stream = client.client.chat.completions.create(
+        model=client.model,
+        messages=[
+            {"role": "system", "content": client._build_system_prompt("análisis clínico", special_command)},
+            {"role": "user", "content": client._build_user_prompt(question, "análisis clínico", special_command)}
+        ],
+        temperature=client.temp,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    renderizador = RenderizadorNota() if renderizar else None
+    primer_contenido = None
+    completion = None
+    for chunk in stream:
+        if chunk.usage:
+            completion = chunk.usage.completion_tokens
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        delta = chunk.choices[0].delta.content
+        visible = list(renderizador.feed(delta)) if renderizador else [delta]
+        if visible and primer_contenido is None:
+            primer_contenido = time.perf_counter() - inicio
+    if renderizador:
+        list(renderizador.finish())
+    total = time.perf_counter() - inicio
+    return completion, primer_contenido or total, total
+
+
+def comparacion_live(repeticiones):
+    from src.deepseek import DeepSeekClient
+    client = DeepSeekClient()
+    modos = (("plantilla completa", "elaboracion_nota", False), ("campos", "elaboracion_nota_campos", True))
+    resultados = {nombre: [] for nombre, _, _ in modos}
+
+    for _ in range(repeticiones):
+        for caso in CASOS:
+            for nombre, comando, renderizar in modos:
+                resultados[nombre].append(_medir(client, caso, comando, renderizar))
+
+    print(f"\n{'modo':<20} {'completion':>11} {'1er contenido':>13} {'total':>9}")
+    for nombre, filas in resultados.items():
+        tokens = statistics.median(f[0] or 0 for f in filas)
+        primero = statistics.median(f[1] for f in filas)
+        total = statistics.median(f[2] for f in filas)
+        print(f"{nombre:<20} {tokens:>11.0f} {primero:>12.2f}s {total:>8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara elaboracion_nota completa vs. por campos")
+    parser.add_argument("--live", action="store_true", help="Llamar a DeepSeek (requiere DEEPSEEK_API_KEY)")
+    parser.add_argument("-n", type=int, default=1, help="Repeticiones por caso en modo --live")
+    args = parser.parse_args()
+
+    estimacion_local()
+    if args.live:
+        comparacion_live(args.n)
+
+
+if __name__ == "__main__":
+    main()
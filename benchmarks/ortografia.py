@@ -0,0 +1,86 @@
+"""
+Corrección ortográfica: consultas/s, memoria del índice y compilación
+=====================================================================
+
+Mide el índice de borrado simétrico (src/ortografia.py) compilado desde los
+diccionarios reales:
+
+- consultas/s de `buscar` sin cache para palabras exactas, sin acentos y con
+  un error de tipeo (borrado, sustitución o transposición)
+- µs por pregunta de `corregir` sobre el corpus sintético
+- tamaño del índice (claves de borrado, bytes serializado) y tiempo de compilación
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.ortografia
+    python -m benchmarks.ortografia -n 5000
+"""
+
+import argparse
+import os
+import pickle
+import random
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.corpus import generar_preguntas_cortas
+from src import snapshot
+from src.ortografia import MIN_LARGO, IndiceOrtografico, sin_acentos
+
+
+def con_error(palabra, rng):
+    i = rng.randrange(1, len(palabra) - 1)
+    tipo = rng.choice(("borrado", "sustitucion", "transposicion"))
+    if tipo == "borrado":
+        return palabra[:i] + palabra[i + 1:]
+    if tipo == "sustitucion":
+        return palabra[:i] + rng.choice("aeiourstnl") + palabra[i + 1:]
+    return palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+
+
+def consultas_por_segundo(indice, palabras):
+    inicio = time.perf_counter()
+    encontradas = sum(indice._buscar_sin_cache(p) is not None for p in palabras)
+    return len(palabras) / (time.perf_counter() - inicio), encontradas / len(palabras)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Velocidad y memoria del índice ortográfico")
+    parser.add_argument("-n", type=int, default=5000, help="preguntas del corpus")
+    args = parser.parse_args()
+    rng = random.Random(45)
+
+    datos = snapshot.compilar()
+    inicio = time.perf_counter()
+    indice = IndiceOrtografico.desde_diccionarios(datos["domains"], datos["drugs"])
+    compilacion = (time.perf_counter() - inicio) * 1000
+    serializado = pickle.dumps(indice, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"🔤 {len(indice)} palabras, {len(indice.borrados):,} claves de borrado, "
+          f"{len(serializado) // 1024} KB serializado, compilado en {compilacion:.0f} ms")
+
+    largas = [p for p in indice.canonicas if len(p) >= MIN_LARGO]
+    muestras = {
+        "exactas": [rng.choice(indice.canonicas) for _ in range(20000)],
+        "sin acentos": [sin_acentos(rng.choice(largas)) for _ in range(20000)],
+        "con error": [con_error(rng.choice(largas), rng) for _ in range(20000)],
+    }
+    for nombre, palabras in muestras.items():
+        qps, encontradas = consultas_por_segundo(indice, palabras)
+        print(f"  buscar {nombre:<12} {qps:>12,.0f} consultas/s  ({encontradas:.1%} encontradas)")
+
+    preguntas = generar_preguntas_cortas(args.n)
+    tiempos, cambiadas = [], 0
+    for pregunta in preguntas:
+        inicio = time.perf_counter()
+        cambiadas += bool(indice.corregir(pregunta.lower()).cambios)
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    print(f"\n📊 corregir: p50 {statistics.median(tiempos):.1f} µs/pregunta con cache frío y caliente, "
+          f"{cambiadas / len(preguntas):.1%} de {len(preguntas)} preguntas con cambios")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Frontend precomprimido: bytes transferidos y TTFB de /
+=====================================================
+
+Levanta la app en un servidor HTTP local (werkzeug, en un hilo) y compara:
+
+- antes: /lisabella.html, servido con send_static_file como lo hacía home()
+- después: / con br, gzip o sin compresión según Accept-Encoding
+- revalidación: la misma petición con If-None-Match (304 sin cuerpo)
+
+Para cada caso reporta bytes del cuerpo y TTFB (hasta recibir las cabeceras)
+p50/p95 sobre localhost; en una red real la diferencia de bytes domina.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.pagina
+    python -m benchmarks.pagina -n 1000
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def _medir(puerto, ruta, cabeceras, n):
+    """(bytes del cuerpo, ETag, [TTFB ms])"""
+    conexion = http.client.HTTPConnection("127.0.0.1", puerto)
+    tiempos, cuerpo, etag = [], b"", None
+    for _ in range(n):
+        inicio = time.perf_counter()
+        conexion.request("GET", ruta, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        cuerpo, etag = respuesta.read(), respuesta.getheader("ETag")
+    conexion.close()
+    return len(cuerpo), etag, tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes y TTFB de la página antes y después de precomprimir")
+    parser.add_argument("-n", type=int, default=500, help="peticiones por caso")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-sin-red")
+    from werkzeug.serving import make_server
+    import app as aplicacion
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servidor = make_server("127.0.0.1", 0, aplicacion.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    puerto = servidor.server_port
+
+    casos = [
+        ("antes (send_static_file)", "/lisabella.html", {"Accept-Encoding": "gzip, deflate, br"}),
+        ("después br", "/", {"Accept-Encoding": "gzip, deflate, br"}),
+        ("después gzip", "/", {"Accept-Encoding": "gzip"}),
+        ("después sin compresión", "/", {}),
+    ]
+    print(f"🌐 {args.n} peticiones por caso (keep-alive, localhost)\n")
+    print(f"  {'caso':<34} {'bytes':>8} {'TTFB p50':>10} {'p95':>8}")
+    for nombre, ruta, cabeceras in casos:
+        tamano, etag, tiempos = _medir(puerto, ruta, cabeceras, args.n)
+        print(f"  {nombre:<34} {tamano:>8,} {statistics.median(tiempos):>8.2f} ms {_percentil(tiempos, 0.95):>6.2f} ms")
+        revalidacion = dict(cabeceras, **{"If-None-Match": etag})
+        tamano, _, tiempos = _medir(puerto, ruta, revalidacion, args.n)
+        print(f"  {'  └ revalidación (If-None-Match)':<34} {tamano:>8,} {statistics.median(tiempos):>8.2f} ms "
+              f"{_percentil(tiempos, 0.95):>6.2f} ms")
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Micro-benchmarks de los caminos críticos de CPU
+===============================================
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.run                      # ejecutar y mostrar resultados
+    python -m benchmarks.run --save               # guardar como baseline
+    python -m benchmarks.run --compare            # comparar contra baseline
+    python -m benchmarks.run --compare --threshold 0.30 --filter wrapper
+
+El baseline (benchmarks/baseline.json) guarda ns/operación por benchmark.
+`--compare` termina con código 1 si algún benchmark es más lento que el
+baseline por encima del umbral (por defecto 25%).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+# Los benchmarks nunca llaman a la API; basta una clave ficticia para importar
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-sin-red")
+
+from benchmarks import corpus
+
+BASELINE_PATH = os.path.join(ROOT_DIR, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registrar una función `setup() -> (fn, items)` como benchmark"""
+    def decorator(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return decorator
+
+
+@contextlib.contextmanager
+def _silenciar():
+    """Descarta los prints de depuración de los módulos medidos"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# ═══════════════════════════════════════════════════════
+# CORPUS COMPARTIDO
+# ═══════════════════════════════════════════════════════
+
+_CACHE = {}
+
+
+def _datos():
+    if "cortas" not in _CACHE:
+        _CACHE["cortas"] = corpus.generar_preguntas_cortas(400)
+        _CACHE["dos_palabras"] = corpus.generar_preguntas_dos_palabras(400)
+        _CACHE["notas"] = corpus.generar_notas(40)
+        _CACHE["tokens"] = corpus.generar_tokens_respuesta(4000)
+        _CACHE["dosis"] = corpus.generar_preguntas_dosis(400)
+        _CACHE["adversariales_1mb"] = list(corpus.generar_textos_adversariales().values())
+        _CACHE["notas_1mb"] = corpus.generar_notas(3, tamano=1024 * 1024)
+    return _CACHE
+
+
+def _wrapper():
+    if "wrapper" not in _CACHE:
+        from src.wrapper import Wrapper
+        with _silenciar():
+            _CACHE["wrapper"] = Wrapper()
+    return _CACHE["wrapper"]
+
+
+# ═══════════════════════════════════════════════════════
+# WRAPPER
+# ═══════════════════════════════════════════════════════
+
+@benchmark("wrapper.classify[cortas]")
+def _():
+    return _wrapper().classify, _datos()["cortas"]
+
+
+@benchmark("wrapper.classify[dos_palabras]")
+def _():
+    return _wrapper().classify, _datos()["dos_palabras"]
+
+
+@benchmark("wrapper.classify[nota_5kb]")
+def _():
+    return _wrapper().classify, _datos()["notas"]
+
+
+@benchmark("wrapper._detect_special_command[cortas]")
+def _():
+    return _wrapper()._detect_special_command, _datos()["cortas"]
+
+
+@benchmark("wrapper._is_medical_note[nota_5kb]")
+def _():
+    return _wrapper()._is_medical_note, _datos()["notas"]
+
+
+@benchmark("wrapper._is_medical_note[cortas]")
+def _():
+    return _wrapper()._is_medical_note, _datos()["cortas"]
+
+
+@benchmark("wrapper._is_medical_note[adversarial_1mb]")
+def _():
+    return _wrapper()._is_medical_note, _datos()["adversariales_1mb"]
+
+
+@benchmark("wrapper.classify[nota_1mb]")
+def _():
+    return _wrapper().classify, _datos()["notas_1mb"]
+
+
+@benchmark("wrapper.classify[adversarial_1mb]")
+def _():
+    return _wrapper().classify, _datos()["adversariales_1mb"]
+
+
+@benchmark("wrapper._get_domain_scores[cortas]")
+def _():
+    lowered = [q.lower().strip() for q in _datos()["cortas"]]
+    return _wrapper()._get_domain_scores, lowered
+
+
+@benchmark("wrapper._get_detected_keywords[cortas]")
+def _():
+    lowered = [q.lower().strip() for q in _datos()["cortas"]]
+    return _wrapper()._get_detected_keywords, lowered
+
+
+@benchmark("wrapper._detect_specific_drugs[cortas]")
+def _():
+    lowered = [q.lower().strip() for q in _datos()["cortas"]]
+    return _wrapper()._detect_specific_drugs, lowered
+
+
+@benchmark("wrapper._extract_medical_term[dos_palabras]")
+def _():
+    lowered = [q.lower().strip() for q in _datos()["dos_palabras"]]
+    return _wrapper()._extract_medical_term, lowered
+
+
+# ═══════════════════════════════════════════════════════
+# DETECTOR DE AMPLITUD
+# ═══════════════════════════════════════════════════════
+
+@benchmark("amplitud.detectar_amplitud[cortas]")
+def _():
+    from src.amplitud_detector import detectar_amplitud
+    return (lambda q: detectar_amplitud(q, "anatomía")), _datos()["cortas"]
+
+
+@benchmark("amplitud.extraer_features[cortas]")
+def _():
+    from src.amplitud_detector import extraer_features
+    return extraer_features, _datos()["cortas"]
+
+
+@benchmark("amplitud.score_many[lote_400]")
+def _():
+    from src.amplitud_detector import score_many
+    return score_many, [_datos()["cortas"]]
+
+
+@benchmark("amplitud.generar_reformulacion[cortas]")
+def _():
+    from src.amplitud_detector import generar_reformulacion
+    return (lambda q: generar_reformulacion(q, "anatomía")), _datos()["cortas"]
+
+
+# ═══════════════════════════════════════════════════════
+# CALCULADORA DE DOSIS
+# ═══════════════════════════════════════════════════════
+
+@benchmark("dosis.responder[preguntas_dosis]")
+def _():
+    from src.dosis import CalculadoraDosis
+    return CalculadoraDosis().responder, _datos()["dosis"]
+
+
+# ═══════════════════════════════════════════════════════
+# PARSER DE NOTAS
+# ═══════════════════════════════════════════════════════
+
+@benchmark("nota_parser.revisar_nota[nota_5kb]")
+def _():
+    from src.nota_parser import revisar_nota
+    return revisar_nota, _datos()["notas"]
+
+
+# ═══════════════════════════════════════════════════════
+# PROMPTS Y FRAMING NDJSON
+# ═══════════════════════════════════════════════════════
+
+COMANDOS = [None, "revision_nota", "correccion_nota", "elaboracion_nota", "valoracion", "study_mode"]
+
+
+def _cliente_sin_red():
+    from src.deepseek import DeepSeekClient
+    # Evita __init__ (crearía el cliente HTTP); sólo se miden los builders
+    return DeepSeekClient.__new__(DeepSeekClient)
+
+
+@benchmark("prompts.system[comandos]")
+def _():
+    client = _cliente_sin_red()
+    return (lambda cmd: client._build_system_prompt("anatomía", cmd)), COMANDOS * 50
+
+
+@benchmark("prompts.user[cortas]")
+def _():
+    client = _cliente_sin_red()
+    return (lambda q: client._build_user_prompt(q, "anatomía", None)), _datos()["cortas"]
+
+
+@benchmark("app.frame_stream[4000_tokens]")
+def _():
+    with _silenciar():
+        from app import frame_stream
+    tokens = _datos()["tokens"]
+    return (lambda toks: sum(1 for _ in frame_stream(toks))), [tokens]
+
+
+# ═══════════════════════════════════════════════════════
+# EJECUCIÓN
+# ═══════════════════════════════════════════════════════
+
+def medir(fn, items, repeticiones=5, min_tiempo=0.05):
+    """Devuelve ns/operación (mínimo y mediana de varias repeticiones)"""
+    # Calentamiento y cálculo de vueltas para llegar a min_tiempo por repetición
+    inicio = time.perf_counter()
+    for item in items:
+        fn(item)
+    duracion = max(time.perf_counter() - inicio, 1e-9)
+    vueltas = max(1, int(min_tiempo / duracion))
+
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(vueltas):
+            for item in items:
+                fn(item)
+        total = time.perf_counter() - inicio
+        muestras.append(total * 1e9 / (vueltas * len(items)))
+
+    return {"ns_op": round(min(muestras), 1), "ns_op_mediana": round(statistics.median(muestras), 1)}
+
+
+def ejecutar(filtro=None):
+    resultados = {}
+    for name, setup in BENCHMARKS:
+        if filtro and filtro not in name:
+            continue
+        fn, items = setup()
+        with _silenciar():
+            resultados[name] = medir(fn, items)
+        print(f"  {name:<48} {_formato(resultados[name]['ns_op']):>12}/op")
+    return resultados
+
+
+def comparar(resultados, baseline, threshold):
+    """Imprime la comparación y devuelve la lista de regresiones"""
+    regresiones = []
+    print(f"\n{'benchmark':<48} {'baseline':>12} {'actual':>12} {'cambio':>9}")
+    for name, actual in resultados.items():
+        previo = baseline.get("results", {}).get(name)
+        if not previo:
+            print(f"{name:<48} {'-':>12} {_formato(actual['ns_op']):>12} {'nuevo':>9}")
+            continue
+        cambio = actual["ns_op"] / previo["ns_op"] - 1
+        marca = ""
+        if cambio > threshold:
+            marca = "  ❌ REGRESIÓN"
+            regresiones.append(name)
+        elif cambio < -threshold:
+            marca = "  ✅ mejora"
+        print(f"{name:<48} {_formato(previo['ns_op']):>12} {_formato(actual['ns_op']):>12} {cambio:>+8.1%}{marca}")
+    return regresiones
+
+
+def _formato(ns):
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de Lisabella")
+    parser.add_argument("--save", action="store_true", help="guardar resultados como baseline")
+    parser.add_argument("--compare", action="store_true", help="comparar contra el baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="regresión tolerada (0.25 = 25%% más lento)")
+    parser.add_argument("--filter", default=None, help="ejecutar sólo benchmarks que contengan este texto")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="ruta del baseline JSON")
+    args = parser.parse_args(argv)
+
+    print(f"🏁 Benchmarks Lisabella ({platform.python_implementation()} {platform.python_version()})")
+    resultados = ejecutar(args.filter)
+
+    codigo = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"⚠️ No existe baseline en {args.baseline}; ejecuta con --save primero")
+            return 2
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regresiones = comparar(resultados, baseline, args.threshold)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresión(es) por encima de {args.threshold:.0%}")
+            codigo = 1
+        else:
+            print(f"\n✅ Sin regresiones por encima de {args.threshold:.0%}")
+
+    if args.save:
+        previo = {}
+        if args.filter and os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                previo = json.load(f).get("results", {})
+        previo.update(resultados)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": previo,
+            }, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"💾 Baseline guardado en {os.path.relpath(args.baseline, ROOT_DIR)}")
+
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Vista previa /classify: tiempo de servidor con y sin cache
+==========================================================
+
+Simula la escritura con debounce: por cada pregunta del corpus se consultan
+sus prefijos (cada 8 caracteres, como pausas al teclear) y después la
+pregunta completa otra vez (cache caliente). Reporta el tiempo de servidor
+de la cabecera Server-Timing (p50/p99/máx) y el tiempo total por petición
+con el cliente de pruebas de Flask.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.vista_previa
+    python -m benchmarks.vista_previa -n 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def _resumen(nombre, servidor, total):
+    print(f"  {nombre:<18} servidor p50 {statistics.median(servidor) * 1000:>6.0f} µs  "
+          f"p99 {_percentil(servidor, 0.99) * 1000:>6.0f} µs  máx {max(servidor) * 1000:>6.0f} µs  "
+          f"| petición p50 {statistics.median(total) * 1000:>6.0f} µs  ({len(servidor)} consultas)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de servidor de la vista previa /classify")
+    parser.add_argument("-n", type=int, default=1000, help="preguntas del corpus")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark-sin-red")
+    import app as aplicacion
+    from benchmarks.corpus import generar_preguntas_cortas
+
+    cliente = aplicacion.app.test_client()
+    preguntas = list(dict.fromkeys(generar_preguntas_cortas(args.n * 3)))[:args.n]
+    cliente.get("/classify", query_string={"q": "calentamiento del corazón"})
+
+    def consultar(texto):
+        inicio = time.perf_counter()
+        respuesta = cliente.get("/classify", query_string={"q": texto})
+        total = time.perf_counter() - inicio
+        servidor = float(respuesta.headers["Server-Timing"].split("dur=")[1])
+        return servidor, total * 1000
+
+    frio, frio_total, caliente, caliente_total = [], [], [], []
+    for pregunta in preguntas:
+        for fin in list(range(8, len(pregunta), 8)) + [len(pregunta)]:
+            servidor, total = consultar(pregunta[:fin])
+            frio.append(servidor)
+            frio_total.append(total)
+    for pregunta in preguntas:
+        servidor, total = consultar(pregunta)
+        caliente.append(servidor)
+        caliente_total.append(total)
+
+    print(f"🔎 /classify sobre {len(preguntas)} preguntas distintas (prefijos cada 8 caracteres)\n")
+    _resumen("escribiendo", frio, frio_total)
+    _resumen("cache caliente", caliente, caliente_total)
+    print(f"\n  cache: {aplicacion.vista_previa_cacheada.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Configuración de gunicorn
+=========================
+
+preload_app: la app (dependencias y diccionarios compilados, ver
+src/snapshot.py) se importa una vez en el proceso maestro y los workers la
+heredan con fork. Antes de forkear se congela el heap (gc.freeze) para que el
+recolector de los workers no toque esos objetos y las páginas sigan
+compartidas copy-on-write.
+
+El estado por worker (carriles, planificador justo, degradación) vive en
+objetos de módulo creados en el maestro, pero cada worker tiene su copia
+tras el fork, igual que sin preload. Los hilos de los pools se crean bajo
+demanda, así que ninguno cruza el fork; el vigilante de diccionarios se
+arranca en cada worker (post_worker_init).
+"""
+
+import gc
+import os
+import time
+
+_INICIO = time.perf_counter()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+timeout = 120
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "si", "sí")
+
+
+def when_ready(server):
+    gc.collect()
+    gc.freeze()
+    print(f"⏱️ gunicorn listo en {(time.perf_counter() - _INICIO) * 1000:.0f} ms "
+          f"(preload={'sí' if preload_app else 'no'}, {gc.get_freeze_count()} objetos congelados)")
+
+
+def post_worker_init(worker):
+    """Recarga en caliente de diccionarios en cada worker (ver src/snapshot.py)"""
+    from src import snapshot
+    snapshot.vigilar()
+    snapshot.instalar_senal()
@@ -0,0 +1,275 @@
+"""
+Almacén de Respuestas Compartido entre Workers
+==============================================
+
+Cada worker de gunicorn tenía su propia memoria: una pregunta respondida por
+el worker 1 volvía a costar una llamada al proveedor en el worker 2, y todo
+empezaba en frío tras cada reinicio. Este almacén es un archivo mapeado en
+memoria (mmap MAP_SHARED) que leen y escriben todos los workers del host:
+
+- Presupuesto fijo: ALMACEN_MB repartidos en conjuntos de ALMACEN_VIAS
+  ranuras de tamaño fijo (tabla asociativa por conjuntos). Al llenarse un
+  conjunto se desaloja la usada hace más tiempo (LRU aproximado: cada
+  acierto anota su instante sin lock; una carrera sólo afecta qué se desaloja).
+- Lecturas sin lock (seqlock por ranura): el escritor deja el contador impar
+  mientras escribe; el lector reintenta si lo encuentra impar o si cambió.
+  Además cada valor lleva CRC32.
+- Escrituras con lock fino: fcntl.lockf sobre el rango de bytes del conjunto
+  (entre procesos) más un lock de hilos (los locks de fcntl son por proceso).
+- Persistencia: el archivo (ALMACEN_PATH) sobrevive a reinicios y deploys si
+  está en un disco persistente. Las entradas caducan a los ALMACEN_TTL_S.
+
+Sólo se guardan preguntas sin comando especial (ver `clave_respuesta`).
+
+El navegador guarda sus propias copias (IndexedDB, templates/cache.js) y las
+valida con `token_respuesta`: si cambia la clave normalizada o
+RESPUESTAS_VERSION, la copia local se refresca en segundo plano.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Optional
+
+from src import snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo el lock de hilos
+    fcntl = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ALMACEN_ACTIVO = os.environ.get("ALMACEN_ACTIVO", "1").lower() in ("1", "true", "si", "sí")
+ALMACEN_PATH = os.environ.get("ALMACEN_PATH", os.path.join(ROOT_DIR, "data", "almacen.bin"))
+ALMACEN_MB = int(os.environ.get("ALMACEN_MB", "32"))
+ALMACEN_VIAS = int(os.environ.get("ALMACEN_VIAS", "4"))
+ALMACEN_RANURA_KB = int(os.environ.get("ALMACEN_RANURA_KB", "16"))
+ALMACEN_TTL_S = float(os.environ.get("ALMACEN_TTL_S", str(24 * 3600)))
+# Cambiar al modificar prompts o modelo: invalida este almacén y los caches de los navegadores
+RESPUESTAS_VERSION = os.environ.get("RESPUESTAS_VERSION", "1")
+# Preguntas más largas (notas pegadas) no se cachean en el navegador
+MAX_CARACTERES_CACHE_LOCAL = 500
+
+MAGIA = b"LISALMC2"
+# magia, número de conjuntos, vías, tamaño de ranura
+CABECERA = struct.Struct("<8sIII")
+TAM_CABECERA = 64
+# seq, longitud, digest de la clave, guardada (epoch), usada (epoch), crc32
+RANURA = struct.Struct("<II16sddI4x")
+SEQ = struct.Struct("<I")
+USADA = struct.Struct("<d")
+OFFSET_USADA = 32
+REINTENTOS_LECTURA = 64
+
+_ESPACIOS_RE = re.compile(r"\s+")
+
+
+def clave_respuesta(question, domain, special_command=None, mode=None) -> str:
+    """
+    Pregunta normalizada (términos corregidos, minúsculas, sin acentos ni
+    signos finales) con su contexto y RESPUESTAS_VERSION
+    """
+    texto = snapshot.actual()["ortografia"].corregir(question.lower()).texto
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    texto = _ESPACIOS_RE.sub(" ", texto).strip(" ¿?¡!.")
+    return f"{RESPUESTAS_VERSION}|{domain}|{special_command}|{mode}|{texto}"
+
+
+def token_respuesta(question, domain, special_command=None, mode=None) -> Optional[str]:
+    """
+    Token de validación del cache del navegador (hash de `clave_respuesta`);
+    None si la pregunta es demasiado larga para cachearla allí
+    """
+    if len(question) > MAX_CARACTERES_CACHE_LOCAL:
+        return None
+    clave = clave_respuesta(question, domain, special_command, mode)
+    return hashlib.blake2b(clave.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class AlmacenCompartido:
+    def __init__(self, path=ALMACEN_PATH, mb=ALMACEN_MB, vias=ALMACEN_VIAS, ranura_kb=ALMACEN_RANURA_KB,
+                 ttl_s=ALMACEN_TTL_S, activo=ALMACEN_ACTIVO, reloj=time.time):
+        self.path = path
+        self.vias = vias
+        self.tam_ranura = ranura_kb * 1024
+        self.conjuntos = max(1, (int(mb * 1024 * 1024) - TAM_CABECERA) // (self.tam_ranura * vias))
+        self.ttl_s = ttl_s
+        self.activo = activo
+        self._reloj = reloj
+        self._mm = None
+        self._fd = None
+        self._abrir_lock = threading.Lock()
+        self._escritura_lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.desalojos = 0
+        self.demasiado_grandes = 0
+        self.lecturas_reintentadas = 0
+
+    @property
+    def tam_total(self):
+        return TAM_CABECERA + self.conjuntos * self.vias * self.tam_ranura
+
+    # ─── Archivo ───
+
+    def _abrir(self):
+        """Mapea el archivo en el primer uso; lo (re)inicializa si la geometría no coincide"""
+        if self._mm is not None or not self.activo:
+            return self._mm
+        with self._abrir_lock:
+            if self._mm is not None:
+                return self._mm
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                self._bloquear(fd, 0, 0)
+                try:
+                    cabecera = CABECERA.pack(MAGIA, self.conjuntos, self.vias, self.tam_ranura)
+                    actual = os.pread(fd, CABECERA.size, 0)
+                    if actual != cabecera or os.fstat(fd).st_size != self.tam_total:
+                        # Archivo nuevo o de otra configuración: se descarta
+                        os.ftruncate(fd, 0)
+                        os.ftruncate(fd, self.tam_total)
+                        os.pwrite(fd, cabecera, 0)
+                        print(f"🗄️ Almacén compartido creado: {self.path} ({self.tam_total // (1024 * 1024)} MB)")
+                finally:
+                    self._desbloquear(fd, 0, 0)
+                self._mm = mmap.mmap(fd, self.tam_total, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+                self._fd = fd
+            except OSError as e:
+                print(f"⚠️ Almacén compartido desactivado ({e})")
+                self.activo = False
+        return self._mm
+
+    @staticmethod
+    def _bloquear(fd, inicio, longitud):
+        if fcntl:
+            fcntl.lockf(fd, fcntl.LOCK_EX, longitud, inicio)
+
+    @staticmethod
+    def _desbloquear(fd, inicio, longitud):
+        if fcntl:
+            fcntl.lockf(fd, fcntl.LOCK_UN, longitud, inicio)
+
+    def cerrar(self):
+        with self._abrir_lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm.close()
+                os.close(self._fd)
+                self._mm = self._fd = None
+
+    # ─── Ranuras ───
+
+    def _conjunto(self, digest):
+        indice = int.from_bytes(digest[:8], "little") % self.conjuntos
+        return TAM_CABECERA + indice * self.vias * self.tam_ranura
+
+    @staticmethod
+    def _digest(clave):
+        return hashlib.blake2b(clave.encode("utf-8"), digest_size=16).digest()
+
+    def _leer_ranura(self, mm, offset, digest):
+        """Valor de la ranura si es de `digest` y vigente; seqlock sin bloquear"""
+        for _ in range(REINTENTOS_LECTURA):
+            seq, longitud, propio, guardada, _, crc = RANURA.unpack_from(mm, offset)
+            if seq & 1:
+                self.lecturas_reintentadas += 1
+                time.sleep(0)
+                continue
+            if propio != digest or not longitud or longitud > self.tam_ranura - RANURA.size:
+                return None
+            datos = mm[offset + RANURA.size:offset + RANURA.size + longitud]
+            if SEQ.unpack_from(mm, offset)[0] != seq:
+                self.lecturas_reintentadas += 1
+                continue
+            ahora = self._reloj()
+            if zlib.crc32(datos) != crc or ahora - guardada > self.ttl_s:
+                return None
+            USADA.pack_into(mm, offset + OFFSET_USADA, ahora)
+            return zlib.decompress(datos).decode("utf-8")
+        return None
+
+    def obtener(self, clave) -> Optional[str]:
+        mm = self._abrir()
+        if mm is None:
+            return None
+        digest = self._digest(clave)
+        base = self._conjunto(digest)
+        for via in range(self.vias):
+            valor = self._leer_ranura(mm, base + via * self.tam_ranura, digest)
+            if valor is not None:
+                self.aciertos += 1
+                return valor
+        self.fallos += 1
+        return None
+
+    def guardar(self, clave, valor) -> bool:
+        mm = self._abrir()
+        if mm is None or not valor:
+            return False
+        datos = zlib.compress(valor.encode("utf-8"), 6)
+        if len(datos) > self.tam_ranura - RANURA.size:
+            self.demasiado_grandes += 1
+            return False
+        digest = self._digest(clave)
+        base = self._conjunto(digest)
+        ahora = self._reloj()
+        with self._escritura_lock:
+            self._bloquear(self._fd, base, self.vias * self.tam_ranura)
+            try:
+                destino, desalojo = self._elegir_via(mm, base, digest, ahora)
+                seq = SEQ.unpack_from(mm, destino)[0]
+                SEQ.pack_into(mm, destino, seq + 1)
+                mm[destino + RANURA.size:destino + RANURA.size + len(datos)] = datos
+                RANURA.pack_into(mm, destino, seq + 1, len(datos), digest, ahora, ahora, zlib.crc32(datos))
+                SEQ.pack_into(mm, destino, seq + 2)
+            finally:
+                self._desbloquear(self._fd, base, self.vias * self.tam_ranura)
+        self.escrituras += 1
+        self.desalojos += desalojo
+        return True
+
+    def _elegir_via(self, mm, base, digest, ahora):
+        """(offset, desalojó): la misma clave, una ranura libre o caducada, o la usada hace más tiempo"""
+        victima, ultimo_uso = base, None
+        for via in range(self.vias):
+            offset = base + via * self.tam_ranura
+            _, longitud, propio, guardada, usada, _ = RANURA.unpack_from(mm, offset)
+            if propio == digest or not longitud or ahora - guardada > self.ttl_s:
+                return offset, False
+            if ultimo_uso is None or usada < ultimo_uso:
+                victima, ultimo_uso = offset, usada
+        return victima, True
+
+    def get_stats(self):
+        consultas = self.aciertos + self.fallos
+        entradas = 0
+        mm = self._mm
+        if mm is not None:
+            for i in range(self.conjuntos * self.vias):
+                entradas += bool(RANURA.unpack_from(mm, TAM_CABECERA + i * self.tam_ranura)[1])
+        return {
+            "activo": self.activo,
+            "mb": round(self.tam_total / (1024 * 1024), 1),
+            "ranuras": self.conjuntos * self.vias,
+            "entradas": entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+            "escrituras": self.escrituras,
+            "desalojos": self.desalojos,
+            "demasiado_grandes": self.demasiado_grandes,
+            "lecturas_reintentadas": self.lecturas_reintentadas
+        }
+
+
+# Almacén del host (se mapea en el primer uso; los contadores son por worker)
+almacen = AlmacenCompartido()
@@ -6,9 +6,23 @@ Intercepta preguntas médicamente válidas pero demasiado amplias
 antes de consumir tokens en Mistral, reformulándolas educativamente.
 """
 
+import json
+import os
 import re
+import threading
 import unicodedata
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from src.tokens import estimar_tokens
+
+# ✅ NumPy es opcional: score_many retorna un arreglo en lugar de una lista
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
 
 
 def _norm(text: str) -> str:
@@ -21,154 +35,180 @@ def _norm(text: str) -> str:
     return text
 
 # ═══════════════════════════════════════════════════════
-# DICCIONARIOS DE DETECCIÓN
+# DICCIONARIOS DE DETECCIÓN (data/amplitud.json)
 # ═══════════════════════════════════════════════════════
 
-ORGANOS_AMPLIOS = [
-    "corazón", "corazon", "cardiaco", "cardíaco",
-    "cerebro", "cerebral", "sistema nervioso",
-    "riñón", "riñon", "renal", "nefron",
-    "hígado", "higado", "hepatico", "hepático",
-    "pulmón", "pulmon", "pulmonar", "respiratorio",
-    "estómago", "estomago", "gastrico", "gástrico",
-    "intestino", "intestinal",
-    "sistema cardiovascular",
-    "sistema respiratorio",
-    "sistema digestivo",
-    "sistema nervioso",
-    "sistema endocrino",
-    "sistema inmune",
-    "aparato locomotor",
-    "sistema musculoesquelético"
-]
+AMPLITUD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "amplitud.json")
 
-PALABRAS_AMPLIAS = [
-    "estructura de", "estructura del", "estructura de la",
-    "estructura anatomica", "estructura anatómica",
-    "estructura completa", "estructura del",
-    "anatomía de", "anatomia de", "anatomía del", "anatomia del",
-    "anatomia completa", "anatomía completa",
-    "todo sobre", "toda la", "todo el",
-    "completo sobre", "completa de",
-    "todo acerca de", "todo lo relacionado",
-    "funcionamiento de", "funcionamiento del",
-    "fisiología de", "fisiologia de", "fisiología del",
-    "sistema completo", "sistema entero",
-    "órgano completo", "organo completo"
-]
 
-REFORMULACIONES_POR_DOMINIO = {
-    "anatomía": {
-        "corazón": [
-            "Irrigación arterial del ventrículo izquierdo por ramas de la arteria coronaria descendente anterior",
-            "Sistema de conducción: nodo SA, nodo AV, Haz de His y fibras de Purkinje (trayectos y relaciones)",
-            "Histología del miocardio: cardiomiocitos, discos intercalares y uniones GAP",
-            "Válvula mitral: valvas, cuerdas tendinosas, músculos papilares y anillo fibroso",
-            "Relaciones pericárdicas del surco auriculoventricular izquierdo"
-        ],
-        "cerebro": [
-            "Irrigación de la cápsula interna: ramas lenticuloestriadas de la arteria cerebral media",
-            "Núcleo subtalámico de Luys: límites, aferencias y eferencias",
-            "Velo medular inferior y cuarto ventrículo: límites anatómicos y relaciones",
-            "Fascículo arqueado: trayecto y correlación clínica (afasia de conducción)",
-            "Corteza precentral (área 4): somatotopía y arterias penetrantes"
-        ],
-        "riñón": [
-            "Irrigación del glomérulo: arteriola aferente vs eferente y red capilar peritubular",
-            "Histología del túbulo proximal: borde en cepillo y transportadores de membrana",
-            "Relaciones del hilio renal: anterior→posterior (vena renal, arteria renal, pelvis renal)",
-            "Asa de Henle en nefronas yuxtamedulares: trayecto y vasa recta",
-            "Estrecheces del uréter: unión pieloureteral, cruce con vasos ilíacos, segmento intramural"
-        ],
-        "hígado": [
-            "Segmento VIII de Couinaud: límites vasculares y drenaje venoso",
-            "Tríada portal: arteria hepática, vena porta y conducto biliar (espacios de Kiernan)",
-            "Irrigación de la vesícula biliar: arteria cística y variaciones anatómicas",
-            "Ligamento venoso (Arancio) y su relación con la vena hepática izquierda",
-            "Histología del lobulillo hepático: sinusoides, placas hepatocitarias y células de Kupffer"
-        ],
-        "pulmón": [
-            "Segmento broncopulmonar apical del lóbulo superior derecho: bronquio, arteria y vena segmentaria",
-            "Pleura costodiafragmática: recesos pleurales y líneas de reflexión",
-            "Ácino pulmonar: límites histológicos y barrera hematoalveolar",
-            "Irrigación bronquial: ramas de la aorta torácica y drenaje venoso",
-            "Relación del bronquio principal derecho con la arteria pulmonar derecha (eparterial/hiparterial)"
-        ],
-        "sistema cardiovascular": [
-            "Anatomía del corazón y grandes vasos",
-            "Sistema arterial sistémico (aorta y sus ramas principales)",
-            "Sistema venoso sistémico (vena cava superior e inferior)",
-            "Circulación coronaria (arterias y venas coronarias)",
-            "Circulación pulmonar (arterias y venas pulmonares)"
-        ],
-        "sistema respiratorio": [
-            "Anatomía de las vías aéreas superiores (fosas nasales, faringe, laringe)",
-            "Anatomía del árbol traqueobronquial",
-            "Estructura alveolar y barrera hemato-aérea",
-            "Músculos respiratorios (diafragma, intercostales, accesorios)",
-            "Inervación del sistema respiratorio"
-        ],
-        "sistema digestivo": [
-            "Anatomía del esófago (porciones cervical, torácica, abdominal)",
-            "Anatomía gástrica (cardias, fondo, cuerpo, antro, píloro)",
-            "Anatomía del intestino delgado (duodeno, yeyuno, íleon)",
-            "Anatomía del intestino grueso (ciego, colon, recto)",
-            "Anatomía del páncreas y vías biliares"
-        ]
-    },
-    "fisiología": {
-        "corazón": [
-            "Mecanismo de contracción cardíaca (fase sistólica y diastólica)",
-            "Ciclo cardíaco completo (sístole auricular, sístole ventricular, diástole)",
-            "Regulación del gasto cardíaco (ley de Frank-Starling)",
-            "Electrofisiología cardíaca (potencial de acción miocárdico)",
-            "Regulación autonómica de la frecuencia cardíaca"
-        ],
-        "cerebro": [
-            "Fisiología de la sinapsis (liberación y recaptación de neurotransmisores)",
-            "Potencial de acción neuronal y propagación",
-            "Fisiología del sistema límbico (emociones, memoria)",
-            "Fisiología del sueño (ciclos NREM y REM)",
-            "Fisiología del sistema motor (corteza motora, vías piramidales)"
-        ],
-        "riñón": [
-            "Filtración glomerular (presiones y fuerzas de Starling)",
-            "Reabsorción tubular (proximal, asa de Henle, distal)",
-            "Mecanismo de concentración y dilución de la orina",
-            "Regulación del balance ácido-base renal",
-            "Regulación de la presión arterial (sistema renina-angiotensina-aldosterona)"
-        ],
-        "hígado": [
-            "Metabolismo hepático de carbohidratos (glucogénesis, glucogenólisis)",
-            "Metabolismo hepático de lípidos (síntesis de ácidos biliares)",
-            "Metabolismo hepático de proteínas (síntesis de albúmina)",
-            "Función detoxificadora del hígado (citocromo P450)",
-            "Secreción biliar y función de la vesícula biliar"
-        ],
-        "pulmón": [
-            "Mecánica ventilatoria (volúmenes y capacidades pulmonares)",
-            "Intercambio gaseoso (difusión de O₂ y CO₂)",
-            "Regulación de la ventilación (quimiorreceptores centrales y periféricos)",
-            "Relación ventilación-perfusión (V/Q)",
-            "Transporte de gases en sangre (hemoglobina, curva de disociación)"
-        ]
-    },
-    "farmacología": {
-        "sistema cardiovascular": [
-            "Fármacos antihipertensivos (mecanismo de acción y dosis)",
-            "Fármacos antiarrítmicos (clasificación de Vaughan Williams)",
-            "Fármacos para insuficiencia cardíaca (IECA, ARA-II, betabloqueantes)",
-            "Anticoagulantes y antiagregantes plaquetarios",
-            "Fármacos hipolipemiantes (estatinas, fibratos, ezetimiba)"
-        ]
-    }
+def _cargar_diccionarios(path: str) -> Dict:
+    """Cargar diccionarios de amplitud con manejo de errores"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Archivo no encontrado: {path}")
+        return {}
+    except json.JSONDecodeError:
+        print(f"⚠️ Error al decodificar JSON: {path}")
+        return {}
+
+
+_DICCIONARIOS = _cargar_diccionarios(AMPLITUD_PATH)
+
+ORGANOS_AMPLIOS: List[str] = _DICCIONARIOS.get("organos_amplios", [])
+PALABRAS_AMPLIAS: List[str] = _DICCIONARIOS.get("palabras_amplias", [])
+REFORMULACIONES_POR_DOMINIO: Dict[str, Dict[str, List[str]]] = _DICCIONARIOS.get("reformulaciones_por_dominio", {})
+
+
+# ═══════════════════════════════════════════════════════
+# UMBRALES POR DOMINIO
+# ═══════════════════════════════════════════════════════
+
+UMBRAL_AMPLITUD = 7
+
+# Ciencias básicas usan el umbral de diseño (7). En especialidades clínicas
+# mencionar un órgano suele ser parte de un cuadro concreto ("insuficiencia
+# renal aguda"), así que se exige más amplitud antes de reformular.
+UMBRALES_POR_DOMINIO = {
+    "anatomía": 7,
+    "histología": 7,
+    "embriología": 7,
+    "fisiología": 7,
+    "farmacología": 8,
+    "patología": 8,
+    "medicina general": 8,
+    "cardiología": 8,
+    "neumología": 8,
+    "nefrología": 8,
+    "gastroenterología": 8,
+    "neurología": 8,
 }
 
 
+def umbral_para_dominio(domain: str) -> int:
+    """Umbral de amplitud a partir del cual se reformula en `domain`."""
+    return UMBRALES_POR_DOMINIO.get(domain, UMBRAL_AMPLITUD)
+
+
 # ═══════════════════════════════════════════════════════
 # FUNCIONES PRINCIPALES
 # ═══════════════════════════════════════════════════════
 
+# Términos que indican que se pregunta por una parte concreta del órgano
+TERMINOS_ESPECIFICACION = [
+    "cámara", "camara", "válvula", "valvula", "arteria", "vena", "nervio",
+    "músculo", "musculo", "hueso", "lóbulo", "lobulo", "segmento",
+    "sistema de", "mecanismo", "proceso", "función de", "funcion de",
+    "irrigación", "irrigacion", "inervación", "inervacion"
+]
+
+# Excepciones al patrón "anatomía + órgano"
+TERMINOS_ANATOMIA_ESPECIFICA = [
+    "irrigación", "irrigacion", "inervación", "inervacion",
+    "cámara", "camara", "válvula", "valvula"
+]
+
+PATRONES_ULTRA_AMPLIOS = [
+    "todo sobre", "todo el", "toda la", "completo sobre",
+    "estructura completa", "anatomía completa", "fisiología completa"
+]
+
+# Términos que anulan el refuerzo por ausencia de especificidad
+TERMINOS_ESPECIFICOS = [
+    "dosis", "mecanismo", "causa", "síntoma", "signo",
+    "diagnóstico", "tratamiento", "anatomía de la",
+    "anatomía del", "irrigación", "inervación",
+    "ubicación", "relación", "función de", "efecto"
+]
+
+# Vector de features y pesos: score = min(Σ peso·feature, 10)
+FEATURES_AMPLITUD = (
+    "palabra_amplia",             # PALABRAS_AMPLIAS, "estructura + órgano" o "anatomía + órgano"
+    "organo_sin_especificacion",  # órgano completo sin parte/componente
+    "organo_con_especificacion",  # órgano con alguna especificación
+    "patron_ultra_amplio",        # "todo sobre", "estructura completa"...
+    "pregunta_corta_con_organo",  # ≤5 palabras y órgano principal
+    "sin_termino_especifico"      # refuerzo si ya hay señales de amplitud
+)
+PESOS_AMPLITUD = (3, 4, 1, 5, 2, 1)
+SCORE_MAXIMO = 10
+
+
+def _compilar_terminos(terminos) -> "re.Pattern":
+    """Compila una lista de términos literales en una sola búsqueda por alternancia."""
+    unicos = sorted(set(terminos), key=len, reverse=True)
+    if not unicos:
+        return re.compile(r"(?!)")  # nunca coincide
+    return re.compile("|".join(re.escape(t) for t in unicos))
+
+
+class ExtractorAmplitud:
+    """
+    Compila una vez los diccionarios de amplitud y extrae el vector de
+    features de una pregunta con una búsqueda por grupo de términos.
+    """
+
+    def __init__(self, organos, palabras_amplias):
+        self.re_palabras_amplias = _compilar_terminos(palabras_amplias)
+        self.re_organos = _compilar_terminos(organos)
+        # Los patrones compuestos sólo consideran los órganos principales
+        self.re_organos_principales = _compilar_terminos(organos[:15])
+        self.re_organos_cortos = _compilar_terminos(organos[:10])
+        self.re_anatomia = _compilar_terminos(["anatomia", "anatomía"])
+        self.re_anatomia_especifica = _compilar_terminos(TERMINOS_ANATOMIA_ESPECIFICA)
+        self.re_especificacion = _compilar_terminos(TERMINOS_ESPECIFICACION)
+        self.re_ultra_amplios = _compilar_terminos(PATRONES_ULTRA_AMPLIOS)
+        self.re_especificos = _compilar_terminos(TERMINOS_ESPECIFICOS)
+
+    def extraer(self, query_lower: str) -> Tuple[int, ...]:
+        """Vector de features (0/1) en el orden de FEATURES_AMPLITUD."""
+        organo_principal = self.re_organos_principales.search(query_lower) is not None
+
+        palabra_amplia = (
+            self.re_palabras_amplias.search(query_lower) is not None
+            or ("estructura" in query_lower and organo_principal)
+            or (organo_principal
+                and self.re_anatomia.search(query_lower) is not None
+                and self.re_anatomia_especifica.search(query_lower) is None)
+        )
+
+        organo = organo_principal or self.re_organos.search(query_lower) is not None
+        especificacion = organo and self.re_especificacion.search(query_lower) is not None
+        ultra_amplio = self.re_ultra_amplios.search(query_lower) is not None
+        corta = (
+            organo
+            and len(query_lower.split()) <= 5
+            and self.re_organos_cortos.search(query_lower) is not None
+        )
+        sin_especifico = (
+            (palabra_amplia or organo or ultra_amplio)
+            and self.re_especificos.search(query_lower) is None
+        )
+
+        return (
+            int(palabra_amplia),
+            int(organo and not especificacion),
+            int(especificacion),
+            int(ultra_amplio),
+            int(corta),
+            int(sin_especifico)
+        )
+
+
+_EXTRACTOR = ExtractorAmplitud(ORGANOS_AMPLIOS, PALABRAS_AMPLIAS)
+_PESOS_NP = np.array(PESOS_AMPLITUD, dtype=np.int16) if NUMPY_AVAILABLE else None
+
+
+def extraer_features(query: str) -> Tuple[int, ...]:
+    """Vector de features de amplitud de `query` (ver FEATURES_AMPLITUD)."""
+    return _EXTRACTOR.extraer(query.lower().strip())
+
+
+def _score(features) -> int:
+    return min(sum(p * f for p, f in zip(PESOS_AMPLITUD, features)), SCORE_MAXIMO)
+
+
 def detectar_amplitud(query: str, domain: str) -> int:
     """
     Detecta el nivel de amplitud semántica de una pregunta.
@@ -185,195 +225,126 @@ def detectar_amplitud(query: str, domain: str) -> int:
         - 9-10: Ultra amplia (reformular)
     """
     query_lower = query.lower().strip()
-    score = 0
-    
-    # DEBUG: Logging detallado
-    print(f"🔍 [AMPLITUD] Query analizada: '{query_lower}'")
-    print(f"🔍 [AMPLITUD] Dominio: '{domain}'")
-    
-    # ═══════════════════════════════════════════════════════
-    # DETECCIÓN 1: Palabras amplias (alta puntuación)
-    # ═══════════════════════════════════════════════════════
-    palabra_detectada = None
-    for palabra in PALABRAS_AMPLIAS:
-        if palabra in query_lower:
-            palabra_detectada = palabra
-            score += 3
-            print(f"🔍 [AMPLITUD] ✓ Palabra amplia detectada: '{palabra}' (+3 puntos)")
-            break  # Solo contar una vez
-    
-    # DETECCIÓN ADICIONAL: "estructura" + órgano (patrón común)
-    if not palabra_detectada:
-        if "estructura" in query_lower and any(organo in query_lower for organo in ORGANOS_AMPLIOS[:15]):
-            palabra_detectada = "estructura + órgano"
-            score += 3
-            print(f"🔍 [AMPLITUD] ✓ Patrón 'estructura + órgano' detectado (+3 puntos)")
-    
-    # DETECCIÓN ADICIONAL: "anatomia" / "anatomía" + órgano sin más especificación
-    if not palabra_detectada:
-        if ("anatomia" in query_lower or "anatomía" in query_lower) and any(organo in query_lower for organo in ORGANOS_AMPLIOS[:15]):
-            # Verificar que no tenga términos muy específicos
-            if not any(term in query_lower for term in ["irrigación", "irrigacion", "inervación", "inervacion", "cámara", "camara", "válvula", "valvula"]):
-                palabra_detectada = "anatomia + órgano"
-                score += 3
-                print(f"🔍 [AMPLITUD] ✓ Patrón 'anatomía + órgano' detectado (+3 puntos)")
-    
-    if not palabra_detectada:
-        print(f"🔍 [AMPLITUD] ✗ No se detectaron palabras amplias")
-    
-    # ═══════════════════════════════════════════════════════
-    # DETECCIÓN 2: Órganos completos sin especificar
-    # ═══════════════════════════════════════════════════════
-    organos_encontrados = []
-    for organo in ORGANOS_AMPLIOS:
-        if organo in query_lower:
-            organos_encontrados.append(organo)
-    
-    if organos_encontrados:
-        print(f"🔍 [AMPLITUD] ✓ Órganos detectados: {organos_encontrados}")
-        
-        # Si menciona órgano pero no especifica parte/componente
-        tiene_especificacion = any([
-            "cámara" in query_lower or "camara" in query_lower,
-            "válvula" in query_lower or "valvula" in query_lower,
-            "arteria" in query_lower,
-            "vena" in query_lower,
-            "nervio" in query_lower,
-            "músculo" in query_lower or "musculo" in query_lower,
-            "hueso" in query_lower,
-            "lóbulo" in query_lower or "lobulo" in query_lower,
-            "segmento" in query_lower,
-            "sistema de" in query_lower,
-            "mecanismo" in query_lower,
-            "proceso" in query_lower,
-            "función de" in query_lower or "funcion de" in query_lower,
-            "irrigación" in query_lower or "irrigacion" in query_lower,
-            "inervación" in query_lower or "inervacion" in query_lower
-        ])
-        
-        if not tiene_especificacion:
-            score += 4  # Órgano completo sin especificar
-            print(f"🔍 [AMPLITUD] ✗ Sin especificación (+4 puntos)")
-        else:
-            score += 1  # Órgano con alguna especificación (menos amplio)
-            print(f"🔍 [AMPLITUD] ✓ Con especificación (+1 punto)")
-    else:
-        print(f"🔍 [AMPLITUD] ✗ No se detectaron órganos amplios")
-    
-    # ═══════════════════════════════════════════════════════
-    # DETECCIÓN 3: Patrones de preguntas ultra amplias
-    # ═══════════════════════════════════════════════════════
-    patrones_ultra_amplios = [
-        r"todo sobre",
-        r"todo el",
-        r"toda la",
-        r"completo sobre",
-        r"estructura completa",
-        r"anatomía completa",
-        r"fisiología completa"
-    ]
-    
-    patron_detectado = None
-    for patron in patrones_ultra_amplios:
-        if re.search(patron, query_lower):
-            patron_detectado = patron
-            score += 5
-            print(f"🔍 [AMPLITUD] ✓ Patrón ultra amplio detectado: '{patron}' (+5 puntos)")
-            break
+    features = _EXTRACTOR.extraer(query_lower)
+    score_final = _score(features)
     
-    if not patron_detectado:
-        print(f"🔍 [AMPLITUD] ✗ No se detectaron patrones ultra amplios")
-    
-    # ═══════════════════════════════════════════════════════
-    # DETECCIÓN 4: Longitud de pregunta (preguntas muy cortas suelen ser amplias)
-    # ═══════════════════════════════════════════════════════
-    palabras = query_lower.split()
-    if len(palabras) <= 5 and any(organo in query_lower for organo in ORGANOS_AMPLIOS[:10]):
-        score += 2
+    activas = [name for name, f in zip(FEATURES_AMPLITUD, features) if f]
+    print(f"🔍 [AMPLITUD] '{query_lower[:80]}' ({domain}) → {score_final}/10 {activas}")
+    return score_final
+
+
+def score_many(queries: List[str]):
+    """
+    Score de amplitud para un lote de preguntas.
     
-    # ═══════════════════════════════════════════════════════
-    # DETECCIÓN 5: Ausencia de términos específicos
-    # ═══════════════════════════════════════════════════════
-    terminos_especificos = [
-        "dosis", "mecanismo", "causa", "síntoma", "signo",
-        "diagnóstico", "tratamiento", "anatomía de la",
-        "anatomía del", "irrigación", "inervación",
-        "ubicación", "relación", "función de", "efecto"
-    ]
+    Con NumPy arma la matriz de features (n × k) y calcula todos los scores
+    con un solo producto matricial; sin NumPy retorna una lista equivalente.
+    El costo es la extracción, una pregunta a la vez (búsquedas con `re`):
+    el producto matricial no hace al lote más rápido que detectar_amplitud
+    en un ciclo, sólo evita los prints y entrega los scores juntos.
+    """
+    filas = [_EXTRACTOR.extraer(q.lower().strip()) for q in queries]
     
-    tiene_termino_especifico = any(term in query_lower for term in terminos_especificos)
-    if not tiene_termino_especifico and score > 0:
-        score += 1  # Refuerza la amplitud si no hay términos específicos
-        print(f"🔍 [AMPLITUD] ✗ Sin términos específicos (+1 punto refuerzo)")
-    else:
-        if tiene_termino_especifico:
-            print(f"🔍 [AMPLITUD] ✓ Términos específicos detectados (sin refuerzo)")
+    if not NUMPY_AVAILABLE:
+        return [_score(fila) for fila in filas]
     
-    # Limitar score máximo a 10
-    score_final = min(score, 10)
-    print(f"🔍 [AMPLITUD] 📊 Score final: {score_final}/10 (threshold: 7)")
-    return score_final
+    matriz = np.array(filas, dtype=np.int16).reshape(len(filas), len(FEATURES_AMPLITUD))
+    return np.minimum(matriz @ _PESOS_NP, SCORE_MAXIMO)
 
 
-def generar_reformulacion(query: str, domain: str) -> str:
+# ═══════════════════════════════════════════════════════
+# ÍNDICE DE REFORMULACIONES (compilado al importar)
+# ═══════════════════════════════════════════════════════
+
+# Órganos en orden de prioridad, ya normalizados: [(original, normalizado)]
+_ORGANOS_NORM: List[Tuple[str, str]] = [(item, _norm(item)) for item in ORGANOS_AMPLIOS]
+
+# Claves de todos los dominios en orden de búsqueda: [(clave_normalizada, clave)]
+_CLAVES_NORM: List[Tuple[str, str]] = []
+
+# clave normalizada → reformulaciones (primer dominio que la define)
+_REFORMULACIONES_POR_CLAVE: Dict[str, List[str]] = {}
+for _dominio, _mapa in REFORMULACIONES_POR_DOMINIO.items():
+    for _clave, _lista in _mapa.items():
+        _clave_norm = _norm(_clave)
+        _CLAVES_NORM.append((_clave_norm, _clave))
+        _REFORMULACIONES_POR_CLAVE.setdefault(_clave_norm, _lista)
+
+# órgano normalizado → reformulaciones de anatomía (respaldo por órgano)
+_REFORMULACIONES_ANATOMIA: Dict[str, List[str]] = {
+    _norm(_clave): _lista
+    for _clave, _lista in (
+        REFORMULACIONES_POR_DOMINIO.get("anatomía") or REFORMULACIONES_POR_DOMINIO.get("anatomia") or {}
+    ).items()
+}
+
+CACHE_SUGERENCIAS_MAX = 512
+
+
+def _detectar_organo(query_norm: str) -> Tuple[Optional[str], Optional[List[str]]]:
     """
-    Genera mensaje educativo con reformulaciones específicas (ultra-concretas),
-    con matching insensible a acentos y dominio-agnóstico.
+    Órgano o clave detectada en la pregunta normalizada y sus reformulaciones
+    predefinidas (None si sólo se detectó el órgano o nada).
     """
-    query_norm = _norm(query)
-
-    # 1) Intentar detectar órgano por lista amplia (normalizada)
+    # 1) Órgano por lista amplia (normalizada)
     organo_detectado = None
-    organos_norm = [(item, _norm(item)) for item in ORGANOS_AMPLIOS]
-    for original, normed in organos_norm:
+    for original, normed in _ORGANOS_NORM:
         if normed and normed in query_norm:
             organo_detectado = original
             break
 
-    # 2) Buscar reformulaciones PREDEFINIDAS escaneando TODOS los dominios
+    # 2) Reformulaciones PREDEFINIDAS escaneando TODOS los dominios
+    for clave_norm, clave in _CLAVES_NORM:
+        if clave_norm in query_norm:
+            return clave, _REFORMULACIONES_POR_CLAVE[clave_norm]
+
+    # 3) Sin match por clave, pero sí órgano: lista de anatomía del órgano
+    if organo_detectado:
+        return organo_detectado, _REFORMULACIONES_ANATOMIA.get(_norm(organo_detectado))
+
+    return None, None
+
+
+@lru_cache(maxsize=CACHE_SUGERENCIAS_MAX)
+def _render_sugerencias(organo: Optional[str], domain: str) -> str:
+    """Bloque numerado de reformulaciones, memoizado por (órgano, dominio)."""
     reformulaciones = None
-    mejor_match_key = None
-    for dom, m in REFORMULACIONES_POR_DOMINIO.items():
-        for key, value in m.items():
-            if _norm(key) in query_norm:
-                reformulaciones = value
-                mejor_match_key = key
-                organo_detectado = key
-                break
-        if reformulaciones:
-            break
+    if organo:
+        clave_norm = _norm(organo)
+        reformulaciones = _REFORMULACIONES_POR_CLAVE.get(clave_norm) or _REFORMULACIONES_ANATOMIA.get(clave_norm)
 
-    # 3) Si no hubo match por clave, pero sí órgano, intentar mapa por órgano
-    if not reformulaciones and organo_detectado:
-        # Preferir las listas del dominio 'anatomía' si existen
-        anat_dict = REFORMULACIONES_POR_DOMINIO.get("anatomía") or REFORMULACIONES_POR_DOMINIO.get("anatomia")
-        if anat_dict:
-            # Buscar clave con o sin acentos
-            for key, value in anat_dict.items():
-                if _norm(key) == _norm(organo_detectado):
-                    reformulaciones = value
-                    mejor_match_key = key
-                    break
-
-    # 4) Si sigue sin haber predefinidas, generar genéricas (pero específicas)
+    # 4) Si no hay predefinidas, generar genéricas (pero específicas)
     if not reformulaciones:
-        # Intentar un nombre de órgano legible aún si venía normalizado
-        organo_legible = organo_detectado or "tema"
-        reformulaciones = _generar_reformulaciones_genericas(query_norm, domain, organo_legible)
+        # El texto normalizado nunca contiene "anatomía" acentuada: sólo decide el dominio
+        reformulaciones = _generar_reformulaciones_genericas("", domain, organo or "tema")
+
+    return "".join(f"{i}. {reformulacion}\n" for i, reformulacion in enumerate(reformulaciones[:5], 1))
+
+
+def generar_reformulacion(query: str, domain: str) -> str:
+    """
+    Genera mensaje educativo con reformulaciones específicas (ultra-concretas),
+    con matching insensible a acentos y dominio-agnóstico.
+    """
+    organo_detectado, _ = _detectar_organo(_norm(query))
+    sugerencias = _render_sugerencias(organo_detectado, domain)
 
     # 5) Construir mensaje educativo
-    mensaje = f"""💡 **Tu pregunta requiere mayor precisión clínica**
+    return f"""💡 **Tu pregunta requiere mayor precisión clínica**
 
 Tu consulta sobre **"{query}"** es médicamente válida, pero abarca un tema demasiado amplio que requeriría una respuesta extensa (potencialmente >3000 tokens).
 
 **📋 Reformulaciones sugeridas:**
-"""
+{sugerencias}
+**Sugerencia:** Copia una de las opciones anteriores para obtener una respuesta completa sin cortes."""
 
-    for i, reformulacion in enumerate(reformulaciones[:5], 1):
-        mensaje += f"{i}. {reformulacion}\n"
 
-    mensaje += "\n**Sugerencia:** Copia una de las opciones anteriores para obtener una respuesta completa sin cortes."
-    return mensaje
+def obtener_reformulaciones(query: str, domain: str) -> List[str]:
+    """Reformulaciones sugeridas para la pregunta, como lista de texto plano."""
+    organo_detectado, reformulaciones = _detectar_organo(_norm(query))
+    if reformulaciones:
+        return list(reformulaciones[:5])
+    return _generar_reformulaciones_genericas("", domain, organo_detectado or "tema")
 
 
 def _generar_reformulaciones_genericas(query_lower: str, domain: str, organo: str) -> List[str]:
@@ -421,25 +392,116 @@ def _generar_reformulaciones_genericas(query_lower: str, domain: str, organo: st
 # FUNCIÓN DE INTEGRACIÓN
 # ═══════════════════════════════════════════════════════
 
-def evaluar_y_reformular(query: str, domain: str) -> Tuple[bool, str]:
+def evaluar_y_reformular(query: str, domain: str, umbral: Optional[int] = None) -> Tuple[bool, str]:
     """
     Evalúa si la pregunta es demasiado amplia y retorna reformulación si es necesario.
     
     Args:
         query: Pregunta del usuario
         domain: Dominio médico detectado
+        umbral: Score mínimo para reformular (por defecto el del dominio)
     
     Returns:
         Tuple (es_amplia: bool, respuesta: str)
         - Si es_amplia=True: respuesta contiene reformulación educativa
         - Si es_amplia=False: respuesta es vacía (proceder a Mistral)
     """
+    if umbral is None:
+        umbral = umbral_para_dominio(domain)
+    
     amplitud_score = detectar_amplitud(query, domain)
     
-    # Threshold: score >= 7 requiere reformulación
-    if amplitud_score >= 7:
+    # Threshold: score >= umbral requiere reformulación
+    if amplitud_score >= umbral:
         reformulacion = generar_reformulacion(query, domain)
         return (True, reformulacion)
     
-    # Score < 7: pregunta específica, permitir Mistral
+    # Score < umbral: pregunta específica, permitir Mistral
     return (False, "")
+
+
+# ═══════════════════════════════════════════════════════
+# COMPUERTA EN EL PIPELINE DE PETICIONES
+# ═══════════════════════════════════════════════════════
+
+# Comandos especiales que nunca pasan por la compuerta: trabajan sobre notas
+# o piden explícitamente un tema amplio (modo estudio).
+COMANDOS_SIN_COMPUERTA = {
+    "revision_nota", "correccion_nota", "elaboracion_nota",
+    "valoracion", "calculo_dosis", "study_mode"
+}
+
+# Estimaciones para contabilizar lo que se ahorra al no llamar al proveedor:
+# prompt de sistema base (~2.2 KB) y una respuesta amplia típica (>3000 tokens,
+# ver mensaje de generar_reformulacion).
+TOKENS_PROMPT_SISTEMA_EST = 560
+TOKENS_RESPUESTA_AMPLIA_EST = 3000
+
+
+class CompuertaAmplitud:
+    """
+    Intercepta preguntas aprobadas pero demasiado amplias antes de llamar
+    al proveedor y lleva la cuenta de las llamadas y tokens evitados.
+    """
+
+    def __init__(self, umbrales: Optional[Dict[str, int]] = None):
+        self.umbrales = dict(UMBRALES_POR_DOMINIO if umbrales is None else umbrales)
+        self._lock = threading.Lock()
+        self._stats = {
+            "evaluated": 0,
+            "intercepted": 0,
+            "bypassed": 0,
+            "upstream_calls_avoided": 0,
+            "estimated_tokens_avoided": 0
+        }
+
+    def evaluar(self, question: str, classification: Dict) -> Optional[Dict]:
+        """
+        Retorna la respuesta de reformulación (mismo formato que Lisabella.ask)
+        si la pregunta debe interceptarse, o None para continuar al proveedor.
+        """
+        if classification.get("special_command") in COMANDOS_SIN_COMPUERTA or classification.get("note_analysis"):
+            self._incrementar(bypassed=1)
+            return None
+
+        domain = classification.get("domain") or "medicina general"
+        umbral = self.umbrales.get(domain, UMBRAL_AMPLITUD)
+        es_amplia, reformulacion = evaluar_y_reformular(question, domain, umbral=umbral)
+
+        if not es_amplia:
+            self._incrementar(evaluated=1)
+            return None
+
+        tokens_evitados = estimar_tokens(question) + TOKENS_PROMPT_SISTEMA_EST + TOKENS_RESPUESTA_AMPLIA_EST
+        self._incrementar(
+            evaluated=1,
+            intercepted=1,
+            upstream_calls_avoided=1,
+            estimated_tokens_avoided=tokens_evitados
+        )
+        return {
+            "status": "reformulate",
+            "domain": domain,
+            "reason": "amplitud",
+            "response": reformulacion
+        }
+
+    def sugerencia(self, question: str, classification: Dict) -> Optional[str]:
+        """Reformulación que daría evaluar, sin contabilizarla (vista previa de /classify)"""
+        if classification.get("special_command") in COMANDOS_SIN_COMPUERTA or classification.get("note_analysis"):
+            return None
+        domain = classification.get("domain") or "medicina general"
+        # Mismo criterio que detectar_amplitud, sin su registro por pregunta
+        if _score(extraer_features(question)) < self.umbrales.get(domain, UMBRAL_AMPLITUD):
+            return None
+        return generar_reformulacion(question, domain)
+
+    def _incrementar(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def get_stats(self) -> Dict[str, int]:
+        """Copia de los contadores (para /health)"""
+        with self._lock:
+            return dict(self._stats)
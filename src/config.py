@@ -7,6 +7,8 @@ DEEPSEEK_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 DEEPSEEK_TEMP = float(os.getenv("DEEPSEEK_TEMP", "0.3"))
 
+# Sin clave la app arranca igual (clasificación y respuestas locales); el
+# cliente de DeepSeek reporta el error en la primera llamada
 if not DEEPSEEK_KEY:
-    raise ValueError("⚠️ DEEPSEEK_KEY no configurada en .env")
+    print("⚠️ DEEPSEEK_API_KEY no configurada: las llamadas al proveedor fallarán")
 
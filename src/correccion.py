@@ -0,0 +1,148 @@
+"""
+Corrección de Notas por Ediciones (comando correccion_nota)
+===========================================================
+
+El modelo no reescribe la nota completa: devuelve una lista compacta de
+ediciones anclada a fragmentos exactos del texto original, un objeto JSON
+por línea:
+
+    {"buscar": "texto original", "reemplazar": "texto corregido", "motivo": "...", "tipo": "dosis"}
+
+El motor local valida el script (cada fragmento debe existir, en orden y sin
+traslaparse), lo aplica y genera la nota corregida y un diff resaltado. Así
+los tokens de salida crecen con el número de errores y no con el tamaño de
+la nota. Si el script no es válido se regresa None y se usa la reescritura
+completa de siempre.
+
+Se activa con CORRECCION_POR_EDICIONES=1 mientras se mide: la llamada del
+script no es streaming y un script inválido paga una segunda llamada.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+CORRECCION_POR_EDICIONES = os.environ.get("CORRECCION_POR_EDICIONES", "0").lower() in ("1", "true", "si", "sí")
+
+# Límite de ediciones por nota: más que esto ya no es "compacto"
+MAX_EDICIONES = 60
+# Respuestas de error de DeepSeekClient.generate (autenticación, conexión, saturación)
+PREFIJOS_ERROR = ("⚠️", "⏳")
+TIPOS_EDICION = ("formato", "ortografia", "dosis", "abreviatura", "claridad", "dato_faltante")
+
+# Comando al inicio de la pregunta ("corregir nota médica: ...")
+COMANDO_RE = re.compile(
+    r"^\s*(?:corregir|correcci[oó]n de|correcion de)\s+(?:la\s+)?nota(?:\s+m[eé]dica)?\s*[:\-]?\s*",
+    re.IGNORECASE
+)
+
+
+def extraer_nota(question: str) -> str:
+    """Texto de la nota sin el comando inicial"""
+    return COMANDO_RE.sub("", question, count=1).strip()
+
+
+def parsear_script(texto: str) -> Optional[List[Dict]]:
+    """
+    Lista de ediciones del modelo, o None si el formato no es válido.
+    Una respuesta {"sin_errores": true} es un script válido vacío.
+    """
+    ediciones = []
+    sin_errores = False
+    for linea in texto.splitlines():
+        linea = linea.strip().strip(",")
+        if not linea or linea.startswith("```"):
+            continue
+        try:
+            objeto = json.loads(linea)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(objeto, dict):
+            return None
+        if objeto.get("sin_errores") is True:
+            sin_errores = True
+            continue
+        if not isinstance(objeto.get("buscar"), str) or not isinstance(objeto.get("reemplazar"), str) \
+                or not objeto["buscar"]:
+            return None
+        ediciones.append({
+            "buscar": objeto["buscar"],
+            "reemplazar": objeto["reemplazar"],
+            "motivo": str(objeto.get("motivo", "")).strip(),
+            "tipo": objeto.get("tipo") if objeto.get("tipo") in TIPOS_EDICION else "formato"
+        })
+    if not ediciones and not sin_errores:
+        return None
+    if len(ediciones) > MAX_EDICIONES:
+        return None
+    return ediciones
+
+
+def anclar_ediciones(nota: str, ediciones: List[Dict]) -> Optional[List[Dict]]:
+    """
+    Posición de cada edición en la nota original. Cada fragmento se busca a
+    partir del final del anterior (orden de aparición); si alguno no existe
+    el script completo se rechaza.
+    """
+    ancladas = []
+    posicion = 0
+    for edicion in ediciones:
+        inicio = nota.find(edicion["buscar"], posicion)
+        if inicio == -1:
+            return None
+        fin = inicio + len(edicion["buscar"])
+        ancladas.append({**edicion, "inicio": inicio, "fin": fin, "linea": nota.count("\n", 0, inicio) + 1})
+        posicion = fin
+    return ancladas
+
+
+def aplicar_ediciones(nota: str, ancladas: List[Dict]) -> Dict[str, str]:
+    """Nota corregida y versión resaltada (~~original~~ **corregido**)"""
+    corregida, resaltada = [], []
+    posicion = 0
+    for e in ancladas:
+        corregida += [nota[posicion:e["inicio"]], e["reemplazar"]]
+        resaltada.append(nota[posicion:e["inicio"]])
+        if e["buscar"].strip():
+            resaltada.append(f"~~{e['buscar']}~~")
+        if e["reemplazar"].strip():
+            resaltada.append(f" **{e['reemplazar']}**")
+        posicion = e["fin"]
+    corregida.append(nota[posicion:])
+    resaltada.append(nota[posicion:])
+    return {"corregida": "".join(corregida), "resaltada": "".join(resaltada)}
+
+
+def formatear_correccion(ancladas: List[Dict], aplicada: Dict[str, str]) -> str:
+    """Respuesta con las mismas secciones que la reescritura completa"""
+    lineas = ["## ❌ Errores Detectados"]
+    if not ancladas:
+        lineas.append("No se detectaron errores que requieran corrección.")
+    for i, e in enumerate(ancladas, 1):
+        motivo = f" — {e['motivo']}" if e["motivo"] else ""
+        lineas.append(f"{i}. **Línea {e['linea']}** ({e['tipo']}): \"{e['buscar']}\" → \"{e['reemplazar']}\"{motivo}")
+
+    lineas += ["", "## ✅ Nota Corregida", "```", aplicada["corregida"], "```"]
+    if ancladas:
+        lineas += ["", "## 🔍 Cambios Resaltados", aplicada["resaltada"]]
+    return "\n".join(lineas)
+
+
+def corregir_con_script(nota: str, script: str) -> Optional[Dict]:
+    """
+    Valida y aplica el script del modelo. Retorna {"response", "ediciones"}
+    o None si el script no es válido (usar la reescritura completa).
+    """
+    ediciones = parsear_script(script)
+    if ediciones is None:
+        return None
+    ancladas = anclar_ediciones(nota, ediciones)
+    if ancladas is None:
+        return None
+    aplicada = aplicar_ediciones(nota, ancladas)
+    return {
+        "response": formatear_correccion(ancladas, aplicada),
+        "ediciones": len(ancladas),
+        "corregida": aplicada["corregida"]
+    }
@@ -1,14 +1,17 @@
+import importlib.util
 import os
+import threading
 import time
 import re
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
-# ✅ IMPORTACIÓN SEGURA PARA RENDER
-try:
-    from openai import OpenAI
-    DEEPSEEK_AVAILABLE = True
-except ImportError:
-    DEEPSEEK_AVAILABLE = False
+from src.degradacion import degradacion, es_error_saturacion
+from src.plantilla_nota import instrucciones_campos
+
+# ✅ IMPORTACIÓN DIFERIDA: el SDK (≈0.7 s de import) y el cliente se crean
+# en la primera llamada; sólo se verifica que el paquete exista
+DEEPSEEK_AVAILABLE = importlib.util.find_spec("openai") is not None
+if not DEEPSEEK_AVAILABLE:
     print("❌ DeepSeek (OpenAI) no disponible")
 
 # ✅ CONFIGURACIÓN SEGURA
@@ -20,29 +23,61 @@ except ImportError:
     DEEPSEEK_TEMP = float(os.environ.get("DEEPSEEK_TEMP", "0.3"))
 
 
-class DeepSeekClient:
-    def __init__(self):
-        if not DEEPSEEK_AVAILABLE:
-            raise Exception("DeepSeek (OpenAI) library no está instalada")
+# Antes de __STREAM_DONE__ si el proveedor cortó por max_tokens: la respuesta
+# se muestra pero no se guarda en los caches (almacén ni navegador)
+SENAL_TRUNCADA = "__STREAM_TRUNCATED__"
+# Inicio de los mensajes de error que generate_stream envía como último token
+ERRORES_STREAM = ("\n\n⏳ **Sistema temporalmente saturado**", "\n\n⚠️ **Error")
 
-        if not DEEPSEEK_KEY:
-            raise Exception("DEEPSEEK_API_KEY no configurada")
 
-        self.client = OpenAI(
-            api_key=DEEPSEEK_KEY,
-            base_url="https://api.deepseek.com"
-        )
+def _retry_after(error):
+    """Retry-After (segundos) de la respuesta HTTP del error del SDK, si existe"""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class DeepSeekClient:
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
         self.model = DEEPSEEK_MODEL
         self.temp = DEEPSEEK_TEMP
         self.max_retries = 3
         self.base_retry_delay = 2
         self.api_timeout = 90
 
-    def generate_stream(self, question, domain, special_command=None):
+    @property
+    def client(self):
+        """
+        Cliente OpenAI creado en la primera llamada. Si falla (SDK ausente,
+        sin API key) se lanza el error en esa llamada y se reintenta en la
+        siguiente: el worker nunca queda inutilizable.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if not DEEPSEEK_AVAILABLE:
+                        raise Exception("DeepSeek (OpenAI) library no está instalada")
+                    api_key = DEEPSEEK_KEY or os.environ.get("DEEPSEEK_API_KEY")
+                    if not api_key:
+                        raise Exception("API key de DeepSeek no configurada (DEEPSEEK_API_KEY)")
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+                    print("✅ Cliente DeepSeek inicializado")
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def generate_stream(self, question, domain, special_command=None, max_tokens=None):
         """
         🚀 Genera respuesta con STREAMING REAL de DeepSeek.
-        128K tokens disponibles - sin rate limits.
+        128K tokens disponibles salvo que el control de degradación los recorte.
         """
+        max_tokens = max_tokens or degradacion.max_tokens()
         system_msg = self._build_system_prompt(domain, special_command)
         user_msg = self._build_user_prompt(question, domain, special_command)
         
@@ -55,14 +90,20 @@ class DeepSeekClient:
                     {"role": "user", "content": user_msg}
                 ],
                 temperature=self.temp,
-                max_tokens=128000,  # ✅ 128K tokens disponibles
+                max_tokens=max_tokens,
                 stream=True
             )
             
             # Generator que envía cada chunk conforme llega
+            truncada = False
             for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    yield choice.delta.content
+                truncada = truncada or getattr(choice, "finish_reason", None) == "length"
+            degradacion.registrar(True)
+            if truncada:
+                yield SENAL_TRUNCADA
             
             # ✅ Señal de finalización
             yield "__STREAM_DONE__"
@@ -70,6 +111,8 @@ class DeepSeekClient:
                         
         except Exception as e:
             error_str = str(e).lower()
+            if es_error_saturacion(e):
+                degradacion.registrar(False, _retry_after(e))
             
             if "429" in str(e) or "rate" in error_str:
                 yield "\n\n⏳ **Sistema temporalmente saturado**\n\nEspera 1-2 minutos e intenta nuevamente."
@@ -83,7 +126,10 @@ class DeepSeekClient:
             yield "[STREAM_COMPLETE]"
 
     def generate(self, question, domain, special_command=None):
-        """Generar respuesta COMPLETA con retry automático"""
+        """
+        Generar respuesta COMPLETA con retry automático. Con el servicio
+        degradado no se reintenta: se responde de inmediato.
+        """
 
         for attempt in range(self.max_retries):
             try:
@@ -93,14 +139,16 @@ class DeepSeekClient:
                         question,
                         domain,
                         special_command,
-                        max_tokens=128000
+                        max_tokens=degradacion.max_tokens()
                     )
                     result = future.result(timeout=self.api_timeout)
+                degradacion.registrar(True)
                 return result
 
             except TimeoutError:
                 print(f"⏳ Timeout en intento {attempt + 1}/{self.max_retries}")
-                if attempt < self.max_retries - 1:
+                degradacion.registrar(False)
+                if attempt < self.max_retries - 1 and degradacion.permite_reintentos():
                     time.sleep(self.base_retry_delay)
                     continue
                 else:
@@ -108,9 +156,11 @@ class DeepSeekClient:
 
             except Exception as e:
                 error_str = str(e).lower()
+                if es_error_saturacion(e):
+                    degradacion.registrar(False, _retry_after(e))
 
                 if "429" in str(e) or "rate" in error_str:
-                    if attempt < self.max_retries - 1:
+                    if attempt < self.max_retries - 1 and degradacion.permite_reintentos():
                         retry_delay = self.base_retry_delay * (2 ** attempt)
                         print(f"⏳ Rate limit detectado. Reintentando en {retry_delay}s...")
                         time.sleep(retry_delay)
@@ -124,7 +174,7 @@ La API key de DeepSeek no es válida.
 **Verifica tu clave en https://platform.deepseek.com**"""
 
                 elif "network" in error_str or "connection" in error_str:
-                    if attempt < self.max_retries - 1:
+                    if attempt < self.max_retries - 1 and degradacion.permite_reintentos():
                         print(f"🔌 Error de conexión. Reintentando...")
                         time.sleep(2)
                         continue
@@ -139,6 +189,30 @@ No se pudo conectar con DeepSeek API."""
 
         return self._generate_rate_limit_message()
 
+    def generate_chunk(self, prompt, domain, max_tokens=1500):
+        """
+        Generar una sección acotada a partir de un prompt ya construido.
+        Usa el prompt base del dominio y un presupuesto de tokens pequeño.
+        """
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self._get_base_prompt(domain)},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temp,
+                max_tokens=min(max_tokens, degradacion.max_tokens()),
+                timeout=self.api_timeout
+            )
+        except Exception as e:
+            if es_error_saturacion(e):
+                degradacion.registrar(False, _retry_after(e))
+            raise
+        degradacion.registrar(True)
+
+        return response.choices[0].message.content
+
     def _call_deepseek_api(self, question, domain, special_command, max_tokens=128000):
         """Llamada real a la API de DeepSeek"""
         system_msg = self._build_system_prompt(domain, special_command)
@@ -155,6 +229,10 @@ No se pudo conectar con DeepSeek API."""
         )
 
         return response.choices[0].message.content
+
+    def _build_system_prompt(self, domain, special_command=None):
+        """Construir system prompt especializado por comando o dominio"""
+        
         if special_command == "revision_nota":
             return """Eres un auditor médico certificado especializado en revisión de notas médicas.
 
@@ -230,6 +308,45 @@ No se pudo conectar con DeepSeek API."""
 
 **NO agregues mensajes sobre formato corregido al final.**"""
 
+        elif special_command == "revision_nota_juicio":
+            return """Eres un auditor médico certificado (JCI, Clínica Mayo, COFEPRIS NOM-004-SSA3-2012).
+
+Recibes el RESUMEN ESTRUCTURADO de una nota médica: el checklist de componentes
+presentes/faltantes YA FUE EVALUADO y entregado al usuario, junto con los
+fragmentos de análisis y plan.
+
+**NO repitas los componentes presentes ni faltantes.** Responde sólo con:
+
+## ⚠️ Errores Detectados
+[Errores de formato, abreviaturas no estándar, dosis fuera de rango, vía o frecuencia incorrecta]
+
+## 📋 Cumplimiento Legal
+- COFEPRIS: [%]
+- Joint Commission: [%]
+- Clínica Mayo: [%]
+
+## 💡 Recomendaciones
+[Prioritarias y opcionales, considerando los faltantes críticos]
+
+**NO agregues mensajes sobre formato corregido al final.**"""
+
+        elif special_command == "correccion_nota_ediciones":
+            return """Eres un corrector especializado de notas médicas (JCI, Clínica Mayo, COFEPRIS).
+
+**NO reescribas la nota.** Devuelve SOLO la lista de ediciones, un objeto JSON por línea,
+en el orden en que aparecen en la nota:
+{"buscar": "fragmento EXACTO de la nota", "reemplazar": "texto corregido", "motivo": "explicación breve", "tipo": "formato|ortografia|dosis|abreviatura|claridad|dato_faltante"}
+
+REGLAS:
+- "buscar" se copia carácter por carácter de la nota (mayúsculas, acentos y espacios incluidos)
+  y debe ser lo bastante largo para no confundirse con otro fragmento.
+- "reemplazar" contiene el fragmento completo ya corregido; para agregar un dato faltante,
+  usa como "buscar" el texto junto al que va y repítelo en "reemplazar" con el dato agregado.
+- Corrige errores de formato, ortografía médica, abreviaturas ambiguas, dosis, unidades,
+  vía y frecuencia. Si un dato no se proporcionó, usa [COMPLETAR].
+- Sin markdown, sin texto adicional ni bloques de código.
+- Si la nota no tiene errores, responde exactamente: {"sin_errores": true}"""
+
         elif special_command == "correccion_nota":
             return """Eres un corrector especializado de notas médicas.
 
@@ -376,6 +493,33 @@ Firma y Sello del Médico
 **USA ESTA PLANTILLA** y completa con los datos proporcionados. Si falta información, deja [COMPLETAR].
 **NO agregues mensajes sobre formato corregido al final.**"""
 
+        elif special_command == "elaboracion_nota_campos":
+            return f"""Eres un asistente que elabora notas médicas SOAP según estándares JCI, Clínica Mayo y COFEPRIS.
+
+La plantilla de la nota se rellena localmente. **Devuelve SOLO los valores de los campos**,
+un objeto JSON por línea, en este orden: {{"campo": valor}}
+
+CAMPOS:
+{instrucciones_campos()}
+
+REGLAS:
+- Una línea por campo, sin markdown, sin texto adicional ni bloques de código.
+- Los campos marcados como lista son arreglos JSON de cadenas.
+- NO inventes datos: omite el campo si la información no se proporcionó.
+- Diagnósticos, justificación y plan deben ser congruentes con los datos del paciente."""
+
+        elif special_command == "secciones":
+            return f"""Eres Lisabella, un asistente médico especializado en ciencias de la salud.
+Tu área de expertise actual es: **{domain}**
+
+El usuario indica la ENTRADA una sola vez y un MANIFIESTO de secciones.
+Responde TODAS las secciones del manifiesto, en orden, iniciando cada una con su
+encabezado `## ` exacto. Dentro de cada sección usa ### o negritas, nunca ##.
+
+Rigor científico, terminología médica correcta, dosis específicas y fuentes
+verificables (Harrison's, Goldman-Cecil, UpToDate, guías ESC/AHA, NOM-004-SSA3-2012).
+**NO agregues mensajes sobre formato al final de tu respuesta.**"""
+
         elif special_command == "valoracion":
             return """Eres un médico consultor especializado en apoyo diagnóstico según estándares de Clínica Mayo y UpToDate.
 
@@ -507,7 +651,8 @@ Responde con profundidad académica pero claridad expositiva.
 
     def _build_user_prompt(self, question, domain, special_command=None):
         """Construir user prompt según comando"""
-        if special_command in ["revision_nota", "correccion_nota", "elaboracion_nota", "valoracion"]:
+        if special_command in ["revision_nota", "revision_nota_juicio", "correccion_nota", "elaboracion_nota",
+                               "elaboracion_nota_campos", "correccion_nota_ediciones", "secciones", "valoracion"]:
             return question
         else:
             return f"""PREGUNTA MÉDICA ({domain}):
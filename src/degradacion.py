@@ -0,0 +1,291 @@
+"""
+Degradación Escalonada ante Saturación del Proveedor
+====================================================
+
+Cuando DeepSeek empieza a responder 429, `generate` dormía y reintentaba y
+el usuario recibía el aviso de saturación después de minutos. Este
+controlador observa la tasa de errores de saturación recientes (429,
+timeouts, conexión) y la profundidad de la cola de generación, y recorta el
+servicio por niveles:
+
+    0 normal
+    1 recorte      max_tokens reducido, sin reintentos con espera
+    2 sin_partes   además se desactivan los modos de varias llamadas/secciones
+                   (expand, secciones, chunks)
+    3 cache        además se sirven respuestas recientes casi idénticas con aviso
+    4 rechazo      las generaciones nuevas se rechazan de inmediato con un ETA
+                   calculado a partir de la ventana de errores
+
+Se recupera solo: el nivel se recalcula al leerse y baja un escalón por
+periodo de enfriamiento conforme los errores salen de la ventana.
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from src.fair import generacion
+from src.lanes import CarrilSaturado
+
+DEGRADACION_ACTIVA = os.environ.get("DEGRADACION_ACTIVA", "1").lower() in ("1", "true", "si", "sí")
+DEGRADACION_VENTANA_S = float(os.environ.get("DEGRADACION_VENTANA_S", "60"))
+DEGRADACION_ENFRIAMIENTO_S = float(os.environ.get("DEGRADACION_ENFRIAMIENTO_S", "15"))
+DEGRADACION_MAX_TOKENS = int(os.environ.get("DEGRADACION_MAX_TOKENS", "4000"))
+
+MAX_TOKENS_NORMAL = 128000
+# Muestras mínimas en la ventana antes de juzgar la tasa de errores
+MIN_MUESTRAS = 5
+# Tasa de errores de saturación → nivel (se toma el mayor que se cumpla)
+UMBRALES_ERROR = ((0.8, 4), (0.6, 3), (0.4, 2), (0.2, 1))
+# Ocupación de la cola de generación → nivel (la cola llena ya rechaza por sí misma)
+UMBRALES_COLA = ((1.0, 2), (0.5, 1))
+
+NIVELES = ("normal", "recorte", "sin_partes", "cache", "rechazo")
+NIVEL_RECORTE, NIVEL_SIN_PARTES, NIVEL_CACHE, NIVEL_RECHAZO = 1, 2, 3, 4
+
+CACHE_MAX_ENTRADAS = 256
+CACHE_TTL_S = 6 * 3600
+CACHE_SIMILITUD = 0.8
+AVISO_CACHE = ("> ⚠️ **Servicio saturado**: esta es la respuesta a una consulta muy similar "
+               "hecha recientemente. Vuelve a preguntar en unos minutos para una respuesta nueva.\n\n")
+
+_PALABRA_RE = re.compile(r"\w+")
+
+
+class ProveedorDegradado(CarrilSaturado):
+    """Nivel de rechazo: el proveedor está saturado; reintentar en `retry_after` s"""
+
+
+def es_error_saturacion(error) -> bool:
+    """429, límite de tasa, timeouts y errores de conexión/servidor del proveedor"""
+    texto = str(error).lower()
+    return any(marca in texto for marca in ("429", "rate", "timeout", "timed out", "overload",
+                                            "503", "502", "connection", "network"))
+
+
+def _palabras(texto: str) -> frozenset:
+    """Palabras de ≥ 3 letras, en minúsculas y sin acentos"""
+    plano = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return frozenset(p for p in _PALABRA_RE.findall(plano) if len(p) > 2)
+
+
+# ═══════════════════════════════════════════════════════
+# CACHE DE RESPUESTAS RECIENTES (coincidencia aproximada)
+# ═══════════════════════════════════════════════════════
+
+class CacheRespuestas:
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS, ttl_s=CACHE_TTL_S, similitud=CACHE_SIMILITUD,
+                 reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self.similitud = similitud
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def guardar(self, question, domain, special_command, respuesta):
+        palabras = _palabras(question)
+        if not palabras or not respuesta:
+            return
+        clave = (domain, special_command, palabras)
+        with self._lock:
+            self._entradas[clave] = (respuesta, self._reloj())
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def buscar(self, question, domain, special_command) -> Optional[str]:
+        """Respuesta con Jaccard ≥ `similitud` sobre las palabras de la pregunta, o None"""
+        palabras = _palabras(question)
+        ahora = self._reloj()
+        mejor, mejor_similitud = None, self.similitud
+        with self._lock:
+            for (d, c, otras), (respuesta, guardada) in list(self._entradas.items()):
+                if ahora - guardada > self.ttl_s:
+                    del self._entradas[(d, c, otras)]
+                    continue
+                if d != domain or c != special_command:
+                    continue
+                similitud = len(palabras & otras) / max(len(palabras | otras), 1)
+                if similitud >= mejor_similitud:
+                    mejor, mejor_similitud = respuesta, similitud
+            if mejor is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+        return mejor
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+# ═══════════════════════════════════════════════════════
+# CONTROLADOR
+# ═══════════════════════════════════════════════════════
+
+class ControlDegradacion:
+    def __init__(self, cola=None, ventana_s=DEGRADACION_VENTANA_S, enfriamiento_s=DEGRADACION_ENFRIAMIENTO_S,
+                 max_tokens=DEGRADACION_MAX_TOKENS, activa=DEGRADACION_ACTIVA, reloj=time.monotonic):
+        """`cola`: función que retorna get_stats() del carril de generación"""
+        self.cola = cola
+        self.ventana_s = ventana_s
+        self.enfriamiento_s = enfriamiento_s
+        self.max_tokens_recorte = max_tokens
+        self.activa = activa
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._eventos = deque()
+        self._nivel = 0
+        self._cambio = reloj()
+        self._espera_proveedor = 0.0
+        self.cache = CacheRespuestas(reloj=reloj)
+        self.rechazadas = 0
+        self.servidas_cache = 0
+        self.cambios = 0
+
+    # ─── Observaciones del proveedor ───
+
+    def registrar(self, exito, retry_after=None):
+        """Resultado de una llamada al proveedor (sólo éxito o error de saturación)"""
+        ahora = self._reloj()
+        with self._lock:
+            self._eventos.append((ahora, not exito))
+            if retry_after:
+                self._espera_proveedor = max(self._espera_proveedor, ahora + float(retry_after))
+
+    def _purgar(self, ahora):
+        while self._eventos and ahora - self._eventos[0][0] >= self.ventana_s:
+            self._eventos.popleft()
+
+    @staticmethod
+    def _nivel_por_tasa(errores, muestras):
+        if muestras < MIN_MUESTRAS:
+            return 0
+        tasa = errores / muestras
+        return next((nivel for umbral, nivel in UMBRALES_ERROR if tasa >= umbral), 0)
+
+    def _nivel_por_cola(self):
+        if not self.cola:
+            return 0
+        stats = self.cola()
+        ocupacion = stats["en_cola"] / max(stats["max_cola"], 1)
+        return next((nivel for umbral, nivel in UMBRALES_COLA if ocupacion >= umbral), 0)
+
+    @property
+    def nivel(self) -> int:
+        """Nivel actual; sube de inmediato y baja un escalón por enfriamiento"""
+        if not self.activa:
+            return 0
+        ahora = self._reloj()
+        with self._lock:
+            self._purgar(ahora)
+            errores = sum(1 for _, error in self._eventos if error)
+            objetivo = max(self._nivel_por_tasa(errores, len(self._eventos)), self._nivel_por_cola())
+            if objetivo > self._nivel:
+                self._cambiar(objetivo, ahora)
+            elif objetivo < self._nivel and ahora - self._cambio >= self.enfriamiento_s:
+                self._cambiar(self._nivel - 1, ahora)
+            return self._nivel
+
+    def _cambiar(self, nivel, ahora):
+        print(f"🚦 Degradación: {NIVELES[self._nivel]} → {NIVELES[nivel]}")
+        self._nivel = nivel
+        self._cambio = ahora
+        self.cambios += 1
+
+    def eta(self) -> int:
+        """
+        Segundos hasta salir del nivel de rechazo: lo que tardan en salir de la
+        ventana los errores que lo sostienen, más un enfriamiento, sin bajar
+        del Retry-After que haya pedido el proveedor.
+        """
+        ahora = self._reloj()
+        with self._lock:
+            self._purgar(ahora)
+            eventos = list(self._eventos)
+            espera_proveedor = self._espera_proveedor - ahora
+        errores = sum(1 for _, error in eventos if error)
+        restantes = len(eventos)
+        salida = ahora
+        for instante, error in eventos:
+            if self._nivel_por_tasa(errores, restantes) < NIVEL_RECHAZO:
+                break
+            salida = instante + self.ventana_s
+            errores -= error
+            restantes -= 1
+        return max(1, int(max(salida - ahora + self.enfriamiento_s, espera_proveedor)) + 1)
+
+    # ─── Decisiones ───
+
+    def max_tokens(self) -> int:
+        return self.max_tokens_recorte if self.nivel >= NIVEL_RECORTE else MAX_TOKENS_NORMAL
+
+    def permite_reintentos(self) -> bool:
+        """Reintentos con espera sólo en nivel normal: degradado, fallar rápido"""
+        return self.nivel < NIVEL_RECORTE
+
+    def permite_partes(self) -> bool:
+        """Modos de varias llamadas o secciones (expand, secciones, chunks)"""
+        return self.nivel < NIVEL_SIN_PARTES
+
+    def admitir(self, question, domain, special_command) -> Optional[Dict]:
+        """
+        Antes de ocupar el carril de generación. Retorna una respuesta de cache
+        (nivel ≥ cache), None para generar normalmente, o lanza
+        ProveedorDegradado en nivel de rechazo sin coincidencia.
+        """
+        nivel = self.nivel
+        if nivel < NIVEL_CACHE:
+            return None
+        respuesta = self.cache.buscar(question, domain, special_command) if special_command is None else None
+        if respuesta:
+            self.servidas_cache += 1
+            return {
+                "status": "success",
+                "domain": domain,
+                "special_command": special_command,
+                "degraded": NIVELES[nivel],
+                "response": AVISO_CACHE + respuesta
+            }
+        if nivel >= NIVEL_RECHAZO:
+            self.rechazadas += 1
+            raise ProveedorDegradado("proveedor", self.eta())
+        return None
+
+    def guardar(self, question, domain, special_command, respuesta):
+        """
+        Respuesta exitosa para servirla en niveles de cache/rechazo. Sólo
+        preguntas sin comando: notas y casos son de un paciente concreto y una
+        nota "casi igual" puede diferir justo en la dosis.
+        """
+        if special_command is None and respuesta and not respuesta.lstrip().startswith(("⚠️", "⏳")):
+            self.cache.guardar(question, domain, special_command, respuesta)
+
+    def get_stats(self):
+        nivel = self.nivel
+        with self._lock:
+            muestras = len(self._eventos)
+            errores = sum(1 for _, error in self._eventos if error)
+        return {
+            "nivel": nivel,
+            "nombre": NIVELES[nivel],
+            "activa": self.activa,
+            "muestras_ventana": muestras,
+            "tasa_error": round(errores / muestras, 3) if muestras else 0.0,
+            "max_tokens": self.max_tokens_recorte if nivel >= NIVEL_RECORTE else MAX_TOKENS_NORMAL,
+            "eta_s": self.eta() if nivel >= NIVEL_RECHAZO else 0,
+            "cambios": self.cambios,
+            "rechazadas": self.rechazadas,
+            "servidas_cache": self.servidas_cache,
+            "cache": {"entradas": len(self.cache), "aciertos": self.cache.aciertos, "fallos": self.cache.fallos}
+        }
+
+
+# Controlador del proceso (un worker de gunicorn)
+degradacion = ControlDegradacion(cola=generacion.get_stats)
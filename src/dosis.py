@@ -0,0 +1,262 @@
+"""
+Motor Local de Cálculo de Dosis (comando calculo_dosis)
+=======================================================
+
+Resuelve el cálculo mg/kg de los fármacos comunes con una tabla versionada
+(data/drugs.json) sin llamar al proveedor. Si no logra interpretar peso,
+edad o fármaco, o el caso requiere juicio clínico (ajuste renal, edad fuera
+de rango), devuelve None y la pregunta continúa al LLM.
+
+Ante la duda se deriva: un peso sin "kg" o en otra unidad (libras, gramos)
+y una edad desconocida en fármacos con edad mínima no se calculan.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from src.amplitud_detector import _norm
+
+DRUGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "drugs.json")
+
+# Las preguntas de dosis son cortas; no normalizar notas completas
+MAX_DOSIS_CHARS = 2000
+
+# Patrones sobre texto normalizado (minúsculas, sin acentos)
+_NUMERO = r"(\d+(?:[.,]\d+)?)"
+PESO_RE = re.compile(_NUMERO + r"\s*(?:kg|kgs|kilos?|kilogramos?)\b")
+# Peso mencionado sin kg ("peso 44", "44 libras", "3500 g"): no se adivina la unidad
+PESO_ETIQUETA_RE = re.compile(r"\bpeso\s*(?:de|:)?\s*" + _NUMERO)
+# Los gramos no: "1 g" suele ser la dosis; "peso 3500 g" ya cae en PESO_ETIQUETA_RE
+PESO_LIBRAS_RE = re.compile(_NUMERO + r"\s*(?:lbs?|libras?)\b")
+EDAD_RE = re.compile(_NUMERO + r"\s*(anos?|meses|mes|semanas?|dias?)\b")
+NEONATO_RE = re.compile(r"\b(recien nacidos?|neonatos?|neonatal|rn)\b")
+MESES_POR_UNIDAD = {"ano": 12, "mes": 1, "sem": 7 / 30.4, "dia": 1 / 30.4}
+RENAL_RE = re.compile(
+    r"\b(tfg|filtrado glomerular|filtracion glomerular|depuracion|aclaramiento|"
+    r"insuficiencia renal|enfermedad renal|falla renal|lesion renal|erc|irc|dialisis|hemodialisis)\b"
+)
+
+PESO_MIN_KG, PESO_MAX_KG = 0.3, 250
+EDAD_MAX_MESES = 120 * 12
+
+
+def _cargar_tabla(path: str) -> Dict:
+    """Cargar tabla de fármacos con manejo de errores"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Archivo no encontrado: {path}")
+        return {}
+    except json.JSONDecodeError:
+        print(f"⚠️ Error al decodificar JSON: {path}")
+        return {}
+
+
+def _numero(texto: str) -> float:
+    return float(texto.replace(",", "."))
+
+
+def _mg(valor: float) -> str:
+    """Redondeo clínico: décimas por debajo de 10 mg, enteros por encima"""
+    valor = round(valor, 1) if valor < 10 else round(valor)
+    return f"{valor:g} mg"
+
+
+class CalculadoraDosis:
+    """
+    Calcula dosis por peso (o dosis de adulto) para los fármacos de la tabla
+    y lleva la cuenta de respuestas locales y derivaciones al proveedor.
+    """
+
+    def __init__(self, path: str = DRUGS_PATH):
+        tabla = _cargar_tabla(path)
+        self.version = tabla.get("version", "sin versión")
+        self.farmacos = tabla.get("farmacos", {})
+
+        sinonimos = {
+            _norm(sinonimo): clave
+            for clave, datos in self.farmacos.items()
+            for sinonimo in datos.get("sinonimos", [clave])
+        }
+        self._por_sinonimo = sinonimos
+        alternativas = "|".join(sorted(map(re.escape, sinonimos), key=len, reverse=True)) or "(?!)"
+        self._farmaco_re = re.compile(r"\b(" + alternativas + r")\b")
+
+        self._lock = threading.Lock()
+        self._stats = {"evaluated": 0, "answered": 0, "fallback": 0}
+
+    # ═══════════════════════════════════════════════════════
+    # INTERPRETACIÓN DE LA PREGUNTA
+    # ═══════════════════════════════════════════════════════
+
+    def interpretar(self, question: str) -> Dict:
+        """
+        Extrae fármaco, peso (kg), edad (meses) y mención de función renal;
+        "peso_ambiguo" si hay un peso que no está en kg
+        """
+        texto = _norm(question[:MAX_DOSIS_CHARS])
+
+        farmacos = {self._por_sinonimo[m] for m in self._farmaco_re.findall(texto)}
+
+        peso = PESO_RE.search(texto)
+        peso_kg = _numero(peso.group(1)) if peso else None
+        if peso_kg is not None and not PESO_MIN_KG <= peso_kg <= PESO_MAX_KG:
+            peso_kg = None
+        peso_ambiguo = bool(PESO_LIBRAS_RE.search(texto)) or (
+            peso is None and bool(PESO_ETIQUETA_RE.search(texto)))
+
+        edad = EDAD_RE.search(texto)
+        edad_meses = None
+        if edad:
+            edad_meses = _numero(edad.group(1)) * MESES_POR_UNIDAD[edad.group(2)[:3]]
+            if edad_meses > EDAD_MAX_MESES:
+                edad_meses = None
+        elif NEONATO_RE.search(texto):
+            edad_meses = 0.0
+
+        return {
+            # Con varios fármacos en la misma pregunta se deriva al LLM
+            "farmaco": next(iter(farmacos)) if len(farmacos) == 1 else None,
+            "peso_kg": peso_kg,
+            "peso_ambiguo": peso_ambiguo,
+            "edad_meses": edad_meses,
+            "renal": bool(RENAL_RE.search(texto))
+        }
+
+    # ═══════════════════════════════════════════════════════
+    # CÁLCULO
+    # ═══════════════════════════════════════════════════════
+
+    def calcular(self, farmaco: str, peso_kg: Optional[float] = None,
+                 edad_meses: Optional[float] = None) -> Optional[Dict]:
+        """
+        Dosis por toma y diaria (mínima/máxima) con topes de la tabla, o
+        None si el caso no se puede resolver localmente.
+        """
+        datos = self.farmacos.get(farmaco)
+        if not datos:
+            return None
+        if edad_meses is not None and edad_meses < datos.get("edad_min_meses", 0):
+            return None
+
+        if peso_kg is not None:
+            intervalo = datos["intervalo_h"]
+            tomas = max(1, 24 // intervalo)
+            if "mg_kg_dosis" in datos:
+                minima, maxima = (mg_kg * peso_kg for mg_kg in datos["mg_kg_dosis"])
+                esquema = f"{datos['mg_kg_dosis'][0]:g}-{datos['mg_kg_dosis'][1]:g} mg/kg/dosis"
+            else:
+                minima, maxima = (mg_kg * peso_kg / tomas for mg_kg in datos["mg_kg_dia"])
+                esquema = f"{datos['mg_kg_dia'][0]:g}-{datos['mg_kg_dia'][1]:g} mg/kg/día"
+            base = "peso"
+        elif edad_meses is not None and edad_meses >= 18 * 12 and "dosis_adulto" in datos:
+            intervalo = datos["dosis_adulto"]["intervalo_h"]
+            tomas = max(1, 24 // intervalo)
+            minima, maxima = datos["dosis_adulto"]["mg"]
+            esquema = "dosis de adulto"
+            base = "adulto"
+        else:
+            return None
+
+        # Topes: por toma, por kg/día y diario absoluto
+        tope_dia = datos.get("max_mg_dia", float("inf"))
+        if peso_kg is not None and "max_mg_kg_dia" in datos:
+            tope_dia = min(tope_dia, datos["max_mg_kg_dia"] * peso_kg)
+        tope_toma = min(datos.get("dosis_max_mg", float("inf")), tope_dia / tomas)
+
+        limitada = maxima > tope_toma
+        minima, maxima = min(minima, tope_toma), min(maxima, tope_toma)
+
+        return {
+            "farmaco": farmaco,
+            "nombre": datos.get("nombre", farmaco),
+            "via": datos.get("via", ""),
+            "base": base,
+            "esquema": esquema,
+            "intervalo_h": intervalo,
+            "tomas_dia": tomas,
+            "dosis_min_mg": minima,
+            "dosis_max_mg": maxima,
+            "diaria_min_mg": minima * tomas,
+            "diaria_max_mg": maxima * tomas,
+            "limitada_por_maximo": limitada,
+            "ajuste_renal": datos.get("ajuste_renal", False),
+            "nota": datos.get("nota"),
+            "fuente": datos.get("fuente", ""),
+            "version": self.version
+        }
+
+    def responder(self, question: str) -> Optional[str]:
+        """Respuesta en markdown calculada localmente, o None para usar el LLM"""
+        datos = self.interpretar(question)
+        calculo = None
+        farmaco = self.farmacos.get(datos["farmaco"]) if datos["farmaco"] else None
+        # Función renal alterada, peso en otra unidad o edad desconocida con
+        # edad mínima: requieren juicio clínico
+        if farmaco and not (datos["renal"] and farmaco.get("ajuste_renal")) and not datos["peso_ambiguo"] \
+                and not (datos["edad_meses"] is None and farmaco.get("edad_min_meses", 0) > 0):
+            calculo = self.calcular(datos["farmaco"], datos["peso_kg"], datos["edad_meses"])
+
+        if not calculo:
+            self._incrementar(evaluated=1, fallback=1)
+            return None
+
+        self._incrementar(evaluated=1, answered=1)
+        return self._formatear(calculo, datos)
+
+    def _formatear(self, c: Dict, datos: Dict) -> str:
+        paciente = []
+        if datos["peso_kg"] is not None:
+            paciente.append(f"{datos['peso_kg']:g} kg")
+        if datos["edad_meses"] is not None:
+            meses = datos["edad_meses"]
+            if meses >= 24:
+                paciente.append(f"{meses / 12:g} años")
+            elif meses >= 1:
+                paciente.append(f"{meses:g} meses")
+            elif meses == 0:
+                paciente.append("recién nacido")
+            else:
+                paciente.append(f"{round(meses * 30.4)} días")
+
+        lineas = [
+            f"## 💊 Cálculo de Dosis: {c['nombre']}",
+            "",
+            f"**Paciente**: {' · '.join(paciente)}",
+            f"**Esquema**: {c['esquema']} {c['via']} cada {c['intervalo_h']} h",
+            "",
+            "| | Mínima | Máxima |",
+            "|---|---|---|",
+            f"| Por dosis | {_mg(c['dosis_min_mg'])} | {_mg(c['dosis_max_mg'])} |",
+            f"| Diaria ({c['tomas_dia']} dosis) | {_mg(c['diaria_min_mg'])} | {_mg(c['diaria_max_mg'])} |"
+        ]
+        avisos = []
+        if c["limitada_por_maximo"]:
+            avisos.append("⚠️ La dosis calculada por peso alcanza la dosis máxima permitida; se muestra el tope.")
+        if c["ajuste_renal"]:
+            avisos.append("⚠️ Requiere ajuste en función renal alterada: verificar TFG antes de prescribir.")
+        if c["nota"]:
+            avisos.append(f"📝 {c['nota']}")
+        if avisos:
+            lineas += [""] + avisos
+        lineas += [
+            "",
+            f"📚 **Fuente**: {c['fuente']} (tabla de dosis v{c['version']})",
+            "",
+            "*Cálculo local determinístico. Confirmar indicación, alergias y ficha técnica antes de prescribir.*"
+        ]
+        return "\n".join(lineas)
+
+    def _incrementar(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def get_stats(self) -> Dict:
+        """Copia de los contadores (para /health)"""
+        with self._lock:
+            return {**self._stats, "version": self.version}
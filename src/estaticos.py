@@ -0,0 +1,265 @@
+"""
+Frontend Precomprimido
+======================
+
+home() servía templates/lisabella.html (~50 KB) con send_static_file: sin
+compresión, leída del disco en cada carga y con un ETag derivado del mtime.
+Aquí la página se prepara una vez:
+
+- Los <script src="..."> locales (templates/render.js) se incrustan: la
+  página sigue siendo una sola respuesta precomprimida.
+- Minificación conservadora: comentarios y espacios de HTML y CSS, e
+  indentación, líneas vacías y comentarios de línea completa del JS. Las
+  líneas dentro de template literals de varias líneas no se tocan.
+- Variantes gzip y brotli (si el paquete `brotli` está instalado) con ETag
+  fuerte por variante; home() elige por Accept-Encoding y responde 304 si el
+  navegador ya la tiene.
+- Las variantes se guardan en data/frontend/ con la firma (mtime y tamaño)
+  de la fuente y sus scripts, y quedan en memoria; con preload las comparte
+  el maestro de gunicorn con todos los workers.
+
+`python -m src.estaticos` las genera en el build; si faltan o la fuente
+cambió, se regeneran al arrancar.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from flask import Response
+
+# ✅ brotli es opcional: sin él se sirven gzip e identity
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUENTE = os.path.join(ROOT_DIR, "templates", "lisabella.html")
+DIST_DIR = os.path.join(ROOT_DIR, "data", "frontend")
+
+# Sin URLs con huella, la página se revalida siempre; el 304 no lleva cuerpo
+CACHE_CONTROL = "no-cache"
+
+# Orden de preferencia cuando el navegador acepta varias con la misma calidad
+CODIFICACIONES = ("br", "gzip")
+EXTENSIONES = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+
+class Variante(NamedTuple):
+    cuerpo: bytes
+    etag: str
+    codificacion: str
+
+
+# ═══════════════════════════════════════════════════════
+# MINIFICACIÓN
+# ═══════════════════════════════════════════════════════
+
+_BLOQUE_RE = re.compile(r"(<(script|style|textarea|pre)\b[^>]*>)(.*?)(</\2>)", re.S | re.I)
+_SCRIPT_LOCAL_RE = re.compile(r'<script src="([\w.-]+\.js)"></script>')
+_COMENTARIO_HTML_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+_COMENTARIO_CSS_RE = re.compile(r"/\*.*?\*/", re.S)
+_ESPACIOS_RE = re.compile(r"\s+")
+_CSS_SEPARADORES_RE = re.compile(r"\s*([{};])\s*")
+_CSS_DOS_PUNTOS_RE = re.compile(r":\s+")
+
+
+def _minificar_css(css: str) -> str:
+    css = _COMENTARIO_CSS_RE.sub("", css)
+    css = _ESPACIOS_RE.sub(" ", css)
+    css = _CSS_SEPARADORES_RE.sub(r"\1", css)
+    return _CSS_DOS_PUNTOS_RE.sub(":", css).replace(";}", "}").strip()
+
+
+def _backticks(linea: str) -> int:
+    """Backticks sin escapar de una línea"""
+    return len(re.findall(r"(?<!\\)`", linea))
+
+
+def _minificar_js(js: str) -> str:
+    """
+    Por líneas y conservando los saltos (no depende de la inserción
+    automática de punto y coma): sin indentación, líneas vacías ni
+    comentarios de línea completa (// y bloques /* */ que empiezan la
+    línea), salvo dentro de template literals.
+    """
+    lineas = []
+    en_plantilla = en_comentario = False
+    for linea in js.split("\n"):
+        limpia = linea.strip()
+        if en_plantilla:
+            lineas.append(linea)
+        elif en_comentario or (limpia.startswith("/*") and ("*/" not in limpia or limpia.endswith("*/"))):
+            en_comentario = "*/" not in limpia
+            continue
+        elif limpia and not limpia.startswith("//"):
+            lineas.append(limpia)
+        if _backticks(linea) % 2:
+            en_plantilla = not en_plantilla
+    return "\n".join(lineas)
+
+
+def _scripts_locales(html, directorio):
+    return [n for n in _SCRIPT_LOCAL_RE.findall(html) if os.path.isfile(os.path.join(directorio, n))]
+
+
+def incrustar(html: str, directorio: str) -> str:
+    """<script src="x.js"> de `directorio` → el script en línea"""
+    locales = set(_scripts_locales(html, directorio))
+
+    def reemplazar(match):
+        if match.group(1) not in locales:
+            return match.group(0)
+        with open(os.path.join(directorio, match.group(1)), "r", encoding="utf-8") as f:
+            return f"<script>\n{f.read()}\n</script>"
+
+    return _SCRIPT_LOCAL_RE.sub(reemplazar, html)
+
+
+def minificar(html: str) -> str:
+    """HTML con su CSS y JS en línea minificados (ver docstring del módulo)"""
+    bloques = []
+
+    def apartar(match):
+        apertura, etiqueta, contenido, cierre = match.groups()
+        etiqueta = etiqueta.lower()
+        if etiqueta == "style":
+            contenido = _minificar_css(contenido)
+        elif etiqueta == "script":
+            contenido = _minificar_js(contenido)
+        bloques.append(apertura + contenido + cierre)
+        return f"\x00{len(bloques) - 1}\x00"
+
+    html = _BLOQUE_RE.sub(apartar, html)
+    html = _COMENTARIO_HTML_RE.sub("", html)
+    html = _ESPACIOS_RE.sub(" ", html).strip()
+    return re.sub(r"\x00(\d+)\x00", lambda m: bloques[int(m.group(1))], html)
+
+
+# ═══════════════════════════════════════════════════════
+# CONSTRUCCIÓN Y CARGA
+# ═══════════════════════════════════════════════════════
+
+def _firma(fuente):
+    """mtime y tamaño de la página y de los scripts que incrusta"""
+    directorio = os.path.dirname(fuente)
+    with open(fuente, "r", encoding="utf-8") as f:
+        rutas = [fuente] + [os.path.join(directorio, n) for n in _scripts_locales(f.read(), directorio)]
+    return [[os.stat(r).st_mtime_ns, os.stat(r).st_size] for r in rutas]
+
+
+def _nombre(fuente, codificacion):
+    return os.path.basename(fuente) + EXTENSIONES[codificacion]
+
+
+def construir(fuente=FUENTE, destino=DIST_DIR) -> Dict[str, Variante]:
+    """Minifica y comprime la página; guarda las variantes en `destino` si se puede"""
+    firma = _firma(fuente)
+    with open(fuente, "r", encoding="utf-8") as f:
+        pagina = minificar(incrustar(f.read(), os.path.dirname(fuente))).encode("utf-8")
+    huella = hashlib.sha256(pagina).hexdigest()[:16]
+    cuerpos = {"identity": pagina, "gzip": gzip.compress(pagina, compresslevel=9, mtime=0)}
+    if BROTLI_AVAILABLE:
+        cuerpos["br"] = brotli.compress(pagina, mode=brotli.MODE_TEXT, quality=11)
+    try:
+        os.makedirs(destino, exist_ok=True)
+        for codificacion, cuerpo in cuerpos.items():
+            with open(os.path.join(destino, _nombre(fuente, codificacion)), "wb") as f:
+                f.write(cuerpo)
+        manifiesto = {"firma": firma, "huella": huella, "codificaciones": sorted(cuerpos)}
+        with open(os.path.join(destino, _nombre(fuente, "identity") + ".json"), "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f)
+    except OSError as e:
+        print(f"⚠️ No se pudieron guardar las variantes del frontend: {e}")
+    return _variantes(cuerpos, huella)
+
+
+def _variantes(cuerpos, huella):
+    # ETag fuerte distinto por representación (RFC 9110 §8.8.3)
+    return {c: Variante(cuerpo, huella if c == "identity" else f"{huella}-{c}", c) for c, cuerpo in cuerpos.items()}
+
+
+def _leer(fuente, destino) -> Optional[Dict[str, Variante]]:
+    """Variantes guardadas, o None si faltan o la fuente cambió"""
+    try:
+        with open(os.path.join(destino, _nombre(fuente, "identity") + ".json"), "r", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+        if manifiesto["firma"] != _firma(fuente):
+            return None
+        cuerpos = {}
+        for codificacion in manifiesto["codificaciones"]:
+            with open(os.path.join(destino, _nombre(fuente, codificacion)), "rb") as f:
+                cuerpos[codificacion] = f.read()
+        return _variantes(cuerpos, manifiesto["huella"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+_actuales: Optional[Dict[str, Variante]] = None
+_lock = threading.Lock()
+
+
+def cargar(fuente=FUENTE, destino=DIST_DIR) -> Dict[str, Variante]:
+    """Variantes en memoria del proceso (se leen o construyen en el primer uso)"""
+    global _actuales
+    if _actuales is not None:
+        return _actuales
+    with _lock:
+        if _actuales is None:
+            inicio = time.perf_counter()
+            variantes = _leer(fuente, destino)
+            origen = "data/frontend"
+            if variantes is None:
+                variantes = construir(fuente, destino)
+                origen = "templates (construidas)"
+            tamanos = ", ".join(f"{c} {len(v.cuerpo) / 1024:.1f} KB" for c, v in variantes.items())
+            print(f"🗜️ Frontend desde {origen} en {(time.perf_counter() - inicio) * 1000:.1f} ms: {tamanos}")
+            _actuales = variantes
+    return _actuales
+
+
+def precargar():
+    """cargar() al importar la app; un fallo no la detiene (home() responde 404)"""
+    try:
+        cargar()
+    except OSError as e:
+        print(f"⚠️ Frontend no disponible: {e}")
+
+
+# ═══════════════════════════════════════════════════════
+# RESPUESTA
+# ═══════════════════════════════════════════════════════
+
+def elegir(variantes, accept_encodings) -> Variante:
+    """Variante más comprimida que acepta el navegador (identity si ninguna)"""
+    disponibles = [c for c in CODIFICACIONES if c in variantes]
+    mejor = accept_encodings.best_match(disponibles) if disponibles else None
+    return variantes[mejor] if mejor else variantes["identity"]
+
+
+def respuesta(request) -> Response:
+    """Página para `request`: variante por Accept-Encoding, 304 si If-None-Match coincide"""
+    variante = elegir(cargar(), request.accept_encodings)
+    if request.if_none_match.contains_weak(variante.etag):
+        response = Response(status=304)
+    else:
+        response = Response(variante.cuerpo, mimetype="text/html")
+        if variante.codificacion != "identity":
+            response.headers["Content-Encoding"] = variante.codificacion
+    response.set_etag(variante.etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+if __name__ == "__main__":
+    for codificacion, variante in construir().items():
+        print(f"  {_nombre(FUENTE, codificacion):<24} {len(variante.cuerpo):>7,} bytes  ETag \"{variante.etag}\"")
@@ -0,0 +1,259 @@
+"""
+Planificador Justo del Carril de Generación
+===========================================
+
+Un solo cliente que pega notas en bucle podía ocupar todos los lugares de
+generación. Este planificador reemplaza la cola FIFO del carril:
+
+- Cola justa ponderada (start-time fair queuing): cada petición recibe una
+  etiqueta de inicio max(V, fin_anterior_del_cliente) y termina en
+  inicio + costo/peso; al liberarse un lugar pasa la etiqueta menor. Un
+  cliente con muchas peticiones en cola no adelanta a los demás.
+- Límite de peticiones simultáneas y en cola por cliente.
+- Ventana deslizante en memoria (peticiones por cliente en N segundos).
+
+Lo que excede la parte del cliente se rechaza de inmediato con
+ClienteExcedido (429 + retry_after); la cola global llena sigue siendo
+CarrilSaturado (503).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from src.lanes import (LANE_GENERACION_COLA, LANE_GENERACION_ESPERA, LANE_GENERACION_MAX,
+                       CarrilSaturado)
+
+FAIR_MAX_POR_CLIENTE = int(os.environ.get("FAIR_MAX_POR_CLIENTE", "2"))
+FAIR_COLA_POR_CLIENTE = int(os.environ.get("FAIR_COLA_POR_CLIENTE", "1"))
+FAIR_VENTANA_S = float(os.environ.get("FAIR_VENTANA_S", "60"))
+FAIR_MAX_POR_VENTANA = int(os.environ.get("FAIR_MAX_POR_VENTANA", "20"))
+# "clave1:3,clave2:2" → API keys conocidas con su peso; el resto pesa 1
+FAIR_API_KEYS = os.environ.get("FAIR_API_KEYS", "")
+# Proxies de confianza delante de la app (como x_for de ProxyFix); 0 = usar la IP de la conexión
+TRUST_PROXY_HOPS = int(os.environ.get("TRUST_PROXY_HOPS", "0"))
+
+PESO_API = 2.0
+PESO_IP = 1.0
+MAX_CLIENTES = 10000
+MUESTRAS_ESPERA = 512
+
+
+class ClienteExcedido(CarrilSaturado):
+    """El cliente excede su parte (concurrencia, cola o ventana)"""
+
+
+def _cargar_api_keys(valor):
+    claves = {}
+    for parte in valor.split(","):
+        clave, _, peso = parte.strip().partition(":")
+        if clave:
+            claves[clave] = float(peso) if peso else PESO_API
+    return claves
+
+
+API_KEYS = _cargar_api_keys(FAIR_API_KEYS)
+
+
+def identificar_cliente(request):
+    """
+    (cliente, clase, peso) de una petición Flask. Una API key conocida
+    (X-API-Key) identifica al cliente; si no, la IP. X-Forwarded-For sólo se
+    usa con TRUST_PROXY_HOPS > 0: la IP real es la que agregó el proxy de
+    confianza más externo (N-ésima desde la derecha). Sin proxies el
+    encabezado lo controla el cliente y se ignora.
+    """
+    clave = request.headers.get("X-API-Key", "")
+    if clave in API_KEYS:
+        return "key:" + hashlib.sha256(clave.encode()).hexdigest()[:12], "api", API_KEYS[clave]
+    ip = request.remote_addr or "desconocido"
+    if TRUST_PROXY_HOPS > 0:
+        reenviadas = [p.strip() for p in request.headers.get("X-Forwarded-For", "").split(",") if p.strip()]
+        if len(reenviadas) >= TRUST_PROXY_HOPS:
+            ip = reenviadas[-TRUST_PROXY_HOPS]
+    return "ip:" + ip, "ip", PESO_IP
+
+
+class _Turno:
+    __slots__ = ("cliente", "clase", "inicio_virtual", "fin_virtual", "llegada", "asignado")
+
+    def __init__(self, cliente, clase, inicio_virtual, fin_virtual):
+        self.cliente = cliente
+        self.clase = clase
+        self.inicio_virtual = inicio_virtual
+        self.fin_virtual = fin_virtual
+        self.llegada = time.perf_counter()
+        self.asignado = False
+
+
+class _EstadisticasClase:
+    def __init__(self):
+        self.atendidas = 0
+        self.rechazadas = 0
+        self.esperas = deque(maxlen=MUESTRAS_ESPERA)
+        self.espera_max = 0.0
+
+    def to_dict(self):
+        esperas = sorted(self.esperas)
+        p95 = esperas[int(len(esperas) * 0.95) - 1] if esperas else 0.0
+        return {
+            "atendidas": self.atendidas,
+            "rechazadas": self.rechazadas,
+            "espera_promedio_ms": round(sum(esperas) * 1000 / max(len(esperas), 1), 2),
+            "espera_p95_ms": round(p95 * 1000, 2),
+            "espera_max_ms": round(self.espera_max * 1000, 2)
+        }
+
+
+class PlanificadorJusto:
+    def __init__(self, nombre, max_concurrentes, max_cola, espera_max=None, retry_after=10,
+                 max_por_cliente=FAIR_MAX_POR_CLIENTE, cola_por_cliente=FAIR_COLA_POR_CLIENTE,
+                 ventana_s=FAIR_VENTANA_S, max_por_ventana=FAIR_MAX_POR_VENTANA):
+        self.nombre = nombre
+        self.max_concurrentes = max_concurrentes
+        self.max_cola = max_cola
+        self.espera_max = espera_max
+        self.retry_after = retry_after
+        self.max_por_cliente = max_por_cliente
+        self.cola_por_cliente = cola_por_cliente
+        self.ventana_s = ventana_s
+        self.max_por_ventana = max_por_ventana
+
+        self._cond = threading.Condition()
+        self._cola = []
+        self._virtual = 0.0
+        self._fin_cliente = {}
+        self._en_curso_cliente = defaultdict(int)
+        self._en_cola_cliente = defaultdict(int)
+        self._ventanas = defaultdict(deque)
+        self._clases = defaultdict(_EstadisticasClase)
+        self.en_curso = 0
+        self.max_cola_observada = 0
+        self.rechazadas = 0
+
+    # ═══════════════════════════════════════════════════════
+    # ADMISIÓN
+    # ═══════════════════════════════════════════════════════
+
+    def _rechazar(self, clase, error):
+        self.rechazadas += 1
+        self._clases[clase].rechazadas += 1
+        raise error
+
+    def _admitir(self, cliente, clase, ahora):
+        ventana = self._ventanas[cliente]
+        while ventana and ahora - ventana[0] >= self.ventana_s:
+            ventana.popleft()
+        if len(ventana) >= self.max_por_ventana:
+            retry = int(self.ventana_s - (ahora - ventana[0])) + 1
+            self._rechazar(clase, ClienteExcedido(self.nombre, retry))
+
+        ocupados = self._en_curso_cliente[cliente] + self._en_cola_cliente[cliente]
+        if ocupados >= self.max_por_cliente + self.cola_por_cliente:
+            self._rechazar(clase, ClienteExcedido(self.nombre, self.retry_after))
+        if self.en_curso >= self.max_concurrentes and len(self._cola) >= self.max_cola:
+            self._rechazar(clase, CarrilSaturado(self.nombre, self.retry_after))
+        ventana.append(ahora)
+
+    def _purgar_clientes(self, ahora):
+        """Olvida clientes inactivos para acotar la memoria"""
+        if len(self._ventanas) <= MAX_CLIENTES:
+            return
+        for cliente in list(self._ventanas):
+            ventana = self._ventanas[cliente]
+            if (not ventana or ahora - ventana[-1] >= self.ventana_s) and not (
+                    self._en_curso_cliente.get(cliente) or self._en_cola_cliente.get(cliente)):
+                del self._ventanas[cliente]
+                self._fin_cliente.pop(cliente, None)
+                self._en_curso_cliente.pop(cliente, None)
+                self._en_cola_cliente.pop(cliente, None)
+
+    # ═══════════════════════════════════════════════════════
+    # DESPACHO
+    # ═══════════════════════════════════════════════════════
+
+    def _despachar(self):
+        """Asigna lugares libres a la etiqueta de inicio menor elegible"""
+        while self.en_curso < self.max_concurrentes:
+            elegibles = [t for t in self._cola if self._en_curso_cliente[t.cliente] < self.max_por_cliente]
+            if not elegibles:
+                return
+            turno = min(elegibles, key=lambda t: (t.inicio_virtual, t.llegada))
+            self._cola.remove(turno)
+            self._ocupar(turno)
+
+    def _ocupar(self, turno):
+        turno.asignado = True
+        self._virtual = max(self._virtual, turno.inicio_virtual)
+        self._en_cola_cliente[turno.cliente] -= 1
+        self._en_curso_cliente[turno.cliente] += 1
+        self.en_curso += 1
+        espera = time.perf_counter() - turno.llegada
+        estadisticas = self._clases[turno.clase]
+        estadisticas.atendidas += 1
+        estadisticas.esperas.append(espera)
+        estadisticas.espera_max = max(estadisticas.espera_max, espera)
+        self._cond.notify_all()
+
+    def liberar(self, turno):
+        with self._cond:
+            self.en_curso -= 1
+            self._en_curso_cliente[turno.cliente] -= 1
+            self._despachar()
+
+    @contextmanager
+    def turno(self, cliente="anonimo", clase="ip", peso=PESO_IP, costo=1.0):
+        """Ocupa un lugar mientras dura el bloque (ver `entrar`)"""
+        turno = self.entrar(cliente, clase, peso, costo)
+        try:
+            yield turno
+        finally:
+            self.liberar(turno)
+
+    def entrar(self, cliente="anonimo", clase="ip", peso=PESO_IP, costo=1.0):
+        """
+        Espera el turno justo del cliente y ocupa un lugar hasta `liberar`.
+        `costo` permite cobrar más a las entradas grandes.
+        """
+        ahora = time.monotonic()
+        with self._cond:
+            self._admitir(cliente, clase, ahora)
+            self._purgar_clientes(ahora)
+            inicio = max(self._virtual, self._fin_cliente.get(cliente, 0.0))
+            turno = _Turno(cliente, clase, inicio, inicio + costo / peso)
+            self._fin_cliente[cliente] = turno.fin_virtual
+            self._en_cola_cliente[cliente] += 1
+            self._cola.append(turno)
+            self.max_cola_observada = max(self.max_cola_observada, len(self._cola))
+            self._despachar()
+
+            limite = None if self.espera_max is None else time.monotonic() + self.espera_max
+            while not turno.asignado:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    self._cola.remove(turno)
+                    self._en_cola_cliente[cliente] -= 1
+                    self._rechazar(clase, CarrilSaturado(self.nombre, self.retry_after))
+                self._cond.wait(restante)
+        return turno
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "en_curso": self.en_curso,
+                "en_cola": len(self._cola),
+                "max_concurrentes": self.max_concurrentes,
+                "max_cola": self.max_cola,
+                "max_cola_observada": self.max_cola_observada,
+                "rechazadas": self.rechazadas,
+                "clientes_activos": sum(1 for n in self._en_curso_cliente.values() if n),
+                "clases": {clase: e.to_dict() for clase, e in self._clases.items()}
+            }
+
+
+# Carril de generación del proceso (un worker de gunicorn)
+generacion = PlanificadorJusto("generacion", LANE_GENERACION_MAX, LANE_GENERACION_COLA,
+                               espera_max=LANE_GENERACION_ESPERA)
@@ -0,0 +1,105 @@
+"""
+Carriles de Ejecución
+=====================
+
+Con workers gthread cada petición ocupa un hilo. Sin límites, unas cuantas
+generaciones largas (streams de 60 s) ocupan todos los hilos y una pregunta
+rechazada en microsegundos espera detrás de ellas.
+
+Dos carriles por proceso:
+- rapido: respuestas sin proveedor (rechazo/reformulación, amplitud, dosis
+  local, /health, HTML estático).
+- generacion: llamadas al proveedor, con concurrencia y cola acotadas; lo que
+  excede la cola se rechaza de inmediato en lugar de ocupar un hilo. Su cola
+  es justa por cliente (ver src/fair.py).
+
+GUNICORN_THREADS debe ser ≥ generacion (max + cola) + rapido (max) para que
+el carril rápido siempre tenga hilos libres.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LANE_RAPIDO_MAX = int(os.environ.get("LANE_RAPIDO_MAX", "4"))
+LANE_GENERACION_MAX = int(os.environ.get("LANE_GENERACION_MAX", "10"))
+LANE_GENERACION_COLA = int(os.environ.get("LANE_GENERACION_COLA", "2"))
+LANE_GENERACION_ESPERA = float(os.environ.get("LANE_GENERACION_ESPERA", "30"))
+
+
+class CarrilSaturado(Exception):
+    """El carril no tiene lugar ni en cola; reintentar después de `retry_after` s"""
+
+    def __init__(self, carril, retry_after):
+        super().__init__(f"Carril {carril} saturado")
+        self.carril = carril
+        self.retry_after = retry_after
+
+
+class Carril:
+    def __init__(self, nombre, max_concurrentes, max_cola, espera_max=None, retry_after=5):
+        self.nombre = nombre
+        self.max_concurrentes = max_concurrentes
+        self.max_cola = max_cola
+        self.espera_max = espera_max
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_concurrentes)
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.en_cola = 0
+        self.max_cola_observada = 0
+        self.atendidas = 0
+        self.rechazadas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def _rechazar(self):
+        self.rechazadas += 1
+        raise CarrilSaturado(self.nombre, self.retry_after)
+
+    @contextmanager
+    def turno(self):
+        """Ocupa un lugar del carril mientras dura el bloque (incluido un stream)"""
+        with self._lock:
+            if self.en_curso >= self.max_concurrentes and self.en_cola >= self.max_cola:
+                self._rechazar()
+            self.en_cola += 1
+            self.max_cola_observada = max(self.max_cola_observada, self.en_cola)
+
+        inicio = time.perf_counter()
+        obtenido = self._slots.acquire(timeout=self.espera_max)
+        espera = time.perf_counter() - inicio
+
+        with self._lock:
+            self.en_cola -= 1
+            if not obtenido:
+                self._rechazar()
+            self.en_curso += 1
+            self.atendidas += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+            self._slots.release()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "en_curso": self.en_curso,
+                "en_cola": self.en_cola,
+                "max_concurrentes": self.max_concurrentes,
+                "max_cola": self.max_cola,
+                "max_cola_observada": self.max_cola_observada,
+                "atendidas": self.atendidas,
+                "rechazadas": self.rechazadas,
+                "espera_promedio_ms": round(self._espera_total * 1000 / max(self.atendidas, 1), 2),
+                "espera_max_ms": round(self._espera_max * 1000, 2)
+            }
+
+
+# Carril rápido del proceso (un worker de gunicorn); el de generación está en src/fair.py
+rapido = Carril("rapido", LANE_RAPIDO_MAX, max_cola=64, espera_max=5, retry_after=1)
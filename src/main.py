@@ -2,19 +2,44 @@ import sys
 sys.path.insert(0, '/home/ray/lisabella')
 
 from src.wrapper import Wrapper, Result
-from src.deepseek import DeepSeekClient
+from src.deepseek import ERRORES_STREAM, DeepSeekClient
+from src.amplitud_detector import CompuertaAmplitud
+from src.planner import QueryPlanner
+from src.dosis import CalculadoraDosis
+from src.nota_parser import revisar_nota
+from src.plantilla_nota import NOTA_POR_CAMPOS, renderizar_respuesta
+from src.correccion import CORRECCION_POR_EDICIONES, PREFIJOS_ERROR, corregir_con_script, extraer_nota
+from src.mapreduce import MapReduceNotas
+from src.tokens import estimar_tokens
+from src.degradacion import degradacion
+from src.secciones import (SECCIONES_ESPECIALES, SECCIONES_UNA_LLAMADA, DivisorSecciones,
+                           ahorro_entrada, construir_prompt, titulos_de)
 
 class Lisabella:
     def __init__(self):
         self.wrapper = Wrapper()
         self.mistral = DeepSeekClient()
+        self.amplitud = CompuertaAmplitud()
+        self.planner = QueryPlanner(self.mistral)
+        self.dosis = CalculadoraDosis()
+        self.mapreduce = MapReduceNotas(self.mistral)
+        self.nota_por_campos = NOTA_POR_CAMPOS
+        self.correccion_por_ediciones = CORRECCION_POR_EDICIONES
+        self.secciones_una_llamada = SECCIONES_UNA_LLAMADA
     
-    def ask(self, question):
-        """Procesar pregunta end-to-end con manejo robusto de errores y comandos especiales"""
+    def ask(self, question, mode=None, classification=None, local_checked=False):
+        """
+        Procesar pregunta end-to-end con manejo robusto de errores y comandos especiales.
+        mode="expand": las preguntas amplias se responden por partes en paralelo.
+        mode="secciones": los comandos especiales se responden por secciones en una sola llamada.
+        classification/local_checked: el endpoint ya clasificó y descartó las
+        respuestas locales (dosis, amplitud) en el carril rápido; no se repiten.
+        """
         
         try:
-            # Clasificar pregunta
-            classification = self.wrapper.classify(question)
+            # Clasificar pregunta (salvo que el endpoint ya lo hizo)
+            if classification is None:
+                classification = self.wrapper.classify(question)
             result = classification["result"]
             
             # ═══════════════════════════════════════════════════════
@@ -55,28 +80,84 @@ class Lisabella:
                 print(f"⚠️ Domain no definido, usando fallback: {domain}")
             
             # Detectar comando especial
-            special_command = classification.get("special_command")
-            note_analysis = classification.get("note_analysis", False)
+            special_command = self.special_command_for(classification)
+            
+            # Modo expand: responder la pregunta amplia por partes en paralelo
+            subquestions = self.plan_expansion(question, domain, special_command, mode)
+            if subquestions:
+                return {
+                    "status": "success",
+                    "domain": domain,
+                    "confidence": classification.get("confidence", 0.80),
+                    "mode": "expand",
+                    "response": self.planner.answer(question, domain, subquestions)
+                }
             
-            # Si es análisis de nota médica (detección automática)
-            if note_analysis and not special_command:
-                special_command = "valoracion"  # Por defecto, valorar la nota
+            if not local_checked:
+                # Cálculo de dosis resuelto localmente con la tabla de fármacos
+                dosis_response = self.check_dosis(question, classification)
+                if dosis_response:
+                    return dosis_response
+                
+                # Interceptar preguntas demasiado amplias antes de gastar tokens
+                amplitud_response = self.check_amplitude(question, classification)
+                if amplitud_response:
+                    return amplitud_response
+            
+            # Modo secciones: entrada enviada una vez, respuesta dividida localmente
+            if self.uses_sections(special_command, mode):
+                sections = list(self.generate_sections(question, domain, special_command))
+                return {
+                    "status": "success",
+                    "domain": domain,
+                    "confidence": classification.get("confidence", 0.80),
+                    "special_command": special_command,
+                    "mode": "secciones",
+                    "input_tokens": self.section_savings(question, domain, special_command),
+                    "response": "\n\n".join(f"{s['title']}\n\n{s['content']}".strip() for s in sections)
+                }
             
             # Generar respuesta
             try:
-                response = self.mistral.generate(
-                    question=question,
-                    domain=domain,
-                    special_command=special_command
-                )
+                revision = self.review_note_locally(question, special_command)
+                correccion = self.correct_note_with_edits(question, domain, special_command)
+                condensada = None if revision else self.condense_long_note(question, domain, special_command)
+                if correccion:
+                    # Corrección por ediciones: nota corregida y diff generados localmente
+                    response = correccion["response"]
+                elif self.uses_field_template(special_command):
+                    # Elaboración por campos: el modelo sólo devuelve valores
+                    response = renderizar_respuesta(self.mistral.generate(
+                        question=question,
+                        domain=domain,
+                        special_command="elaboracion_nota_campos"
+                    ))
+                elif revision:
+                    # Revisión de nota: checklist local + sólo el juicio clínico al proveedor
+                    response = revision["componentes"] + "\n\n" + self.mistral.generate(
+                        question=revision["prompt"],
+                        domain=domain,
+                        special_command="revision_nota_juicio"
+                    )
+                else:
+                    # Notas largas: el comando final corre sobre la versión condensada
+                    response = self.mistral.generate(
+                        question=condensada["condensada"] if condensada else question,
+                        domain=domain,
+                        special_command=special_command
+                    )
                 
-                return {
+                result = {
                     "status": "success",
                     "domain": domain,
                     "confidence": classification.get("confidence", 0.80),
                     "special_command": special_command,
                     "response": response
                 }
+                if condensada:
+                    condensada["etapas"]["reduce"]["tokens_salida"] = estimar_tokens(response)
+                    result["tokens"] = condensada["etapas"]
+                return result
                 
             except Exception as mistral_error:
                 # Error específico de Mistral API
@@ -112,6 +193,154 @@ Por favor, reporta este error al equipo de desarrollo incluyendo:
 • Este mensaje de error completo"""
             }
     
+    def check_amplitude(self, question, classification):
+        """
+        Compuerta de amplitud para preguntas APROBADAS.
+        Retorna la respuesta de reformulación o None si debe ir al proveedor.
+        """
+        try:
+            return self.amplitud.evaluar(question, classification)
+        except Exception as e:
+            # La compuerta nunca debe bloquear una pregunta válida
+            print(f"⚠️ Error en compuerta de amplitud: {str(e)}")
+            return None
+    
+    def check_dosis(self, question, classification):
+        """
+        Respuesta local del comando calculo_dosis.
+        Retorna None si la calculadora no puede resolverlo (continúa al LLM).
+        """
+        if classification.get("special_command") != "calculo_dosis":
+            return None
+        try:
+            response = self.dosis.responder(question)
+        except Exception as e:
+            print(f"⚠️ Error en calculadora de dosis: {str(e)}")
+            return None
+        if not response:
+            return None
+        return {
+            "status": "success",
+            "domain": classification.get("domain", "análisis clínico"),
+            "confidence": classification.get("confidence", 0.95),
+            "special_command": "calculo_dosis",
+            "source": "local",
+            "response": response
+        }
+    
+    def review_note_locally(self, question, special_command):
+        """
+        Parte local de revision_nota (componentes presentes/faltantes y
+        prompt compacto), o None si no aplica o el parser falla.
+        """
+        if special_command != "revision_nota":
+            return None
+        try:
+            revision = revisar_nota(question)
+            print(f"📋 Revisión local: {revision['tokens_nota']} → {revision['tokens_prompt']} tokens al proveedor")
+            return revision
+        except Exception as e:
+            print(f"⚠️ Error en parser de notas: {str(e)}")
+            return None
+    
+    def special_command_for(self, classification):
+        """Comando especial de la clasificación; una nota pegada sin comando se valora"""
+        special_command = classification.get("special_command")
+        if classification.get("note_analysis", False) and not special_command:
+            special_command = "valoracion"  # Por defecto, valorar la nota
+        return special_command
+    
+    def correct_note_with_edits(self, question, domain, special_command):
+        """
+        correccion_nota por ediciones: el modelo devuelve sólo los cambios y
+        se aplican localmente. None si no aplica o el script no es válido
+        (se usa la reescritura completa). Un error del proveedor se devuelve
+        tal cual: reintentar con la reescritura sólo duplicaría la espera.
+        """
+        if not self.correccion_por_ediciones or special_command != "correccion_nota":
+            return None
+        nota = extraer_nota(question)
+        script = self.mistral.generate(
+            question=nota,
+            domain=domain,
+            special_command="correccion_nota_ediciones"
+        )
+        if script.lstrip().startswith(PREFIJOS_ERROR):
+            return {"response": script, "ediciones": 0, "corregida": None}
+        correccion = corregir_con_script(nota, script)
+        if correccion is None:
+            print("⚠️ Script de ediciones inválido, usando reescritura completa")
+            return None
+        print(f"✏️ Corrección local: {correccion['ediciones']} ediciones aplicadas")
+        return correccion
+    
+    def condense_long_note(self, question, domain, special_command):
+        """
+        Map-reduce para valoracion/revision_nota sobre el umbral de tokens:
+        {"condensada", "etapas"}, o None si no aplica, falla o el servicio
+        está degradado (sus llamadas en paralelo son lo primero que se corta).
+        """
+        if not self.mapreduce.aplica(question, special_command) or not degradacion.permite_partes():
+            return None
+        try:
+            return self.mapreduce.condensar(question, domain)
+        except Exception as e:
+            print(f"⚠️ Error en map-reduce, se envía la nota completa: {str(e)}")
+            return None
+    
+    def uses_field_template(self, special_command):
+        """elaboracion_nota por campos (NOTA_POR_CAMPOS=1): plantilla renderizada localmente"""
+        return self.nota_por_campos and special_command == "elaboracion_nota"
+    
+    def uses_sections(self, special_command, mode=None):
+        """mode="secciones" para comandos con manifiesto de secciones (no con el servicio degradado)"""
+        return mode == "secciones" and special_command in SECCIONES_ESPECIALES and degradacion.permite_partes()
+    
+    def section_savings(self, question, domain, special_command):
+        """Tokens de entrada estimados: una llamada por sección vs. una sola"""
+        return ahorro_entrada(
+            question,
+            special_command,
+            system_por_seccion=self.mistral._get_base_prompt(domain),
+            system_unico=self.mistral._build_system_prompt(domain, "secciones")
+        )
+    
+    def generate_sections(self, question, domain, special_command, estado=None):
+        """
+        Una sola llamada con el manifiesto de secciones; entrega cada sección
+        ({"index", "title", "content"}) en cuanto el modelo la termina. Al
+        terminar, estado["completa"] indica si llegaron todas sin error del
+        proveedor ni corte por max_tokens.
+        """
+        estado = {} if estado is None else estado
+        errores = []
+
+        def vigilar(tokens):
+            for token in tokens:
+                if token.startswith(ERRORES_STREAM):
+                    errores.append(token)
+                yield token
+
+        ahorro = self.section_savings(question, domain, special_command)
+        print(f"✂️ Secciones en una llamada: {ahorro['tokens_entrada_por_seccion']} → "
+              f"{ahorro['tokens_entrada_una_llamada']} tokens de entrada")
+        divisor = DivisorSecciones(titulos_de(special_command))
+        tokens = self.mistral.generate_stream(construir_prompt(question, special_command), domain, "secciones")
+        yield from divisor.stream(vigilar(tokens))
+        estado["completa"] = not (errores or divisor.truncada or divisor.faltantes)
+        if divisor.faltantes:
+            print(f"⚠️ Secciones no emitidas por el modelo: {', '.join(divisor.faltantes)}")
+    
+    def plan_expansion(self, question, domain, special_command=None, mode=None):
+        """Sub-preguntas del modo expand, o None si no aplica o el servicio está degradado"""
+        if mode != "expand" or special_command or not degradacion.permite_partes():
+            return None
+        try:
+            return self.planner.plan(question, domain)
+        except Exception as e:
+            print(f"⚠️ Error en planificador: {str(e)}")
+            return None
+    
     # ═══════════════════════════════════════════════════════
     # MÉTODOS DE CHUNKING (NUEVO - Para evitar timeout)
     # ═══════════════════════════════════════════════════════
@@ -193,103 +422,25 @@ Lista las fuentes específicas usadas (Gray's Anatomy, Guyton, Harrison's, guía
     def generate_special_chunks(self, question, domain, special_command):
         """
         Genera respuesta para COMANDOS ESPECIALES en chunks.
-        Mantiene la CALIDAD COMPLETA de cada sección.
+        Con SECCIONES_UNA_LLAMADA la entrada se envía una sola vez y la
+        respuesta se divide localmente; si no, una llamada por sección.
         """
-        
-        if special_command == "revision_nota":
-            sections = [
-                ('## ✅ Componentes Presentes', 
-                 f"Analiza QUÉ COMPONENTES SÍ ESTÁN en esta nota médica:\n\n{question}\n\nLista detallada con ejemplos específicos.", 
-                 1200),
-                ('## ❌ Componentes Faltantes', 
-                 f"Identifica QUÉ FALTA en esta nota médica según JCI/COFEPRIS:\n\n{question}\n\nPrioriza por criticidad.", 
-                 1200),
-                ('## ⚠️ Errores Detectados', 
-                 f"Identifica ERRORES de formato, dosis, abreviaturas en:\n\n{question}", 
-                 1000),
-                ('## 📋 Cumplimiento Legal', 
-                 f"Evalúa cumplimiento de normas (COFEPRIS, JCI, Clínica Mayo) en:\n\n{question}", 
-                 800),
-                ('## 💡 Recomendaciones', 
-                 f"Da recomendaciones PRIORITARIAS y opcionales para mejorar:\n\n{question}", 
-                 1000)
-            ]
-        
-        elif special_command == "correccion_nota":
-            sections = [
-                ('## ❌ Errores Detectados', 
-                 f"Identifica TODOS los errores (formato, ortografía, dosis) en:\n\n{question}", 
-                 1500),
-                ('## ✅ Nota Corregida', 
-                 f"Proporciona versión CORREGIDA COMPLETA de:\n\n{question}\n\nMarca cambios claramente.", 
-                 2000),
-                ('## 💡 Sugerencias Adicionales', 
-                 f"Da sugerencias para MEJORAR la calidad de:\n\n{question}", 
-                 800)
-            ]
-        
-        elif special_command == "elaboracion_nota":
-            # Para elaboración, generar secciones SOAP completas
-            sections = [
-                ('## DATOS Y SUBJETIVO (S)', 
-                 f"Genera sección completa de DATOS DEL PACIENTE y SUBJETIVO para:\n\n{question}\n\nUsa formato profesional con todos los campos.", 
-                 1200),
-                ('## OBJETIVO (O)', 
-                 f"Genera sección completa OBJETIVO (signos vitales, exploración física) para:\n\n{question}", 
-                 1200),
-                ('## ANÁLISIS (A)', 
-                 f"Genera sección completa de ANÁLISIS (impresión diagnóstica, justificación) para:\n\n{question}", 
-                 1000),
-                ('## PLAN (P)', 
-                 f"Genera sección completa de PLAN (estudios, tratamiento, pronóstico) para:\n\n{question}", 
-                 1200)
-            ]
-        
-        elif special_command == "valoracion":
-            sections = [
-                ('## 📋 Resumen del Caso', 
-                 f"Resume el caso clínico en 3-4 líneas:\n\n{question}", 
-                 600),
-                ('## 🎯 Hipótesis Diagnósticas', 
-                 f"Proporciona diagnóstico más probable y 3 diferenciales COMPLETOS con justificación para:\n\n{question}", 
-                 1500),
-                ('## 🔬 Estudios Sugeridos', 
-                 f"Lista COMPLETA de laboratorios e imagenología prioritarios para:\n\n{question}", 
-                 1000),
-                ('## 💊 Abordaje Terapéutico', 
-                 f"Plan terapéutico COMPLETO (medidas generales, fármacos con dosis, criterios de referencia) para:\n\n{question}", 
-                 1500),
-                ('## ⚠️ Signos de Alarma', 
-                 f"Lista completa de signos de alarma y criterios de derivación urgente para:\n\n{question}", 
-                 800)
-            ]
-        
-        elif special_command == "study_mode":
-            sections = [
-                ('## 📚 Conceptos Fundamentales', 
-                 f"Explica los CONCEPTOS BÁSICOS COMPLETOS de: {question}\n\nCon definiciones claras.", 
-                 1200),
-                ('## 🧠 Analogías y Memorización', 
-                 f"Crea ANALOGÍAS DETALLADAS y técnicas de memorización para: {question}", 
-                 1200),
-                ('## 🔗 Correlación Clínica', 
-                 f"Explica la APLICACIÓN CLÍNICA COMPLETA con casos prácticos de: {question}", 
-                 1200),
-                ('## 💡 Tips de Estudio', 
-                 f"Proporciona estrategias COMPLETAS para estudiar efectivamente: {question}", 
-                 800)
-            ]
-        
-        else:
+        sections = SECCIONES_ESPECIALES.get(special_command)
+        if not sections:
             # Fallback a estándar
             yield from self.generate_standard_chunks(question, domain)
             return
         
+        if self.secciones_una_llamada:
+            for section in self.generate_sections(question, domain, special_command):
+                yield f"{section['title']}\n\n{section['content']}".strip()
+            return
+        
         # Generar cada sección
-        for title, prompt, max_tok in sections:
+        for title, template, max_tok in sections:
             try:
                 content = self.mistral.generate_chunk(
-                    prompt=prompt,
+                    prompt=template.format(question=question),
                     domain=domain,
                     max_tokens=max_tok
                 )
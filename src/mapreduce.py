@@ -0,0 +1,162 @@
+"""
+Map-Reduce de Notas Largas
+==========================
+
+Historias clínicas muy largas no se envían completas al proveedor: se
+dividen en los encabezados de sección de la nota (S/O/A/P y apartados), cada
+fragmento se condensa en paralelo (map) y el comando final (valoracion o
+revision_nota) se ejecuta sobre la versión condensada (reduce). Cada etapa
+reporta sus tokens estimados localmente.
+
+Todo el map corre dentro del único turno de generación de la petición (ver
+src/fair.py): a lo sumo MAP_MAX_PARALELO llamadas simultáneas al proveedor,
+para que una nota larga no valga por una docena de consultas.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from src.nota_parser import ENCABEZADO_RE
+from src.tokens import CHARS_POR_TOKEN, estimar_tokens
+
+UMBRAL_MAPREDUCE_TOKENS = int(os.environ.get("UMBRAL_MAPREDUCE_TOKENS", "6000"))
+TOKENS_POR_FRAGMENTO = int(os.environ.get("TOKENS_POR_FRAGMENTO", "2500"))
+TOKENS_RESUMEN = 600
+MAX_FRAGMENTOS = 12
+MAP_MAX_PARALELO = int(os.environ.get("MAP_MAX_PARALELO", "3"))
+COMANDOS_MAPREDUCE = ("valoracion", "revision_nota")
+
+
+# ═══════════════════════════════════════════════════════
+# DIVISIÓN EN LÍMITES DE SECCIÓN
+# ═══════════════════════════════════════════════════════
+
+def _cortar(texto: str, max_chars: int) -> List[str]:
+    """Parte un bloque demasiado grande en párrafos, líneas o, en último caso, a tamaño fijo"""
+    piezas = []
+    while len(texto) > max_chars:
+        corte = texto.rfind("\n\n", 0, max_chars)
+        if corte <= 0:
+            corte = texto.rfind("\n", 0, max_chars)
+        if corte <= 0:
+            corte = max_chars
+        piezas.append(texto[:corte])
+        texto = texto[corte:]
+    piezas.append(texto)
+    return piezas
+
+
+def dividir_en_fragmentos(texto: str, max_tokens: int = TOKENS_POR_FRAGMENTO) -> List[str]:
+    """
+    Fragmentos de ≤ max_tokens que respetan los encabezados de sección:
+    secciones consecutivas se agrupan y sólo una sección mayor al límite se
+    parte por párrafos.
+    """
+    max_chars = max_tokens * CHARS_POR_TOKEN
+    limites = [m.start() for m in ENCABEZADO_RE.finditer(texto.lower())]
+    limites = [0] + [l for l in limites if l > 0] + [len(texto)]
+    secciones = [texto[a:b] for a, b in zip(limites, limites[1:]) if texto[a:b].strip()]
+
+    fragmentos = []
+    actual = ""
+    for seccion in secciones:
+        if len(actual) + len(seccion) <= max_chars:
+            actual += seccion
+            continue
+        if actual.strip():
+            fragmentos.append(actual)
+        piezas = _cortar(seccion, max_chars)
+        fragmentos += piezas[:-1]
+        actual = piezas[-1]
+    if actual.strip():
+        fragmentos.append(actual)
+    return [f.strip() for f in fragmentos]
+
+
+def limitar_fragmentos(fragmentos: List[str], max_fragmentos: int = MAX_FRAGMENTOS) -> List[str]:
+    """
+    Une los pares adyacentes más pequeños hasta quedar en ≤ max_fragmentos.
+    El empaque voraz puede dejar más fragmentos que llamadas permitidas (p. ej.
+    secciones de 0.55× el límite quedan una por fragmento).
+    """
+    fragmentos = list(fragmentos)
+    while len(fragmentos) > max_fragmentos:
+        i = min(range(len(fragmentos) - 1), key=lambda j: len(fragmentos[j]) + len(fragmentos[j + 1]))
+        fragmentos[i:i + 2] = [fragmentos[i] + "\n\n" + fragmentos[i + 1]]
+    return fragmentos
+
+
+# ═══════════════════════════════════════════════════════
+# MAP (resúmenes en paralelo) Y REDUCE (nota condensada)
+# ═══════════════════════════════════════════════════════
+
+class MapReduceNotas:
+    def __init__(self, client, umbral_tokens=UMBRAL_MAPREDUCE_TOKENS,
+                 tokens_fragmento=TOKENS_POR_FRAGMENTO, tokens_resumen=TOKENS_RESUMEN,
+                 max_paralelo=MAP_MAX_PARALELO):
+        self.client = client
+        self.umbral_tokens = umbral_tokens
+        self.tokens_fragmento = tokens_fragmento
+        self.tokens_resumen = tokens_resumen
+        self.max_paralelo = max(1, max_paralelo)
+
+    def aplica(self, question, special_command) -> bool:
+        """Sólo para valoracion/revision_nota con entradas sobre el umbral"""
+        return special_command in COMANDOS_MAPREDUCE and estimar_tokens(question) > self.umbral_tokens
+
+    def _prompt_resumen(self, fragmento, indice, total):
+        return f"""Condensa el FRAGMENTO {indice}/{total} de una historia clínica extensa.
+
+Conserva TODOS los datos clínicos relevantes: fechas, signos vitales, resultados de laboratorio
+e imagen con valores, diagnósticos, fármacos con dosis/vía/frecuencia, alergias, procedimientos
+y evolución. Elimina redundancias y texto administrativo. Conserva los encabezados de sección.
+No agregues interpretación ni recomendaciones (máximo ~{self.tokens_resumen // 2} palabras).
+
+{fragmento}"""
+
+    def _resumir(self, fragmento, indice, total, domain):
+        return self.client.generate_chunk(
+            prompt=self._prompt_resumen(fragmento, indice, total),
+            domain=domain,
+            max_tokens=self.tokens_resumen
+        )
+
+    def condensar(self, question, domain) -> Dict:
+        """
+        Map en paralelo (hasta max_paralelo llamadas) sobre los fragmentos. Retorna {"condensada", "etapas"}
+        con los tokens estimados de entrada/salida de cada etapa. Un fragmento
+        que falla se conserva sin resumir.
+        """
+        inicio = time.perf_counter()
+        # Fragmentos más grandes si la nota excede MAX_FRAGMENTOS llamadas
+        max_tokens = max(self.tokens_fragmento, -(-estimar_tokens(question) // MAX_FRAGMENTOS))
+        fragmentos = limitar_fragmentos(dividir_en_fragmentos(question, max_tokens))
+        total = len(fragmentos)
+
+        with ThreadPoolExecutor(max_workers=min(total, self.max_paralelo)) as executor:
+            futures = [executor.submit(self._resumir, f, i, total, domain) for i, f in enumerate(fragmentos, 1)]
+            resumenes = []
+            for fragmento, future in zip(fragmentos, futures):
+                try:
+                    resumenes.append(future.result())
+                except Exception as e:
+                    print(f"❌ Error condensando fragmento: {str(e)}")
+                    resumenes.append(fragmento)
+
+        condensada = "\n\n".join(r.strip() for r in resumenes)
+        etapas = {
+            "entrada": {"tokens": estimar_tokens(question)},
+            "map": {
+                "fragmentos": total,
+                "tokens_entrada": sum(estimar_tokens(self._prompt_resumen(f, i, total))
+                                      for i, f in enumerate(fragmentos, 1)),
+                "tokens_salida": sum(estimar_tokens(r) for r in resumenes),
+                "segundos": round(time.perf_counter() - inicio, 2)
+            },
+            "reduce": {"tokens_entrada": estimar_tokens(condensada)}
+        }
+        print(f"🗜️ Map-reduce: {etapas['entrada']['tokens']} → {etapas['reduce']['tokens_entrada']} tokens "
+              f"({total} fragmentos en {etapas['map']['segundos']}s)")
+        return {"condensada": condensada, "etapas": etapas}
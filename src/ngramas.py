@@ -0,0 +1,419 @@
+"""
+Clasificador de Dominio por N-gramas de Caracteres
+==================================================
+
+El dominio se elige contando keywords (`Wrapper._get_domain_scores`): las
+preguntas sin ninguna keyword acaban en REFORMULAR y los empates se deciden
+por el orden del diccionario. Este módulo es un naive Bayes multinomial
+sobre n-gramas de caracteres (2 a 4, sin acentos) con hashing a CUBETAS
+cubetas:
+
+- Se entrena fuera de línea con las keywords de domains.json, regiones
+  anatómicas, fármacos de drugs.json y preguntas aprobadas registradas
+  (JSONL {"question", "domain"}, ver NGRAMAS_LOG).
+- Los pesos (log-verosimilitudes, cubetas × dominios) se guardan en
+  data/ngramas.npy (float32, 1.5 MB: sumar float16 costaba el doble) y se
+  cargan con mmap; los metadatos en data/ngramas.json.
+- Los hashes se calculan vectorizados con NumPy: una pregunta en ~50 µs
+  (más que classify completo) y `clasificar_lote` puntúa miles de preguntas
+  por llamada (todas las preguntas de un bloque en un solo texto, sin
+  n-gramas que crucen de una a otra).
+
+Corre junto a las reglas de keywords (NGRAMAS_MODO):
+    off         no se usa (por defecto)
+    sombra      se compara con el dominio de las reglas y se reporta la
+                concordancia en /health. classify sólo encola la pregunta;
+                un hilo la compara por lotes, fuera del camino de la petición
+    desempate   además decide los empates entre dominios con igual número
+                de keywords (sólo los empates pagan el modelo en la petición)
+
+Entrenar (desde la raíz del repositorio):
+
+    python -m src.ngramas [--preguntas aprobadas.jsonl ...]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# ✅ NumPy es opcional: sin él el clasificador queda desactivado
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NGRAMAS_PATH = os.environ.get("NGRAMAS_PATH", os.path.join(ROOT_DIR, "data", "ngramas.npy"))
+NGRAMAS_MODO = os.environ.get("NGRAMAS_MODO", "off").lower()
+# JSONL de preguntas aprobadas por las reglas (datos para reentrenar); vacío = no registrar
+NGRAMAS_LOG = os.environ.get("NGRAMAS_LOG", "")
+
+N_MIN, N_MAX = 2, 4
+BITS_CUBETAS = 13
+CUBETAS = 1 << BITS_CUBETAS
+ALFA = 0.1
+# Confianza a partir de la cual una pregunta reformulada cuenta como "rescatable"
+CONFIANZA_RESCATE = 0.9
+# Preguntas por bloque en clasificar_lote (acota la memoria intermedia)
+BLOQUE_LOTE = 256
+# Caracteres que se inspeccionan por pregunta
+MAX_CARACTERES = 2000
+# Sombra diferida: espera para juntar preguntas por lote y cola máxima (el
+# exceso se descarta y se cuenta)
+SOMBRA_ESPERA_S = 0.5
+SOMBRA_MAX_PENDIENTES = 4096
+
+_PRIMO = 16777619
+_MEZCLA = 2654435761
+SEPARADOR = "\n"
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos (sólo ASCII), espacios simples y un espacio a cada lado"""
+    texto = unicodedata.normalize("NFD", texto[:MAX_CARACTERES].lower()).encode("ascii", "ignore").decode()
+    return f" {' '.join(texto.split())} "
+
+
+def _codigos(texto):
+    return np.frombuffer(texto.encode("ascii"), dtype=np.uint8).astype(np.uint32)
+
+
+def _codificar(textos):
+    """Textos normalizados unidos por SEPARADOR → (códigos uint32, inicio de cada texto)"""
+    largos = np.fromiter((len(t) + 1 for t in textos), dtype=np.int64, count=len(textos))
+    return _codigos(SEPARADOR.join(textos)), np.concatenate(([0], np.cumsum(largos)[:-1]))
+
+
+def _hashes(codigos):
+    """
+    Hash polinomial de cada n-grama, n por n: h_n[i] = h_{n-1}[i]·P + c[i+n-1].
+    Retorna [(n, hashes)]; el hash j de n empieza en la posición j.
+    """
+    por_n = []
+    h = codigos
+    with np.errstate(over="ignore"):
+        for n in range(2, min(N_MAX, len(codigos)) + 1):
+            h = h[:-1] * np.uint32(_PRIMO) + codigos[n - 1:]
+            if n >= N_MIN:
+                por_n.append((n, h))
+    return por_n
+
+
+def _mezclar(hashes):
+    """Mezcla multiplicativa → cubeta (los BITS_CUBETAS bits altos)"""
+    with np.errstate(over="ignore"):
+        return (hashes * np.uint32(_MEZCLA)) >> np.uint32(32 - BITS_CUBETAS)
+
+
+def cubetas_de(texto: str):
+    """Cubetas de los n-gramas de un texto"""
+    por_n = _hashes(_codigos(normalizar(texto)))
+    if not por_n:
+        return np.zeros(0, dtype=np.uint32)
+    return _mezclar(np.concatenate([h for _, h in por_n]))
+
+
+def _cubetas_lote(codigos):
+    """(posición de inicio, cubeta) de los n-gramas que no cruzan un SEPARADOR"""
+    separadores = np.concatenate(([0], np.cumsum(codigos == ord(SEPARADOR))))
+    posiciones, hashes = [], []
+    for n, h in _hashes(codigos):
+        inicio = np.arange(len(h))
+        validos = separadores[inicio + n] == separadores[inicio]
+        posiciones.append(inicio[validos])
+        hashes.append(h[validos])
+    if not posiciones:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+    return np.concatenate(posiciones), _mezclar(np.concatenate(hashes))
+
+
+# ═══════════════════════════════════════════════════════
+# MODELO
+# ═══════════════════════════════════════════════════════
+
+class ClasificadorNgramas:
+    def __init__(self, path=NGRAMAS_PATH):
+        self.path = path
+        with open(_ruta_meta(path), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["cubetas"] != CUBETAS or self.meta["n"] != [N_MIN, N_MAX]:
+            raise ValueError("modelo entrenado con otra configuración de n-gramas")
+        self.clases = self.meta["clases"]
+        self._indice = {c: i for i, c in enumerate(self.clases)}
+        # Mapeado: los workers comparten las páginas (ndarray sin la subclase memmap)
+        self.pesos = np.asarray(np.load(path, mmap_mode="r"))
+
+    def puntuar_lote(self, textos: List[str]):
+        """Matriz (n × dominios) de log-verosimilitudes, por bloques de BLOQUE_LOTE"""
+        puntajes = np.zeros((len(textos), len(self.clases)), dtype=np.float32)
+        for inicio in range(0, len(textos), BLOQUE_LOTE):
+            bloque = [normalizar(t) for t in textos[inicio:inicio + BLOQUE_LOTE]]
+            codigos, inicios = _codificar(bloque)
+            posiciones, cubetas = _cubetas_lote(codigos)
+            filas = np.searchsorted(inicios, posiciones, side="right") - 1
+            orden = np.argsort(filas, kind="stable")
+            filas, cubetas = filas[orden], cubetas[orden]
+            conteos = np.bincount(filas, minlength=len(bloque))
+            con_ngramas = np.nonzero(conteos)[0]
+            if not len(con_ngramas):
+                continue
+            cortes = np.concatenate(([0], np.cumsum(conteos)[:-1]))[con_ngramas]
+            sumas = np.add.reduceat(self.pesos.take(cubetas, axis=0), cortes, axis=0)
+            puntajes[inicio + con_ngramas] = sumas
+        return puntajes
+
+    @staticmethod
+    def _confianzas(puntajes):
+        """Softmax por fila → (índice del mejor, su probabilidad)"""
+        mejores = puntajes.argmax(axis=1)
+        relativos = np.exp(puntajes - puntajes.max(axis=1, keepdims=True))
+        return mejores, relativos.max(axis=1) / relativos.sum(axis=1)
+
+    def clasificar_lote(self, textos: List[str]) -> List[Tuple[str, float]]:
+        """[(dominio, confianza)] para miles de preguntas en una llamada"""
+        if not textos:
+            return []
+        mejores, confianzas = self._confianzas(self.puntuar_lote(textos))
+        return [(self.clases[i], round(float(c), 3)) for i, c in zip(mejores, confianzas)]
+
+    def puntuar(self, texto: str):
+        """Log-verosimilitudes de una sola pregunta (sin el reparto por filas del lote)"""
+        return self.pesos.take(cubetas_de(texto), axis=0).sum(axis=0)
+
+    def clasificar(self, texto: str) -> Tuple[str, float]:
+        puntajes = self.puntuar(texto)
+        mejor = int(puntajes.argmax())
+        return self.clases[mejor], round(1.0 / float(np.exp(puntajes - puntajes[mejor]).sum()), 3)
+
+    def desempatar(self, texto: str, candidatos) -> Optional[str]:
+        """El candidato con mayor puntaje del modelo (None si ninguno es una clase)"""
+        indices = [self._indice[c] for c in candidatos if c in self._indice]
+        if not indices:
+            return None
+        puntajes = self.puntuar(texto)
+        return self.clases[max(indices, key=lambda i: puntajes[i])]
+
+
+def _ruta_meta(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+_modelo = None
+_modelo_cargado = False
+_modelo_lock = threading.Lock()
+
+
+def modelo() -> Optional[ClasificadorNgramas]:
+    """Modelo del proceso (se carga en el primer uso); None si no hay NumPy, modelo o modo"""
+    global _modelo, _modelo_cargado
+    if _modelo_cargado or NGRAMAS_MODO == "off":
+        return _modelo
+    with _modelo_lock:
+        if not _modelo_cargado:
+            if NUMPY_AVAILABLE:
+                try:
+                    _modelo = ClasificadorNgramas()
+                    print(f"🔤 Clasificador de n-gramas cargado ({len(_modelo.clases)} dominios, "
+                          f"{_modelo.pesos.nbytes // 1024} KB)")
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Clasificador de n-gramas no disponible ({e})")
+            _modelo_cargado = True
+    return _modelo
+
+
+# ═══════════════════════════════════════════════════════
+# MODO SOMBRA: concordancia con las reglas de keywords
+# ═══════════════════════════════════════════════════════
+
+class Sombra:
+    def __init__(self, log_path=NGRAMAS_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.coincidencias = 0
+        self.discrepancias = 0
+        self.rescatables = 0
+        self.confusiones = Counter()
+        self.descartadas = 0
+        self._pendientes = []
+        self._hay_pendientes = threading.Event()
+        self._hilo = None
+
+    def encolar(self, question, resultado):
+        """Como registrar, pero la comparación la hace el hilo de la sombra por lotes"""
+        if not question or not self._comparable(resultado):
+            return
+        with self._lock:
+            if len(self._pendientes) >= SOMBRA_MAX_PENDIENTES:
+                self.descartadas += 1
+                return
+            # Copia: el llamador puede seguir modificando el resultado
+            self._pendientes.append((question, dict(resultado)))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ciclo, daemon=True, name="ngramas-sombra")
+                self._hilo.start()
+        self._hay_pendientes.set()
+
+    def vaciar(self):
+        """Compara todo lo encolado (lo llama el hilo; también sirve en pruebas)"""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, []
+            self._hay_pendientes.clear()
+        for i in range(0, len(pendientes), BLOQUE_LOTE):
+            bloque = pendientes[i:i + BLOQUE_LOTE]
+            self.registrar_lote([q for q, _ in bloque], [r for _, r in bloque])
+
+    def _ciclo(self):
+        while True:
+            self._hay_pendientes.wait()
+            time.sleep(SOMBRA_ESPERA_S)
+            try:
+                self.vaciar()
+            except Exception as e:
+                print(f"⚠️ Error en la sombra de n-gramas: {e}")
+
+    def registrar(self, question, resultado):
+        """
+        Compara el resultado de las reglas con el modelo. Sólo dominios que
+        eligen las keywords (aprobadas sin comando de nota) y reformulaciones.
+        """
+        clasificador = modelo()
+        if clasificador is None or not self._comparable(resultado):
+            return
+        self._contar([(question, resultado, *clasificador.clasificar(question))])
+
+    def registrar_lote(self, questions, resultados):
+        """Como registrar, con una sola llamada a clasificar_lote para todo el lote"""
+        clasificador = modelo()
+        if clasificador is None:
+            return
+        pares = [(q, r) for q, r in zip(questions, resultados) if q and self._comparable(r)]
+        if pares:
+            predicciones = clasificador.clasificar_lote([q for q, _ in pares])
+            self._contar([(q, r, *p) for (q, r), p in zip(pares, predicciones)])
+
+    @staticmethod
+    def _comparable(resultado):
+        if resultado.get("note_analysis"):
+            return False
+        estado = resultado["result"].value
+        return estado == "REFORMULAR" or (
+            estado == "APROBADA" and resultado.get("special_command") in (None, "study_mode"))
+
+    def _contar(self, comparaciones):
+        """[(pregunta, resultado de las reglas, dominio del modelo, confianza)]"""
+        aprobadas = []
+        with self._lock:
+            for question, resultado, dominio, confianza in comparaciones:
+                if resultado["result"].value == "REFORMULAR":
+                    self.rescatables += confianza >= CONFIANZA_RESCATE
+                    continue
+                if dominio == resultado["domain"]:
+                    self.coincidencias += 1
+                else:
+                    self.discrepancias += 1
+                    self.confusiones[(resultado["domain"], dominio)] += 1
+                aprobadas.append((question, resultado["domain"]))
+        self._anotar(aprobadas)
+
+    def _anotar(self, aprobadas):
+        """Preguntas aprobadas → JSONL para reentrenar (si NGRAMAS_LOG está configurado)"""
+        if not self.log_path or not aprobadas:
+            return
+        lineas = "".join(json.dumps({"question": q[:500], "domain": d}, ensure_ascii=False) + "\n"
+                         for q, d in aprobadas)
+        with self._lock:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(lineas)
+            except OSError as e:
+                print(f"⚠️ No se pudo registrar la pregunta aprobada: {e}")
+                self.log_path = ""
+
+    def get_stats(self):
+        comparadas = self.coincidencias + self.discrepancias
+        with self._lock:
+            confusiones = [{"reglas": r, "modelo": m, "veces": n} for (r, m), n in self.confusiones.most_common(5)]
+        return {
+            "modo": NGRAMAS_MODO,
+            "modelo": modelo() is not None,
+            "comparadas": comparadas,
+            "concordancia": round(self.coincidencias / comparadas, 3) if comparadas else None,
+            "rescatables": self.rescatables,
+            "pendientes": len(self._pendientes),
+            "descartadas": self.descartadas,
+            "confusiones": confusiones
+        }
+
+
+sombra = Sombra()
+
+
+# ═══════════════════════════════════════════════════════
+# ENTRENAMIENTO (fuera de línea)
+# ═══════════════════════════════════════════════════════
+
+def muestras_diccionarios():
+    """[(texto, dominio)] desde domains.json y drugs.json"""
+    with open(os.path.join(ROOT_DIR, "data", "domains.json"), "r", encoding="utf-8") as f:
+        domains = json.load(f)
+    with open(os.path.join(ROOT_DIR, "data", "drugs.json"), "r", encoding="utf-8") as f:
+        farmacos = json.load(f).get("farmacos", {})
+    muestras = [(dominio, dominio) for dominio in domains.get("domains", [])]
+    for dominio, keywords in domains.get("keywords", {}).items():
+        muestras += [(kw, dominio) for kw in keywords]
+    muestras += [(region, "anatomía") for region in domains.get("anatomical_regions", [])]
+    for farmaco in farmacos.values():
+        muestras += [(nombre, "farmacología") for nombre in [farmaco["nombre"], *farmaco.get("sinonimos", [])]]
+    return muestras
+
+
+def muestras_registradas(paths):
+    """[(texto, dominio)] de archivos JSONL de preguntas aprobadas"""
+    muestras = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    registro = json.loads(linea)
+                    muestras.append((registro["question"], registro["domain"]))
+    return muestras
+
+
+def entrenar(muestras, path=NGRAMAS_PATH):
+    """Naive Bayes multinomial con suavizado de Laplace (ALFA); guarda pesos y metadatos"""
+    clases = sorted({dominio for _, dominio in muestras})
+    indice = {c: i for i, c in enumerate(clases)}
+    conteos = np.zeros((CUBETAS, len(clases)), dtype=np.float64)
+    for texto, dominio in muestras:
+        np.add.at(conteos[:, indice[dominio]], cubetas_de(texto), 1)
+    pesos = np.log((conteos + ALFA) / (conteos.sum(axis=0) + ALFA * CUBETAS))
+    np.save(path, pesos.astype(np.float32))
+    meta = {
+        "clases": clases,
+        "cubetas": CUBETAS,
+        "n": [N_MIN, N_MAX],
+        "alfa": ALFA,
+        "muestras": len(muestras),
+        "entrenado": str(datetime.now())
+    }
+    with open(_ruta_meta(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrenar el clasificador de n-gramas")
+    parser.add_argument("--preguntas", nargs="*", default=[], help="JSONL de preguntas aprobadas")
+    parser.add_argument("--salida", default=NGRAMAS_PATH)
+    args = parser.parse_args()
+    meta = entrenar(muestras_diccionarios() + muestras_registradas(args.preguntas), args.salida)
+    print(f"💾 {meta['muestras']} muestras, {len(meta['clases'])} dominios → {os.path.relpath(args.salida, ROOT_DIR)}")
@@ -0,0 +1,366 @@
+"""
+Parser Local de Notas Médicas (comando revision_nota)
+=====================================================
+
+Divide una nota en secciones SOAP y extrae signos vitales, fechas, dosis e
+identificadores en un registro estructurado. Con ese registro se resuelve
+localmente la parte mecánica de la revisión ("Componentes Presentes /
+Faltantes") y al proveedor sólo se envía un resumen compacto con los
+fragmentos que requieren juicio clínico.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.tokens import estimar_tokens
+
+# Notas de varias páginas: el parser es lineal, pero se acota igual
+MAX_NOTA_CHARS = 256 * 1024
+# Máximo de caracteres por fragmento que se envía al proveedor
+MAX_FRAGMENTO_CHARS = 1500
+
+# ═══════════════════════════════════════════════════════
+# SECCIONES SOAP
+# ═══════════════════════════════════════════════════════
+
+# Encabezado → (sección SOAP, apartado)
+ENCABEZADOS = {
+    "s": ("subjetivo", "subjetivo"),
+    "subjetivo": ("subjetivo", "subjetivo"),
+    "motivo de consulta": ("subjetivo", "motivo"),
+    "padecimiento actual": ("subjetivo", "padecimiento"),
+    "interrogatorio": ("subjetivo", "padecimiento"),
+    "antecedentes": ("subjetivo", "antecedentes"),
+    "o": ("objetivo", "objetivo"),
+    "objetivo": ("objetivo", "objetivo"),
+    "exploración física": ("objetivo", "exploracion"),
+    "exploracion fisica": ("objetivo", "exploracion"),
+    "signos vitales": ("objetivo", "exploracion"),
+    "laboratorios": ("objetivo", "laboratorios"),
+    "a": ("analisis", "analisis"),
+    "análisis": ("analisis", "analisis"),
+    "analisis": ("analisis", "analisis"),
+    "impresión diagnóstica": ("analisis", "impresion"),
+    "impresion diagnostica": ("analisis", "impresion"),
+    "diagnóstico": ("analisis", "impresion"),
+    "diagnostico": ("analisis", "impresion"),
+    "diagnósticos": ("analisis", "impresion"),
+    "diagnosticos": ("analisis", "impresion"),
+    "idx": ("analisis", "impresion"),
+    "p": ("plan", "plan"),
+    "plan": ("plan", "plan"),
+    "tratamiento": ("plan", "tratamiento"),
+    "indicaciones": ("plan", "tratamiento"),
+    "manejo": ("plan", "plan"),
+}
+
+_ETIQUETAS = "|".join(sorted(map(re.escape, ENCABEZADOS), key=len, reverse=True))
+# Encabezado al inicio de línea: "Plan:", "## Objetivo", "S:", "Impresión diagnóstica -"
+ENCABEZADO_RE = re.compile(
+    r"^[ \t#*]*(" + _ETIQUETAS + r")(?:\s*\([soap]\))?[ \t*]*[:\-]",
+    re.MULTILINE
+)
+
+# ═══════════════════════════════════════════════════════
+# PATRONES DE EXTRACCIÓN
+# ═══════════════════════════════════════════════════════
+
+# Se buscan sobre el texto en minúsculas y sin IGNORECASE: así `re` usa la
+# búsqueda rápida por prefijo literal (≈10× más rápido en notas largas)
+_SEP = r"\s*[:=]?\s*"
+
+SIGNOS_RE = {
+    "ta": re.compile(r"\b(?:ta|t/a|pa|presi[oó]n arterial|tensi[oó]n arterial)" + _SEP + r"(\d{2,3}\s*/\s*\d{2,3})"),
+    "fc": re.compile(r"\b(?:fc|frecuencia card[ií]aca)" + _SEP + r"(\d{2,3})\b"),
+    "fr": re.compile(r"\b(?:fr|frecuencia respiratoria)" + _SEP + r"(\d{1,2})\b"),
+    "temp": re.compile(r"\b(?:temp|temperatura|t°)" + _SEP + r"(\d{2}(?:[.,]\d)?)"),
+    "sato2": re.compile(r"\b(?:sato2|sato₂|sat o2|spo2|spo₂|saturaci[oó]n(?: de ox[ií]geno)?)" + _SEP + r"(\d{2,3})\s*%?"),
+    "peso": re.compile(r"\bpeso" + _SEP + r"(\d{1,3}(?:[.,]\d+)?)\s*kg\b"),
+    "talla": re.compile(r"\b(?:talla|estatura)" + _SEP + r"(\d(?:[.,]\d+)?\s*m|\d{2,3}\s*cm)\b"),
+}
+
+FECHA_RE = re.compile(
+    r"\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{1,2} de [a-záéíóú]+ (?:de|del) \d{4})\b"
+)
+HORA_RE = re.compile(r"\b(?:[01]?\d|2[0-3]):[0-5]\d\b")
+
+DOSIS_RE = re.compile(
+    r"\b([a-záéíóúñ]{4,})\s+(\d+(?:[.,]\d+)?)\s*(mg|mcg|µg|g|ml|ui|u)\b"
+    r"(?:\s*(vo|iv|im|sc|sl|vr|inh|inhalado|oral|intravenosa)\b)?"
+    r"(?:\s*(?:cada|c/)\s*(\d{1,2})\s*(?:h|hrs?|horas)\b)?"
+)
+
+CEDULA_RE = re.compile(r"\bc[eé]d(?:ula)?\.?(?: profesional)?" + _SEP + r"(\d{7,8})\b")
+EXPEDIENTE_RE = re.compile(r"\b(?:expediente|exp\.|nss|historia cl[ií]nica|registro)" + _SEP + r"#?\s*([a-z0-9-]*\d[a-z0-9-]*)")
+CIE10_RE = re.compile(r"\b([A-TV-Z]\d{2}(?:\.\d{1,2})?)\b")
+# "B12" (vitamina) o "T38.5" (temperatura) tienen forma de código: sólo cuentan
+# en la sección de análisis o en la línea de un "CIE"/"Dx"
+CIE10_CONTEXTO_RE = re.compile(r"(?i)\b(?:cie(?:-?10)?|i?dx)\b")
+NOMBRE_RE = re.compile(r"\b(?:nombre|paciente)\s*:\s*([^\n:]{3,60}?)(?=\s{2,}|\s+(?:edad|sexo)\b|\n|$)")
+EDAD_RE = re.compile(r"\bedad" + _SEP + r"(\d{1,3})\b")
+SEXO_RE = re.compile(r"\b(?:sexo|género|genero)" + _SEP + r"(masculino|femenino|hombre|mujer|m|f)\b")
+
+# Presencia simple (sin valor a extraer)
+MENCIONES_RE = {
+    "servicio": re.compile(r"\b(?:servicio|área|area|unidad)\s*:"),
+    "medico": re.compile(r"\b(?:m[eé]dico|dra?\.)\s"),
+    "cronologia": re.compile(r"\b(?:hace|desde hace|de)\s+\d+\s+(?:hora|d[ií]a|semana|mes|año)"),
+    "tratamientos_previos": re.compile(r"\b(?:tratamiento previo|automedica|sin mejor[ií]a|con mejor[ií]a)"),
+    "alergias": re.compile(r"\balergi"),
+    "no_patologicos": re.compile(r"\b(?:tabaquismo|alcoholismo|toxicoman[ií]as|etilismo)\b"),
+    "familiares": re.compile(r"\b(?:heredofamiliares|familiares)\b"),
+    "gineco": re.compile(r"\b(?:gineco|fum|gesta|g\d\s*p\d)"),
+    "habitus": re.compile(r"\b(?:habitus|consciente|orientad[oa]|alerta)\b"),
+    "estudios": re.compile(r"\b(?:bh|qs|ego|ecg|rx|tac|usg|biometr[ií]a|qu[ií]mica sangu[ií]nea|laboratorio|gabinete|estudios)\b"),
+    "no_farmacologico": re.compile(r"\b(?:dieta|reposo|medidas generales|hidrataci[oó]n|ejercicio)\b"),
+    "pronostico": re.compile(r"\bpron[oó]stico\b"),
+    "seguimiento": re.compile(r"\b(?:cita|seguimiento|control|revaloraci[oó]n|alta)\b"),
+    "firma": re.compile(r"\b(?:firma|sello)\b"),
+    "consentimiento": re.compile(r"\bconsentimiento informado\b"),
+}
+
+
+# ═══════════════════════════════════════════════════════
+# PARSER
+# ═══════════════════════════════════════════════════════
+
+def dividir_secciones(texto: str, bajo: Optional[str] = None) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Texto por sección SOAP (subjetivo/objetivo/analisis/plan) y lista de
+    apartados detectados en orden. El texto previo al primer encabezado
+    queda en "encabezado" (datos del paciente y del documento).
+    """
+    if bajo is None:
+        bajo = texto.lower()
+    if len(bajo) != len(texto):
+        texto = bajo
+    secciones = {"encabezado": [], "subjetivo": [], "objetivo": [], "analisis": [], "plan": []}
+    apartados = []
+    actual = "encabezado"
+    inicio = 0
+
+    for match in ENCABEZADO_RE.finditer(bajo):
+        secciones[actual].append(texto[inicio:match.start()])
+        actual, apartado = ENCABEZADOS[match.group(1)]
+        if apartado not in apartados:
+            apartados.append(apartado)
+        inicio = match.end()
+    secciones[actual].append(texto[inicio:])
+
+    return {k: "\n".join(p.strip() for p in v if p.strip()) for k, v in secciones.items()}, apartados
+
+
+def _primero(patron, bajo: str, original: str) -> Optional[str]:
+    """Primer grupo de `patron` buscado en minúsculas, recortado del texto original"""
+    match = patron.search(bajo)
+    if not match:
+        return None
+    # lower() conserva posiciones salvo en caracteres raros (p. ej. "İ")
+    fuente = original if len(original) == len(bajo) else bajo
+    return fuente[match.start(1):match.end(1)].strip()
+
+
+def _codigos_cie10(texto: str, secciones: Dict[str, str]) -> List[str]:
+    """Códigos CIE-10 con contexto diagnóstico, en orden y sin repetir"""
+    codigos = CIE10_RE.findall(secciones["analisis"])
+    for match in CIE10_CONTEXTO_RE.finditer(texto):
+        fin = texto.find("\n", match.end())
+        codigos += CIE10_RE.findall(texto, match.end(), len(texto) if fin == -1 else fin)
+    return list(dict.fromkeys(codigos))
+
+
+def parsear_nota(texto: str) -> Dict:
+    """Registro estructurado de la nota (secciones, signos, fechas, dosis, identificadores)"""
+    texto = texto[:MAX_NOTA_CHARS]
+    bajo = texto.lower()
+    secciones, apartados = dividir_secciones(texto, bajo)
+
+    dosis = []
+    for match in DOSIS_RE.finditer(bajo):
+        farmaco, cantidad, unidad, via, intervalo = match.groups()
+        dosis.append({
+            "farmaco": farmaco,
+            "cantidad": cantidad,
+            "unidad": unidad,
+            "via": via.upper() if via else None,
+            "intervalo_h": int(intervalo) if intervalo else None
+        })
+
+    return {
+        "secciones": secciones,
+        "apartados": apartados,
+        "signos_vitales": {k: _primero(p, bajo, texto) for k, p in SIGNOS_RE.items()},
+        "fechas": FECHA_RE.findall(bajo),
+        "horas": HORA_RE.findall(bajo),
+        "dosis": dosis,
+        "cedula": _primero(CEDULA_RE, bajo, texto),
+        "expediente": _primero(EXPEDIENTE_RE, bajo, texto),
+        # Los códigos CIE-10 van en mayúsculas: se buscan en el original
+        "cie10": _codigos_cie10(texto, secciones),
+        "paciente": {
+            "nombre": _primero(NOMBRE_RE, bajo, texto),
+            "edad": _primero(EDAD_RE, bajo, texto),
+            "sexo": _primero(SEXO_RE, bajo, texto)
+        },
+        "menciones": {k: bool(p.search(bajo)) for k, p in MENCIONES_RE.items()}
+    }
+
+
+# ═══════════════════════════════════════════════════════
+# CHECKLIST DE COMPONENTES (prompt de revision_nota)
+# ═══════════════════════════════════════════════════════
+
+CRITICO, IMPORTANTE, OPCIONAL = "🔴 Crítico", "🟡 Importante", "⚪ Opcional"
+SIGNOS_ETIQUETAS = {"ta": "TA", "fc": "FC", "fr": "FR", "temp": "Temp", "sato2": "SatO₂"}
+
+
+def _dosis_completas(r):
+    return bool(r["dosis"]) and all(d["via"] and d["intervalo_h"] for d in r["dosis"])
+
+
+def _signos(r):
+    return ", ".join(f"{SIGNOS_ETIQUETAS[k]} {r['signos_vitales'][k]}" for k in SIGNOS_ETIQUETAS if r["signos_vitales"][k])
+
+
+# (grupo, componente, criticidad si falta, verificador, valor mostrado)
+CHECKLIST = [
+    ("Datos del paciente y documento", "Fecha", CRITICO,
+     lambda r: bool(r["fechas"]), lambda r: r["fechas"][0]),
+    ("Datos del paciente y documento", "Hora", IMPORTANTE,
+     lambda r: bool(r["horas"]), lambda r: r["horas"][0]),
+    ("Datos del paciente y documento", "Nombre del paciente", CRITICO,
+     lambda r: bool(r["paciente"]["nombre"]), lambda r: r["paciente"]["nombre"]),
+    ("Datos del paciente y documento", "Edad", CRITICO,
+     lambda r: bool(r["paciente"]["edad"]), lambda r: f"{r['paciente']['edad']} años"),
+    ("Datos del paciente y documento", "Sexo", IMPORTANTE,
+     lambda r: bool(r["paciente"]["sexo"]), lambda r: r["paciente"]["sexo"]),
+    ("Datos del paciente y documento", "Número de expediente", IMPORTANTE,
+     lambda r: bool(r["expediente"]), lambda r: r["expediente"]),
+    ("Datos del paciente y documento", "Cédula profesional", CRITICO,
+     lambda r: bool(r["cedula"]), lambda r: r["cedula"]),
+    ("Datos del paciente y documento", "Servicio/área", OPCIONAL,
+     lambda r: r["menciones"]["servicio"], None),
+    ("Motivo de consulta", "Motivo de consulta", CRITICO,
+     lambda r: "motivo" in r["apartados"], None),
+    ("Padecimiento actual", "Padecimiento actual", CRITICO,
+     lambda r: "padecimiento" in r["apartados"] or "subjetivo" in r["apartados"], None),
+    ("Padecimiento actual", "Cronología de síntomas", IMPORTANTE,
+     lambda r: r["menciones"]["cronologia"], None),
+    ("Padecimiento actual", "Tratamientos previos", OPCIONAL,
+     lambda r: r["menciones"]["tratamientos_previos"], None),
+    ("Antecedentes", "Alergias", CRITICO,
+     lambda r: r["menciones"]["alergias"], None),
+    ("Antecedentes", "Antecedentes personales no patológicos", IMPORTANTE,
+     lambda r: r["menciones"]["no_patologicos"], None),
+    ("Antecedentes", "Antecedentes familiares", OPCIONAL,
+     lambda r: r["menciones"]["familiares"], None),
+    ("Exploración física", "Signos vitales completos (TA, FC, FR, Temp, SatO₂)", CRITICO,
+     lambda r: all(r["signos_vitales"][k] for k in SIGNOS_ETIQUETAS), _signos),
+    ("Exploración física", "Habitus exterior", IMPORTANTE,
+     lambda r: r["menciones"]["habitus"], None),
+    ("Exploración física", "Exploración por aparatos y sistemas", CRITICO,
+     lambda r: "exploracion" in r["apartados"] or "objetivo" in r["apartados"], None),
+    ("Impresión diagnóstica", "Impresión diagnóstica", CRITICO,
+     lambda r: bool(r["secciones"]["analisis"]), None),
+    ("Impresión diagnóstica", "Código CIE-10", IMPORTANTE,
+     lambda r: bool(r["cie10"]), lambda r: ", ".join(r["cie10"])),
+    ("Plan de manejo", "Estudios de laboratorio/gabinete", IMPORTANTE,
+     lambda r: r["menciones"]["estudios"], None),
+    ("Plan de manejo", "Tratamiento farmacológico (dosis, vía, frecuencia)", CRITICO,
+     _dosis_completas, lambda r: f"{len(r['dosis'])} indicación(es)"),
+    ("Plan de manejo", "Medidas no farmacológicas", OPCIONAL,
+     lambda r: r["menciones"]["no_farmacologico"], None),
+    ("Plan de manejo", "Pronóstico", IMPORTANTE,
+     lambda r: r["menciones"]["pronostico"], None),
+    ("Plan de manejo", "Seguimiento", IMPORTANTE,
+     lambda r: r["menciones"]["seguimiento"], None),
+    ("Legal y ético", "Firma y sello del médico", CRITICO,
+     lambda r: r["menciones"]["firma"], None),
+    ("Legal y ético", "Consentimiento informado (si aplica)", OPCIONAL,
+     lambda r: r["menciones"]["consentimiento"], None),
+]
+
+
+def evaluar_componentes(registro: Dict) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Componentes presentes [(grupo, componente, valor)] y faltantes
+    [(grupo, componente, criticidad)] según el checklist de revision_nota.
+    """
+    presentes, faltantes = [], []
+    for grupo, componente, criticidad, verificar, valor in CHECKLIST:
+        if verificar(registro):
+            presentes.append((grupo, componente, valor(registro) if valor else None))
+        else:
+            faltantes.append((grupo, componente, criticidad))
+    return presentes, faltantes
+
+
+def formatear_componentes(presentes: List[Tuple], faltantes: List[Tuple]) -> str:
+    """Markdown de las secciones "Componentes Presentes" y "Componentes Faltantes" """
+    lineas = ["## ✅ Componentes Presentes"]
+    grupo_actual = None
+    for grupo, componente, valor in presentes:
+        if grupo != grupo_actual:
+            lineas.append(f"\n**{grupo}**")
+            grupo_actual = grupo
+        lineas.append(f"- {componente}" + (f": {valor}" if valor else ""))
+
+    lineas.append("\n## ❌ Componentes Faltantes")
+    if not faltantes:
+        lineas.append("Sin componentes faltantes del checklist.")
+    for criticidad in (CRITICO, IMPORTANTE, OPCIONAL):
+        items = [f"- {componente} ({grupo})" for grupo, componente, c in faltantes if c == criticidad]
+        if items:
+            lineas.append(f"\n**{criticidad}**")
+            lineas.extend(items)
+    return "\n".join(lineas)
+
+
+def _fragmento(texto: str) -> str:
+    if len(texto) <= MAX_FRAGMENTO_CHARS:
+        return texto
+    return texto[:MAX_FRAGMENTO_CHARS] + " [...]"
+
+
+def construir_prompt_juicio(registro: Dict, presentes: List[Tuple], faltantes: List[Tuple]) -> str:
+    """
+    Prompt compacto para el proveedor: resultado del checklist ya resuelto y
+    sólo los fragmentos que requieren juicio (análisis y plan).
+    """
+    indicaciones = dict.fromkeys(
+        f"{d['farmaco']} {d['cantidad']} {d['unidad']}"
+        + (f" {d['via']}" if d["via"] else " [sin vía]")
+        + (f" c/{d['intervalo_h']} h" if d["intervalo_h"] else " [sin frecuencia]")
+        for d in registro["dosis"]
+    )
+
+    lineas = [
+        "RESUMEN ESTRUCTURADO DE LA NOTA (extraído localmente):",
+        f"- Checklist: {len(presentes)}/{len(presentes) + len(faltantes)} componentes presentes",
+        f"- Faltantes críticos: {', '.join(c for _, c, k in faltantes if k == CRITICO) or 'ninguno'}",
+        f"- Faltantes importantes: {', '.join(c for _, c, k in faltantes if k == IMPORTANTE) or 'ninguno'}",
+        f"- Signos vitales: {_signos(registro) or 'no registrados'}",
+        f"- Indicaciones farmacológicas: {'; '.join(indicaciones) or 'ninguna detectada'}",
+        f"- CIE-10: {', '.join(registro['cie10']) or 'no registrado'}",
+    ]
+    for titulo, clave in (("Análisis / Impresión diagnóstica", "analisis"), ("Plan", "plan")):
+        if registro["secciones"][clave]:
+            lineas += ["", f"### {titulo}", _fragmento(registro["secciones"][clave])]
+    return "\n".join(lineas)
+
+
+def revisar_nota(texto: str) -> Dict:
+    """
+    Parte local de revision_nota: markdown de componentes (listo para
+    enviarse de inmediato), prompt compacto y tokens estimados.
+    """
+    registro = parsear_nota(texto)
+    presentes, faltantes = evaluar_componentes(registro)
+    prompt = construir_prompt_juicio(registro, presentes, faltantes)
+    return {
+        "registro": registro,
+        "componentes": formatear_componentes(presentes, faltantes),
+        "prompt": prompt,
+        "tokens_nota": estimar_tokens(texto),
+        "tokens_prompt": estimar_tokens(prompt)
+    }
@@ -0,0 +1,231 @@
+"""
+Corrección Ortográfica de Términos Médicos (borrado simétrico)
+==============================================================
+
+El Wrapper sólo encuentra keywords por subcadena exacta: "higado",
+"irrigacion" o "espironolactna" no cuentan, la pregunta cae en REFORMULAR
+y cada variante es una clave de cache distinta. Este índice normaliza la
+pregunta antes de clasificarla y de buscarla en cache:
+
+- Vocabulario: palabras de las keywords, regiones anatómicas y fármacos
+  (drugs.json y FARMACOS_COMUNES), cada una con un ID canónico por forma sin
+  acentos; la forma canónica es la acentuada ("higado" → "hígado").
+- Índice de borrado simétrico (SymSpell): para cada palabra del
+  vocabulario se precalculan sus variantes con hasta MAX_DISTANCIA letras
+  borradas. Una palabra escrita se busca generando sus propios borrados: la
+  corrección de distancia ≤ 2 son unas decenas de consultas a un dict,
+  verificadas con Damerau-Levenshtein.
+
+Para no "corregir" palabras comunes: las formas que ya están en el
+vocabulario no se tocan, las de menos de MIN_LARGO letras sólo reciben
+acentos, la distancia 2 exige MIN_LARGO_DISTANCIA_2 letras y la primera
+letra debe coincidir ("color" no se vuelve "dolor"), no se recortan
+flexiones ("arterial" no se vuelve "arteria") ni se cambia una terminación
+válida por otra a distancia 2 ("fisiologia" no se vuelve "fisiológico").
+
+El índice se compila con el snapshot de diccionarios (src/snapshot.py), así
+que también se recarga en caliente.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+MAX_DISTANCIA = 2
+MIN_LARGO = 6
+MIN_LARGO_DISTANCIA_2 = 9
+# Las palabras más cortas no entran al vocabulario (artículos, "de", "del")
+MIN_LARGO_VOCABULARIO = 4
+# Terminaciones de palabras válidas: a distancia 2 con otro largo y la misma
+# raíz, la palabra escrita es otra flexión y no un error de la candidata
+SUFIJOS_FLEXION = (
+    "ia", "ias", "ico", "ica", "icos", "icas", "al", "ales", "oso", "osa",
+    "osos", "osas", "cion", "ciones", "dad", "ismo", "itis", "osis"
+)
+MAX_LARGO_TERMINACION = 3
+# Preguntas más largas no se corrigen (las notas pegadas se detectan antes)
+MAX_CARACTERES_CORRECCION = 1000
+
+# Fármacos frecuentes sin entrada en drugs.json (también los usa el Wrapper)
+FARMACOS_COMUNES = (
+    'espironolactona', 'metformina', 'losartán', 'losartan', 'enalapril',
+    'omeprazol', 'ibuprofeno', 'paracetamol', 'aspirina', 'atorvastatina',
+    'simvastatina', 'amlodipino', 'metoprolol', 'atenolol', 'furosemida',
+    'hidroclorotiazida', 'levotiroxina', 'insulina', 'warfarina', 'heparina',
+    'amoxicilina', 'azitromicina', 'ciprofloxacino', 'diclofenaco', 'vancomicina'
+)
+
+_PALABRA_RE = re.compile(r"[^\W\d_]+")
+
+
+def sin_acentos(texto: str) -> str:
+    texto = unicodedata.normalize("NFD", texto)
+    return "".join(ch for ch in texto if unicodedata.category(ch) != "Mn")
+
+
+def _borrados(palabra: str, distancia: int) -> set:
+    """La palabra y todas sus variantes con hasta `distancia` letras borradas"""
+    variantes = {palabra}
+    frontera = {palabra}
+    for _ in range(distancia):
+        siguiente = set()
+        for v in frontera:
+            if len(v) > 1:
+                siguiente.update(v[:i] + v[i + 1:] for i in range(len(v)))
+        variantes |= siguiente
+        frontera = siguiente
+    return variantes
+
+
+def _otra_flexion(palabra: str, candidata: str) -> bool:
+    """Misma raíz, terminación distinta y la palabra acaba en un sufijo válido"""
+    if len(palabra) == len(candidata) or not palabra.endswith(SUFIJOS_FLEXION):
+        return False
+    comun = 0
+    for a, b in zip(palabra, candidata):
+        if a != b:
+            break
+        comun += 1
+    return comun >= min(len(palabra), len(candidata)) - MAX_LARGO_TERMINACION
+
+
+def damerau(a: str, b: str, limite: int) -> int:
+    """Distancia Damerau-Levenshtein (transposiciones adyacentes); limite + 1 si la excede"""
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    # Sólo la banda |i - j| ≤ limite puede quedar dentro del límite
+    fuera = limite + 1
+    anterior2 = None
+    anterior = [j if j <= limite else fuera for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        actual = [fuera] * (len(b) + 1)
+        if i <= limite:
+            actual[0] = i
+        for j in range(max(1, i - limite), min(len(b), i + limite) + 1):
+            costo = a[i - 1] != b[j - 1]
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if anterior2 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual[j] = valor
+        if min(actual) > limite:
+            return fuera
+        anterior2, anterior = anterior, actual
+    return min(anterior[-1], fuera)
+
+
+class Correccion(NamedTuple):
+    texto: str
+    terminos: Tuple[int, ...]
+    cambios: Tuple[Tuple[str, str], ...]
+
+
+class IndiceOrtografico:
+    def __init__(self, palabras):
+        """`palabras`: formas escritas del vocabulario (con repeticiones = frecuencia)"""
+        frecuencias = Counter(p.lower() for p in palabras if len(p) >= MIN_LARGO_VOCABULARIO)
+        formas: Dict[str, Counter] = {}
+        for forma, veces in frecuencias.items():
+            formas.setdefault(sin_acentos(forma), Counter())[forma] += veces
+        # Una forma canónica por palabra sin acentos: la acentuada, luego la más frecuente
+        self.canonicas: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.frecuencia: List[int] = []
+        for plana in sorted(formas):
+            candidatas = formas[plana]
+            canonica = max(candidatas, key=lambda f: (f != plana, candidatas[f], f))
+            self.ids[plana] = len(self.canonicas)
+            self.canonicas.append(canonica)
+            self.frecuencia.append(sum(candidatas.values()))
+        self.formas = frozenset(frecuencias)
+        self.planas: List[str] = sorted(formas)
+        borrados: Dict[str, List[int]] = {}
+        for plana, id_ in self.ids.items():
+            distancia = MAX_DISTANCIA if len(plana) >= MIN_LARGO_DISTANCIA_2 else 1
+            for variante in _borrados(plana, distancia):
+                borrados.setdefault(variante, []).append(id_)
+        self.borrados = {k: tuple(v) for k, v in borrados.items()}
+        self._crear_cache()
+
+    def _crear_cache(self):
+        # Cache por instancia: una recarga no deja vivo el índice anterior
+        self._buscar = lru_cache(maxsize=8192)(self._buscar_sin_cache)
+
+    @classmethod
+    def desde_diccionarios(cls, domains, drugs):
+        """Vocabulario de domains.json, drugs.json y FARMACOS_COMUNES"""
+        textos = [kw for kws in domains.get("keywords", {}).values() for kw in kws]
+        textos += list(domains.get("anatomical_regions", ()))
+        for farmaco in drugs.get("farmacos", {}).values():
+            textos += [farmaco.get("nombre", ""), *farmaco.get("sinonimos", ())]
+        textos += FARMACOS_COMUNES
+        return cls(p for t in textos if isinstance(t, str) for p in _PALABRA_RE.findall(t.lower()))
+
+    def __len__(self):
+        return len(self.canonicas)
+
+    def buscar(self, palabra: str) -> Optional[int]:
+        """ID canónico de una palabra en minúsculas (exacta, sin acentos o corregida)"""
+        return self._buscar(palabra)
+
+    def _buscar_sin_cache(self, palabra):
+        plana = sin_acentos(palabra)
+        if plana in self.ids:
+            return self.ids[plana]
+        if len(plana) < MIN_LARGO:
+            return None
+        limite = MAX_DISTANCIA if len(plana) >= MIN_LARGO_DISTANCIA_2 else 1
+        # Una misma candidata aparece por varios borrados: se verifica una vez
+        candidatos = set()
+        for variante in _borrados(plana, limite):
+            ids = self.borrados.get(variante)
+            if ids:
+                candidatos.update(ids)
+        mejor, clave_mejor = None, None
+        for id_ in candidatos:
+            candidata = self.planas[id_]
+            # Flexiones ("arterial", "anemias") ya contienen la keyword como subcadena
+            if candidata[0] != plana[0] or plana.startswith(candidata):
+                continue
+            distancia = damerau(plana, candidata, limite)
+            if distancia > limite or (distancia == 2 and _otra_flexion(plana, candidata)):
+                continue
+            clave = (distancia, -self.frecuencia[id_], candidata)
+            if clave_mejor is None or clave < clave_mejor:
+                mejor, clave_mejor = id_, clave
+        return mejor
+
+    def corregir(self, texto: str) -> Correccion:
+        """Texto (en minúsculas) con las palabras del vocabulario en su forma canónica"""
+        if len(texto) > MAX_CARACTERES_CORRECCION:
+            return Correccion(texto, (), ())
+        partes, terminos, cambios = [], [], []
+        ultimo = 0
+        for match in _PALABRA_RE.finditer(texto):
+            palabra = match.group()
+            if len(palabra) < MIN_LARGO_VOCABULARIO:
+                continue
+            id_ = self._buscar(palabra)
+            if id_ is None:
+                continue
+            terminos.append(id_)
+            if palabra in self.formas:
+                continue
+            canonica = self.canonicas[id_]
+            partes.append(texto[ultimo:match.start()])
+            partes.append(canonica)
+            ultimo = match.end()
+            cambios.append((palabra, canonica))
+        if not cambios:
+            return Correccion(texto, tuple(sorted(set(terminos))), ())
+        partes.append(texto[ultimo:])
+        return Correccion("".join(partes), tuple(sorted(set(terminos))), tuple(cambios))
+
+    def __getstate__(self):
+        # El cache de _buscar es por proceso; no se serializa con el snapshot
+        return {k: v for k, v in self.__dict__.items() if k != "_buscar"}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._crear_cache()
@@ -0,0 +1,81 @@
+"""
+Planificador de Consultas Amplias (modo "expand")
+=================================================
+
+En lugar de devolver al usuario las reformulaciones de una pregunta amplia,
+las usa como sub-preguntas, las genera en paralelo con presupuestos de
+tokens pequeños y entrega cada parte en cuanto termina. La latencia total
+queda cerca de la de una respuesta corta.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.amplitud_detector import detectar_amplitud, obtener_reformulaciones
+
+UMBRAL_EXPANSION = 7
+MAX_PARTES = 5
+TOKENS_POR_PARTE = 900
+
+
+class QueryPlanner:
+    def __init__(self, client, max_parts=MAX_PARTES, part_max_tokens=TOKENS_POR_PARTE):
+        self.client = client
+        self.max_parts = max_parts
+        self.part_max_tokens = part_max_tokens
+
+    def plan(self, question, domain):
+        """
+        Sub-preguntas para una pregunta amplia (score ≥ 7), o None si la
+        pregunta es suficientemente específica para responderse directo.
+        """
+        if detectar_amplitud(question, domain) < UMBRAL_EXPANSION:
+            return None
+        return obtener_reformulaciones(question, domain)[:self.max_parts]
+
+    def _build_part_prompt(self, question, subquestion):
+        return f"""Responde de forma concisa y completa (máximo ~{self.part_max_tokens // 2} palabras) sobre:
+{subquestion}
+
+Contexto: esta es UNA PARTE de una respuesta más amplia a "{question}".
+No repitas introducciones generales ni la estructura completa; ve directo al contenido.
+Termina con una línea de fuentes.
+NO agregues mensajes sobre formato corregido al final."""
+
+    def _generate_part(self, question, subquestion, domain):
+        return self.client.generate_chunk(
+            prompt=self._build_part_prompt(question, subquestion),
+            domain=domain,
+            max_tokens=self.part_max_tokens
+        )
+
+    def execute(self, question, domain, subquestions):
+        """
+        Genera todas las partes en paralelo y las entrega conforme terminan:
+        dicts {"index", "title", "content", "ok"} en orden de finalización.
+        """
+        if not subquestions:
+            return
+
+        with ThreadPoolExecutor(max_workers=len(subquestions)) as executor:
+            futures = {
+                executor.submit(self._generate_part, question, sub, domain): (i, sub)
+                for i, sub in enumerate(subquestions, 1)
+            }
+            for future in as_completed(futures):
+                index, title = futures[future]
+                try:
+                    content = future.result()
+                    yield {"index": index, "title": title, "content": content, "ok": True}
+                except Exception as e:
+                    print(f"❌ Error en parte {index} del plan: {str(e)}")
+                    yield {"index": index, "title": title, "content": "⚠️ Error al generar esta sección.", "ok": False}
+
+    def answer(self, question, domain, subquestions):
+        """Respuesta combinada (no streaming) con las partes en orden del plan."""
+        parts = sorted(self.execute(question, domain, subquestions), key=lambda p: p["index"])
+        return "\n\n".join(format_part(part) for part in parts)
+
+
+def format_part(part):
+    """Markdown de una parte del plan"""
+    return f"## {part['index']}. {part['title']}\n\n{part['content']}"
@@ -0,0 +1,204 @@
+"""
+Elaboración de Notas por Campos (comando elaboracion_nota)
+==========================================================
+
+En lugar de que el modelo reimprima la plantilla SOAP completa (separadores
+incluidos), el modelo devuelve sólo los valores de los campos, un objeto
+JSON por línea, y esta plantilla local los rellena. Los bloques se envían al
+cliente conforme llegan sus campos.
+
+Se activa con NOTA_POR_CAMPOS=1 mientras se compara contra el modo actual.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Iterator, List
+
+NOTA_POR_CAMPOS = os.environ.get("NOTA_POR_CAMPOS", "0").lower() in ("1", "true", "si", "sí")
+
+FALTANTE = "[COMPLETAR]"
+# Valores de "sexo" que omiten los antecedentes gineco-obstétricos ("Mujer" también empieza con M)
+SEXO_MASCULINO = {"m", "masculino", "hombre", "h"}
+SEPARADOR = "═" * 59
+SENALES_FIN = ("__STREAM_DONE__", "[STREAM_COMPLETE]")
+# El proveedor cortó por max_tokens (ver src/deepseek.py): no es texto
+SENAL_TRUNCADA = "__STREAM_TRUNCATED__"
+
+# ═══════════════════════════════════════════════════════
+# CAMPOS (en el orden en que el modelo debe emitirlos)
+# ═══════════════════════════════════════════════════════
+
+CAMPOS_NOTA = [
+    ("fecha", "DD/MM/AAAA"), ("hora", "HH:MM"), ("servicio", "servicio o consultorio"),
+    ("medico", "nombre completo del médico"), ("cedula", "cédula profesional"),
+    ("nombre", "nombre del paciente"), ("edad", "años"), ("sexo", "M/F"), ("expediente", "número"),
+    ("motivo", "motivo de consulta con palabras del paciente"),
+    ("inicio", "fecha o tiempo de inicio"), ("sintomas", "síntomas"), ("evolucion", "evolución"),
+    ("tratamientos_previos", "tratamientos previos"),
+    ("ant_patologicos", "alergias, cirugías, enfermedades crónicas"),
+    ("ant_no_patologicos", "tabaquismo, alcoholismo"), ("ant_familiares", "enfermedades hereditarias"),
+    ("gineco", "G_P_A_C_ sólo si es mujer"),
+    ("ta", "sistólica/diastólica"), ("fc", "lpm"), ("fr", "rpm"), ("temp", "°C"), ("sato2", "%"),
+    ("peso", "kg"), ("talla", "cm"), ("imc", "kg/m²"),
+    ("habitus", "habitus exterior"), ("cabeza_cuello", ""), ("torax", ""), ("abdomen", ""),
+    ("extremidades", ""), ("neurologico", ""),
+    ("estudios_previos", "laboratorios/imagenología"),
+    ("dx_principal", "diagnóstico principal con CIE-10 si aplica"), ("dx_secundario", ""),
+    ("justificacion", "correlación clínica"), ("dx_diferencial", "lista"),
+    ("estudios_solicitados", "lista"), ("tratamiento", "lista: fármaco dosis vía frecuencia duración"),
+    ("medidas", "lista de medidas no farmacológicas"), ("pronostico", "bueno/reservado/malo"),
+    ("cita_control", "fecha"), ("signos_alarma", ""),
+]
+INDICE_CAMPO = {campo: i for i, (campo, _) in enumerate(CAMPOS_NOTA)}
+
+# ═══════════════════════════════════════════════════════
+# PLANTILLA (misma estructura que el prompt de elaboracion_nota)
+# ═══════════════════════════════════════════════════════
+
+
+def _titulo(texto: str) -> str:
+    return f"{SEPARADOR}\n{texto}\n{SEPARADOR}\n"
+
+
+BLOQUES_NOTA = [
+    ("NOTA MÉDICA\n" + _titulo("DATOS DEL DOCUMENTO")
+     + "Fecha: {fecha} Hora: {hora}\nServicio/Consultorio: {servicio}\nMédico: {medico}\n"
+       "Cédula Profesional: {cedula}\n"),
+    (_titulo("DATOS DEL PACIENTE")
+     + "Nombre: {nombre}\nEdad: {edad} Sexo: {sexo}\nExpediente: {expediente}\n"),
+    (_titulo("S - SUBJETIVO")
+     + "MOTIVO DE CONSULTA:\n{motivo}\n\nPADECIMIENTO ACTUAL:\nInicio: {inicio}\nSíntomas: {sintomas}\n"
+       "Evolución: {evolucion}\nTratamientos previos: {tratamientos_previos}\n"),
+    ("ANTECEDENTES:\n- Personales patológicos: {ant_patologicos}\n- Personales no patológicos: {ant_no_patologicos}\n"
+     "- Familiares: {ant_familiares}\n- Gineco-obstétricos: {gineco}\n"),
+    (_titulo("O - OBJETIVO")
+     + "SIGNOS VITALES:\n- TA: {ta} mmHg\n- FC: {fc} lpm\n- FR: {fr} rpm\n- Temperatura: {temp} °C\n"
+       "- SatO₂: {sato2} %\n- Peso: {peso} kg Talla: {talla} cm IMC: {imc}\n"),
+    ("EXPLORACIÓN FÍSICA:\nHabitus exterior: {habitus}\nCabeza y cuello: {cabeza_cuello}\nTórax: {torax}\n"
+     "Abdomen: {abdomen}\nExtremidades: {extremidades}\nNeurológico: {neurologico}\n\n"
+     "ESTUDIOS PREVIOS (si aplica):\n{estudios_previos}\n"),
+    (_titulo("A - ANÁLISIS")
+     + "IMPRESIÓN DIAGNÓSTICA:\n{dx_principal}\n{dx_secundario}\n\nJUSTIFICACIÓN:\n{justificacion}\n\n"
+       "DIAGNÓSTICO DIFERENCIAL:\n{dx_diferencial}\n"),
+    (_titulo("P - PLAN")
+     + "ESTUDIOS SOLICITADOS:\n{estudios_solicitados}\n\nTRATAMIENTO FARMACOLÓGICO:\n{tratamiento}\n\n"
+       "MEDIDAS NO FARMACOLÓGICAS:\n{medidas}\n"),
+    ("PRONÓSTICO:\n{pronostico}\n\nSEGUIMIENTO:\nCita de control: {cita_control}\n"
+     "Signos de alarma: {signos_alarma}\n\n" + SEPARADOR + "\n_______________________\nFirma y Sello del Médico\n"),
+]
+
+# Viñeta por campo de lista
+VINETAS = {"dx_diferencial": "- ", "estudios_solicitados": "□ ", "tratamiento": "", "medidas": "- "}
+
+
+def _campos_de(bloque: str) -> List[str]:
+    return [campo for campo, _ in CAMPOS_NOTA if "{" + campo + "}" in bloque]
+
+
+_CAMPOS_BLOQUE = [_campos_de(b) for b in BLOQUES_NOTA]
+# Índice del último campo de cada bloque: el bloque está listo cuando el
+# modelo ya emitió ese campo o cualquiera posterior
+_ULTIMO_CAMPO = [max(INDICE_CAMPO[c] for c in campos) for campos in _CAMPOS_BLOQUE]
+
+
+def _formatear_valor(campo: str, valor) -> str:
+    if valor is None or valor == "" or valor == []:
+        return FALTANTE
+    if isinstance(valor, list):
+        vineta = VINETAS.get(campo, "- ")
+        return "\n".join(f"{vineta}{v}" for v in valor if v) or FALTANTE
+    return str(valor).strip() or FALTANTE
+
+
+def renderizar_bloque(indice: int, valores: Dict) -> str:
+    bloque = BLOQUES_NOTA[indice]
+    campos = {c: _formatear_valor(c, valores.get(c)) for c in _CAMPOS_BLOQUE[indice]}
+    if campos.get("gineco") == FALTANTE and str(valores.get("sexo", "")).strip(" .").lower() in SEXO_MASCULINO:
+        campos["gineco"] = "No aplica"
+    return bloque.format(**campos)
+
+
+def renderizar_nota(valores: Dict) -> str:
+    """Nota completa a partir de un dict de campos"""
+    return "\n".join(renderizar_bloque(i, valores) for i in range(len(BLOQUES_NOTA)))
+
+
+def instrucciones_campos() -> str:
+    """Lista compacta de campos para el prompt de sistema"""
+    return "\n".join(f"{campo}: {ayuda}" if ayuda else campo for campo, ayuda in CAMPOS_NOTA)
+
+
+# ═══════════════════════════════════════════════════════
+# RENDERIZADO INCREMENTAL
+# ═══════════════════════════════════════════════════════
+
+class RenderizadorNota:
+    """
+    Consume los tokens del modelo (NDJSON {"campo": valor} por línea) y
+    entrega los bloques de la plantilla en orden conforme se completan.
+    """
+
+    def __init__(self):
+        self.valores = {}
+        self.lineas_invalidas = []
+        self._buffer = ""
+        self._siguiente_bloque = 0
+        self._max_indice = -1
+
+    def _procesar_linea(self, linea: str):
+        linea = linea.strip().strip(",")
+        if not linea or linea.startswith("```"):
+            return
+        try:
+            objeto = json.loads(linea)
+        except json.JSONDecodeError:
+            self.lineas_invalidas.append(linea)
+            return
+        if not isinstance(objeto, dict):
+            self.lineas_invalidas.append(linea)
+            return
+        # Acepta {"campo": valor} y {"campo": "x", "valor": valor}
+        if set(objeto) == {"campo", "valor"}:
+            objeto = {objeto["campo"]: objeto["valor"]}
+        for campo, valor in objeto.items():
+            if campo in INDICE_CAMPO:
+                self.valores[campo] = valor
+                self._max_indice = max(self._max_indice, INDICE_CAMPO[campo])
+
+    def _bloques_listos(self, final=False) -> Iterator[str]:
+        while self._siguiente_bloque < len(BLOQUES_NOTA) and (
+                final or _ULTIMO_CAMPO[self._siguiente_bloque] <= self._max_indice):
+            yield renderizar_bloque(self._siguiente_bloque, self.valores) + "\n"
+            self._siguiente_bloque += 1
+
+    def feed(self, texto: str) -> Iterator[str]:
+        """Agrega tokens y entrega los bloques que ya pueden renderizarse"""
+        self._buffer += texto
+        *lineas, self._buffer = self._buffer.split("\n")
+        for linea in lineas:
+            self._procesar_linea(linea)
+        yield from self._bloques_listos()
+
+    def finish(self) -> Iterator[str]:
+        """Cierra el stream: completa los bloques restantes con [COMPLETAR]"""
+        self._procesar_linea(self._buffer)
+        self._buffer = ""
+        if not self.valores and self.lineas_invalidas:
+            # El modelo no respondió en formato de campos (o hubo un error): mostrar tal cual
+            yield "\n".join(self.lineas_invalidas)
+            return
+        yield from self._bloques_listos(final=True)
+
+    def stream(self, tokens: Iterable[str]) -> Iterator[str]:
+        for token in tokens:
+            if token in SENALES_FIN:
+                break
+            if token == SENAL_TRUNCADA:
+                continue
+            yield from self.feed(token)
+        yield from self.finish()
+
+
+def renderizar_respuesta(texto: str) -> str:
+    """Nota completa desde una respuesta no streaming en formato de campos"""
+    return "".join(RenderizadorNota().stream([texto]))
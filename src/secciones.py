@@ -0,0 +1,213 @@
+"""
+Respuestas por Secciones en una Sola Llamada
+============================================
+
+Los comandos especiales se respondían con una llamada por sección, y cada
+prompt repetía la nota o el caso completo (la entrada se pagaba 4-5 veces).
+Aquí la entrada se envía una vez junto con un manifiesto de secciones; la
+respuesta única se divide localmente en los encabezados `## ` conforme llega
+y cada sección se entrega en cuanto termina.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, Iterator, List
+
+from src.tokens import estimar_tokens
+
+SECCIONES_UNA_LLAMADA = os.environ.get("SECCIONES_UNA_LLAMADA", "1").lower() in ("1", "true", "si", "sí")
+
+SENALES_FIN = ("__STREAM_DONE__", "[STREAM_COMPLETE]")
+# El proveedor cortó por max_tokens (ver src/deepseek.py)
+SENAL_TRUNCADA = "__STREAM_TRUNCATED__"
+MARCA_ENTRADA = "[ENTRADA]"
+
+# ═══════════════════════════════════════════════════════
+# SECCIONES POR COMANDO (título, prompt por sección, max_tokens)
+# ═══════════════════════════════════════════════════════
+
+SECCIONES_ESPECIALES = {
+    "revision_nota": [
+        ('## ✅ Componentes Presentes',
+         "Analiza QUÉ COMPONENTES SÍ ESTÁN en esta nota médica:\n\n{question}\n\nLista detallada con ejemplos específicos.",
+         1200),
+        ('## ❌ Componentes Faltantes',
+         "Identifica QUÉ FALTA en esta nota médica según JCI/COFEPRIS:\n\n{question}\n\nPrioriza por criticidad.",
+         1200),
+        ('## ⚠️ Errores Detectados',
+         "Identifica ERRORES de formato, dosis, abreviaturas en:\n\n{question}",
+         1000),
+        ('## 📋 Cumplimiento Legal',
+         "Evalúa cumplimiento de normas (COFEPRIS, JCI, Clínica Mayo) en:\n\n{question}",
+         800),
+        ('## 💡 Recomendaciones',
+         "Da recomendaciones PRIORITARIAS y opcionales para mejorar:\n\n{question}",
+         1000)
+    ],
+    "correccion_nota": [
+        ('## ❌ Errores Detectados',
+         "Identifica TODOS los errores (formato, ortografía, dosis) en:\n\n{question}",
+         1500),
+        ('## ✅ Nota Corregida',
+         "Proporciona versión CORREGIDA COMPLETA de:\n\n{question}\n\nMarca cambios claramente.",
+         2000),
+        ('## 💡 Sugerencias Adicionales',
+         "Da sugerencias para MEJORAR la calidad de:\n\n{question}",
+         800)
+    ],
+    "elaboracion_nota": [
+        ('## DATOS Y SUBJETIVO (S)',
+         "Genera sección completa de DATOS DEL PACIENTE y SUBJETIVO para:\n\n{question}\n\nUsa formato profesional con todos los campos.",
+         1200),
+        ('## OBJETIVO (O)',
+         "Genera sección completa OBJETIVO (signos vitales, exploración física) para:\n\n{question}",
+         1200),
+        ('## ANÁLISIS (A)',
+         "Genera sección completa de ANÁLISIS (impresión diagnóstica, justificación) para:\n\n{question}",
+         1000),
+        ('## PLAN (P)',
+         "Genera sección completa de PLAN (estudios, tratamiento, pronóstico) para:\n\n{question}",
+         1200)
+    ],
+    "valoracion": [
+        ('## 📋 Resumen del Caso',
+         "Resume el caso clínico en 3-4 líneas:\n\n{question}",
+         600),
+        ('## 🎯 Hipótesis Diagnósticas',
+         "Proporciona diagnóstico más probable y 3 diferenciales COMPLETOS con justificación para:\n\n{question}",
+         1500),
+        ('## 🔬 Estudios Sugeridos',
+         "Lista COMPLETA de laboratorios e imagenología prioritarios para:\n\n{question}",
+         1000),
+        ('## 💊 Abordaje Terapéutico',
+         "Plan terapéutico COMPLETO (medidas generales, fármacos con dosis, criterios de referencia) para:\n\n{question}",
+         1500),
+        ('## ⚠️ Signos de Alarma',
+         "Lista completa de signos de alarma y criterios de derivación urgente para:\n\n{question}",
+         800)
+    ],
+    "study_mode": [
+        ('## 📚 Conceptos Fundamentales',
+         "Explica los CONCEPTOS BÁSICOS COMPLETOS de: {question}\n\nCon definiciones claras.",
+         1200),
+        ('## 🧠 Analogías y Memorización',
+         "Crea ANALOGÍAS DETALLADAS y técnicas de memorización para: {question}",
+         1200),
+        ('## 🔗 Correlación Clínica',
+         "Explica la APLICACIÓN CLÍNICA COMPLETA con casos prácticos de: {question}",
+         1200),
+        ('## 💡 Tips de Estudio',
+         "Proporciona estrategias COMPLETAS para estudiar efectivamente: {question}",
+         800)
+    ],
+}
+
+
+def titulos_de(special_command) -> List[str]:
+    return [titulo for titulo, _, _ in SECCIONES_ESPECIALES.get(special_command, [])]
+
+
+# ═══════════════════════════════════════════════════════
+# PROMPT ÚNICO CON MANIFIESTO
+# ═══════════════════════════════════════════════════════
+
+def construir_prompt(question: str, special_command: str) -> str:
+    """Entrada una sola vez + manifiesto con la instrucción de cada sección"""
+    manifiesto = []
+    for i, (titulo, plantilla, max_tokens) in enumerate(SECCIONES_ESPECIALES[special_command], 1):
+        instruccion = " ".join(plantilla.format(question=MARCA_ENTRADA).split())
+        manifiesto.append(f"{i}. {titulo}\n   {instruccion} (máx. ~{max_tokens} tokens)")
+    return (f"{MARCA_ENTRADA}\n{question}\n\n"
+            "Responde con las siguientes secciones, en este orden, cada una iniciando con su "
+            "encabezado EXACTO en una línea propia. No agregues otras secciones de nivel ##:\n\n"
+            + "\n".join(manifiesto))
+
+
+def ahorro_entrada(question: str, special_command: str, system_por_seccion: str, system_unico: str) -> Dict:
+    """Tokens de entrada estimados: una llamada por sección vs. una sola llamada"""
+    t_system = estimar_tokens(system_por_seccion)
+    por_seccion = sum(t_system + estimar_tokens(plantilla.format(question=question))
+                      for _, plantilla, _ in SECCIONES_ESPECIALES[special_command])
+    una_llamada = estimar_tokens(system_unico) + estimar_tokens(construir_prompt(question, special_command))
+    return {
+        "llamadas_evitadas": len(SECCIONES_ESPECIALES[special_command]) - 1,
+        "tokens_entrada_por_seccion": por_seccion,
+        "tokens_entrada_una_llamada": una_llamada,
+        "tokens_ahorrados": por_seccion - una_llamada
+    }
+
+
+# ═══════════════════════════════════════════════════════
+# DIVISIÓN INCREMENTAL EN ENCABEZADOS ##
+# ═══════════════════════════════════════════════════════
+
+def _clave(titulo: str) -> str:
+    """Título sin emojis, marcas ni mayúsculas para comparar encabezados"""
+    return re.sub(r"[^\w()]+", " ", titulo.lstrip("#").lower()).strip()
+
+
+class DivisorSecciones:
+    """
+    Consume los tokens de la respuesta única y entrega cada sección
+    ({"index", "title", "content"}) cuando empieza la siguiente o termina el
+    stream. Los encabezados `## ` dentro de bloques de código no cortan.
+    """
+
+    def __init__(self, titulos: List[str]):
+        self.titulos = titulos
+        self._claves = {_clave(t): i for i, t in enumerate(titulos)}
+        self._buffer = ""
+        self._en_codigo = False
+        self._titulo = None
+        self._lineas = []
+        self._index = 0
+        self._emitidas = set()
+        self.truncada = False
+
+    def _cerrar(self) -> Iterator[Dict]:
+        contenido = "\n".join(self._lineas).strip()
+        if self._titulo is not None or contenido:
+            yield {"index": self._index, "title": self._titulo or "", "content": contenido}
+            self._index += 1
+        self._lineas = []
+
+    def _procesar_linea(self, linea: str) -> Iterator[Dict]:
+        if linea.lstrip().startswith("```"):
+            self._en_codigo = not self._en_codigo
+        elif not self._en_codigo and linea.startswith("## "):
+            yield from self._cerrar()
+            # Título canónico del manifiesto si el modelo lo alteró ligeramente
+            posicion = self._claves.get(_clave(linea))
+            if posicion is not None:
+                self._emitidas.add(posicion)
+                self._titulo = self.titulos[posicion]
+            else:
+                self._titulo = linea.strip()
+            return
+        self._lineas.append(linea)
+
+    def feed(self, texto: str) -> Iterator[Dict]:
+        self._buffer += texto
+        *lineas, self._buffer = self._buffer.split("\n")
+        for linea in lineas:
+            yield from self._procesar_linea(linea)
+
+    def finish(self) -> Iterator[Dict]:
+        yield from self._procesar_linea(self._buffer)
+        self._buffer = ""
+        yield from self._cerrar()
+
+    def stream(self, tokens: Iterable[str]) -> Iterator[Dict]:
+        for token in tokens:
+            if token in SENALES_FIN:
+                break
+            if token == SENAL_TRUNCADA:
+                self.truncada = True
+                continue
+            yield from self.feed(token)
+        yield from self.finish()
+
+    @property
+    def faltantes(self) -> List[str]:
+        """Secciones del manifiesto que el modelo no llegó a emitir"""
+        return [t for i, t in enumerate(self.titulos) if i not in self._emitidas]
@@ -0,0 +1,300 @@
+"""
+Snapshot Compilado de los Diccionarios del Clasificador
+=======================================================
+
+Cada worker releía y parseaba domains.json y prohibited.json. Aquí se
+compilan una vez a estructuras inmutables (listas → tuplas), junto con el
+índice ortográfico de términos (src/ortografia.py), y se guardan
+serializadas en data/snapshot.pkl junto con la firma (mtime, tamaño) de cada
+fuente; si una fuente cambia el snapshot se recompila solo.
+
+Con gunicorn --preload (ver gunicorn.conf.py) el proceso maestro lo carga
+una sola vez y los workers lo comparten copy-on-write.
+
+Recarga en caliente: cada worker vigila las fuentes en un hilo (cada
+RECARGA_INTERVALO_S) y atiende SIGHUP (`kill -HUP <pid del worker>`; el HUP
+al maestro reinicia los workers, que también cargan la versión nueva). El
+snapshot nuevo se compila y valida en segundo plano y se publica con una sola
+asignación: un classify en curso sigue con el snapshot completo que leyó.
+Uno inválido se descarta y sigue el vigente.
+
+Uso (desde la raíz del repositorio, p. ej. en el build):
+
+    python -m src.snapshot
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import signal
+import threading
+import time
+from datetime import datetime
+
+from src.ortografia import IndiceOrtografico
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUENTES = {
+    "domains": os.path.join(ROOT_DIR, "data", "domains.json"),
+    "prohibited": os.path.join(ROOT_DIR, "data", "prohibited.json"),
+    "drugs": os.path.join(ROOT_DIR, "data", "drugs.json"),
+}
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", os.path.join(ROOT_DIR, "data", "snapshot.pkl"))
+# Cambiar al modificar la forma de lo compilado
+SNAPSHOT_VERSION = 4
+RECARGA_INTERVALO_S = float(os.environ.get("RECARGA_INTERVALO_S", "2"))
+
+_lock = threading.Lock()
+_actual = None
+_estado = {"recargas": 0, "errores": 0, "ultimo_error": None, "cargado": None}
+_firma_rechazada = None
+_vigilante = None
+
+
+def _congelar(valor):
+    """Listas → tuplas, recursivo (los dicts se conservan para .get())"""
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, dict):
+        return {k: _congelar(v) for k, v in valor.items()}
+    return valor
+
+
+def _leer_json(path):
+    """(contenido, bytes crudos); {} si falta o no es JSON válido"""
+    try:
+        with open(path, "rb") as f:
+            crudo = f.read()
+        return json.loads(crudo.decode("utf-8")), crudo
+    except FileNotFoundError:
+        print(f"⚠️ Archivo no encontrado: {path}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        print(f"⚠️ Error al decodificar JSON: {path}")
+    return {}, b""
+
+
+def firma_fuentes():
+    """(mtime_ns, tamaño) de cada fuente; None si no existe"""
+    firma = {}
+    for nombre, path in FUENTES.items():
+        try:
+            stat = os.stat(path)
+            firma[nombre] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            firma[nombre] = None
+    return firma
+
+
+def indexar_keywords(domains):
+    """
+    Keywords por su primer trigrama: una keyword sólo puede estar en la
+    pregunta si su primer trigrama también está. "entradas" son los pares
+    (dominio, keyword) en el orden del diccionario; "trigramas" y "cortas"
+    (menos de 3 letras, se revisan siempre) guardan sus posiciones.
+    """
+    entradas = tuple((domain, kw) for domain, kws in domains.get("keywords", {}).items()
+                     for kw in kws if isinstance(kw, str))
+    trigramas, cortas = {}, []
+    for pos, (_, kw) in enumerate(entradas):
+        if len(kw) < 3:
+            cortas.append(pos)
+        else:
+            trigramas.setdefault(kw[:3], []).append(pos)
+    return {"entradas": entradas, "trigramas": {t: tuple(p) for t, p in trigramas.items()}, "cortas": tuple(cortas)}
+
+
+def compilar(firma=None):
+    """
+    Snapshot desde los JSON: {"version", "firma", "diccionarios", "domains",
+    "prohibited", "drugs", "indice_keywords", "ortografia"}; "diccionarios"
+    es el hash del
+    contenido de las fuentes
+    """
+    firma = firma or firma_fuentes()
+    datos = {}
+    huella = hashlib.sha256()
+    for nombre, path in FUENTES.items():
+        contenido, crudo = _leer_json(path)
+        datos[nombre] = _congelar(contenido)
+        huella.update(crudo)
+    datos["indice_keywords"] = indexar_keywords(datos["domains"])
+    datos["ortografia"] = IndiceOrtografico.desde_diccionarios(datos["domains"], datos.get("drugs", {}))
+    return {"version": SNAPSHOT_VERSION, "firma": firma, "diccionarios": huella.hexdigest()[:12], **datos}
+
+
+def _textos(valor, campo):
+    if not isinstance(valor, tuple) or not all(isinstance(t, str) and t for t in valor):
+        raise ValueError(f"{campo}: se esperaba una lista de textos no vacíos")
+    mayusculas = [t for t in valor if t != t.lower()]
+    if mayusculas:
+        # classify compara contra la pregunta en minúsculas: nunca coincidirían
+        raise ValueError(f"{campo}: términos con mayúsculas {mayusculas[:3]}")
+
+
+def validar(snapshot):
+    """ValueError si el snapshot no sirve para clasificar"""
+    domains, prohibited = snapshot["domains"], snapshot["prohibited"]
+    if not domains.get("domains"):
+        raise ValueError("domains.json: lista 'domains' vacía o ausente")
+    _textos(domains["domains"], "domains")
+    keywords = domains.get("keywords", {})
+    if not isinstance(keywords, dict):
+        raise ValueError("keywords: se esperaba un objeto dominio → términos")
+    for dominio, terminos in keywords.items():
+        if dominio not in domains["domains"]:
+            raise ValueError(f"keywords: dominio desconocido '{dominio}'")
+        _textos(terminos, f"keywords[{dominio}]")
+    _textos(domains.get("anatomical_regions", ()), "anatomical_regions")
+    for comando, frases in domains.get("special_commands", {}).items():
+        _textos(frases, f"special_commands[{comando}]")
+    if not prohibited.get("terms"):
+        raise ValueError("prohibited.json: lista 'terms' vacía o ausente")
+    _textos(prohibited["terms"], "terms")
+
+
+def guardar(snapshot, path=SNAPSHOT_PATH):
+    """Escritura atómica; un sistema de archivos de sólo lectura no es error"""
+    temporal = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporal, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, path)
+        return True
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el snapshot ({e}); se compila en cada arranque")
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        return False
+
+
+def _leer_snapshot(path, firma):
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("firma") != firma:
+        return None
+    return snapshot
+
+
+def _publicar(snapshot, origen, inicio):
+    global _actual
+    _actual = snapshot
+    _estado["cargado"] = str(datetime.now())
+    print(f"📦 Diccionarios {snapshot['diccionarios']} cargados desde {origen} "
+          f"en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+def cargar(path=SNAPSHOT_PATH):
+    """
+    Snapshot vigente del proceso: memoria → archivo → compilación (y se
+    guarda para el siguiente arranque). Todas las instancias de Wrapper
+    comparten el mismo objeto. Al arrancar se acepta aunque no valide (los
+    JSON ausentes dejan diccionarios vacíos, como antes).
+    """
+    firma = firma_fuentes()
+    with _lock:
+        if _actual is not None and _actual["firma"] == firma:
+            return _actual
+        if _actual is not None:
+            return _recargar(firma, path)
+        return _cargar(firma, path)
+
+
+def _cargar(firma, path):
+    """Primera carga del proceso; con el lock tomado"""
+    inicio = time.perf_counter()
+    snapshot = _leer_snapshot(path, firma)
+    origen = "snapshot"
+    if snapshot is None:
+        snapshot = compilar(firma)
+        origen = "JSON"
+        guardar(snapshot, path)
+    try:
+        validar(snapshot)
+    except ValueError as e:
+        print(f"⚠️ Diccionarios con errores: {e}")
+    _publicar(snapshot, origen, inicio)
+    return snapshot
+
+
+def actual():
+    """Snapshot publicado (sin tocar el disco)"""
+    return _actual if _actual is not None else cargar()
+
+
+def _recargar(firma, path):
+    """Compila, valida y publica; con el lock tomado. Retorna el vigente"""
+    global _firma_rechazada
+    inicio = time.perf_counter()
+    nuevo = compilar(firma)
+    try:
+        validar(nuevo)
+    except ValueError as e:
+        _firma_rechazada = firma
+        _estado["errores"] += 1
+        _estado["ultimo_error"] = str(e)
+        print(f"⚠️ Recarga de diccionarios descartada ({e}); sigue {_actual['diccionarios']}")
+        return _actual
+    guardar(nuevo, path)
+    _estado["recargas"] += 1
+    _estado["ultimo_error"] = None
+    _publicar(nuevo, "JSON (recarga)", inicio)
+    return nuevo
+
+
+def recargar(forzar=False, path=SNAPSHOT_PATH):
+    """
+    Recompila si cambió alguna fuente (o siempre con `forzar`). True si se
+    publicó una versión nueva.
+    """
+    firma = firma_fuentes()
+    with _lock:
+        if _actual is None:
+            _cargar(firma, path)
+            return True
+        if not forzar and (firma == _actual["firma"] or firma == _firma_rechazada):
+            return False
+        anterior = _actual
+        return _recargar(firma, path) is not anterior
+
+
+def vigilar(intervalo=RECARGA_INTERVALO_S):
+    """Hilo del worker que revisa las fuentes cada `intervalo` s (uno por proceso)"""
+    global _vigilante
+    if _vigilante is not None and _vigilante.is_alive():
+        return _vigilante
+
+    def ciclo():
+        while True:
+            time.sleep(intervalo)
+            try:
+                recargar()
+            except Exception as e:
+                print(f"❌ Error vigilando diccionarios: {e}")
+
+    _vigilante = threading.Thread(target=ciclo, name="vigilante-diccionarios", daemon=True)
+    _vigilante.start()
+    return _vigilante
+
+
+def instalar_senal():
+    """SIGHUP → recarga forzada en segundo plano (llamar desde el hilo principal)"""
+    def al_recibir(signum, frame):
+        threading.Thread(target=recargar, kwargs={"forzar": True}, daemon=True).start()
+    signal.signal(signal.SIGHUP, al_recibir)
+
+
+def get_stats():
+    snapshot = actual()
+    return {"version": snapshot["diccionarios"], **_estado}
+
+
+if __name__ == "__main__":
+    snapshot = compilar()
+    if guardar(snapshot):
+        print(f"💾 Snapshot guardado en {os.path.relpath(SNAPSHOT_PATH, ROOT_DIR)}")
@@ -0,0 +1,16 @@
+"""
+Estimación local de tokens
+==========================
+
+Aproximación sin tokenizer del proveedor: ~4 caracteres por token en
+texto español con markdown. Suficiente para contabilidad y umbrales.
+"""
+
+CHARS_POR_TOKEN = 4
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estima cuántos tokens ocupa `texto` en el modelo."""
+    if not texto:
+        return 0
+    return max(1, (len(texto) + CHARS_POR_TOKEN - 1) // CHARS_POR_TOKEN)
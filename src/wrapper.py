@@ -1,37 +1,163 @@
-import json
+import itertools
 import os
 import re
 from enum import Enum
 
+from src import ngramas, snapshot
+from src.ortografia import FARMACOS_COMUNES
+
 class Result(Enum):
     APPROVED = "APROBADA"
     REJECTED = "RECHAZADA"
     REFORMULATE = "REFORMULAR"
 
+# Máximo de caracteres que inspecciona la clasificación (~64 KB). Las notas
+# pegadas pueden medir varios MB; los indicadores aparecen al inicio.
+MAX_SCAN_CHARS = 64 * 1024
+
+# Indicadores de nota médica: (nombre, ancla literal, validación anclada).
+# El ancla se localiza con str.find y la validación sólo mira el texto que
+# sigue al ancla, así cada indicador recorre el texto una vez (tiempo lineal).
+NOTE_INDICATORS = (
+    ("fecha", "fecha", re.compile(r"fecha[:\s]")),
+    ("motivo", "motivo de consulta", re.compile(r"motivo de consulta[:\s]")),
+    ("exploracion", "exploración física", re.compile(r"exploración física[:\s]")),
+    ("impresion", "impresión diagnóstica", re.compile(r"impresión diagnóstica[:\s]")),
+    ("plan", "plan", re.compile(r"plan[:\s]")),
+    ("edad", "edad", re.compile(r"edad[:\s]\s*\d")),
+    ("fc", "fc", re.compile(r"fc[:\s]\s*\d")),
+    ("ta", "ta", re.compile(r"ta[:\s]\s*\d+/\d")),
+)
+# Unidades precedidas de cantidad: "\b\d+\s*mg\b" y "\b\d+\s*mmhg\b"
+NOTE_UNITS = ("mg", "mmhg")
+NOTE_MIN_INDICATORS = 3
+
+# Hasta este largo se buscan los trigramas de la pregunta en el índice de
+# keywords; en textos más largos, cada trigrama del índice en el texto
+MAX_TRIGRAM_SCAN_CHARS = 2048
+
+# Preguntas por tramo en classify_many: la sombra de n-gramas se evalúa por
+# tramo y los veredictos salen sin esperar al lote completo
+TRAMO_LOTE = 256
+
+
+def _is_word_char(ch):
+    """Equivalente a \\w de `re` para un carácter"""
+    return ch.isalnum() or ch == "_"
+
+
+def _find_anchor(text, anchor, start, validator=None, word_end=False, word_start=True):
+    """
+    Posición de la siguiente aparición de `anchor` desde `start` con límite
+    de palabra al inicio (si `word_start`) y al final (si `word_end`), o -1.
+    """
+    pos = text.find(anchor, start)
+    while pos != -1:
+        end = pos + len(anchor)
+        if (not word_start or pos == 0 or not _is_word_char(text[pos - 1])) \
+                and (not word_end or end == len(text) or not _is_word_char(text[end])) \
+                and (validator is None or validator.match(text, pos)):
+            return pos
+        pos = text.find(anchor, pos + 1)
+    return -1
+
+
+def _has_quantity_unit(text, unit):
+    """
+    Busca "<número> <unit>" recorriendo hacia atrás desde la unidad. Como en
+    "\\b\\d+\\s*mg\\b", el límite de palabra va antes del número y después de
+    la unidad: "500mg" también cuenta.
+    """
+    pos = _find_anchor(text, unit, 0, word_end=True, word_start=False)
+    while pos != -1:
+        i = pos - 1
+        while i >= 0 and text[i].isspace():
+            i -= 1
+        if i >= 0 and text[i].isdecimal():
+            while i >= 0 and text[i].isdecimal():
+                i -= 1
+            if i < 0 or not _is_word_char(text[i]):
+                return True
+        pos = _find_anchor(text, unit, pos + 1, word_end=True, word_start=False)
+    return False
+
+
+def _has_vo_cada(text):
+    """Equivalente lineal de "\\bvo\\b.*\\bcada\\b": "vo" y luego "cada" en la misma línea"""
+    start = 0
+    cada = -1
+    while True:
+        vo = _find_anchor(text, "vo", start, word_end=True)
+        if vo == -1:
+            return False
+        # Reutilizar el último "cada" encontrado si sigue adelante de este "vo"
+        if cada < vo + 2:
+            cada = _find_anchor(text, "cada", vo + 2, word_end=True)
+            if cada == -1:
+                return False
+        newline = text.find("\n", vo, cada)
+        if newline == -1:
+            return True
+        start = newline + 1
+
 class Wrapper:
     def __init__(self):
-        self.domains = self._load_json("data/domains.json")
-        self.prohibited = self._load_json("data/prohibited.json")
-        
-    def _load_json(self, path):
-        """Cargar archivo JSON con manejo de errores"""
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"⚠️ Archivo no encontrado: {path}")
-            return {}
-        except json.JSONDecodeError:
-            print(f"⚠️ Error al decodificar JSON: {path}")
-            return {}
+        # Diccionarios compilados una vez por proceso (ver src/snapshot.py)
+        snapshot.cargar()
+
+    @property
+    def domains(self):
+        """Versión publicada; la recarga en caliente la reemplaza completa"""
+        return snapshot.actual()["domains"]
+
+    @property
+    def prohibited(self):
+        return snapshot.actual()["prohibited"]
+
+    @property
+    def spelling(self):
+        """Índice ortográfico de términos (src/ortografia.py)"""
+        return snapshot.actual()["ortografia"]
     
-    def classify(self, question):
+    def classify(self, question, shadow=True):
         """
         Clasificar pregunta médica con comandos especiales
         - APPROVED: Pregunta válida y procesable
         - REJECTED: Contiene términos prohibidos o no médicos
         - REFORMULATE: Ambigua o demasiado vaga
+        `shadow=False` no la compara en sombra (vistas previas mientras se escribe)
+        """
+        result = self._classify_rules(question)
+        # Clasificador de n-gramas en sombra: sólo se mide la concordancia,
+        # en el hilo de la sombra (el modelo cuesta más que estas reglas)
+        if shadow and ngramas.NGRAMAS_MODO != "off" and question:
+            ngramas.sombra.encolar(question, result)
+        return result
+    
+    def classify_many(self, questions):
+        """
+        Clasificar un lote en orden (generador: cada tramo de TRAMO_LOTE se
+        entrega en cuanto está listo). Las preguntas repetidas se clasifican
+        una vez y la sombra de n-gramas evalúa cada tramo en una llamada.
         """
+        vistas = {}
+        questions = iter(questions)
+        while True:
+            tramo = list(itertools.islice(questions, TRAMO_LOTE))
+            if not tramo:
+                return
+            nuevas = {}
+            for question in tramo:
+                if question not in vistas and question not in nuevas:
+                    nuevas[question] = self._classify_rules(question)
+            if ngramas.NGRAMAS_MODO != "off" and nuevas:
+                ngramas.sombra.registrar_lote(list(nuevas), list(nuevas.values()))
+            vistas.update(nuevas)
+            for question in tramo:
+                yield dict(vistas[question])
+    
+    def _classify_rules(self, question):
+        """Reglas de keywords, patrones y comandos (ver classify)"""
         
         if not question or len(question.strip()) < 3:
             return {
@@ -39,17 +165,19 @@ class Wrapper:
                 "reason": "Pregunta vacía o demasiado corta"
             }
         
-        q_lower = question.lower().strip()
+        # Una sola conversión a minúsculas, acotada a MAX_SCAN_CHARS
+        q_lower = question[:MAX_SCAN_CHARS].lower().strip()
         q_words = q_lower.split()
         
         # ═══════════════════════════════════════════════════════
         # NIVEL 0: Detectar COMANDOS ESPECIALES (prioridad máxima)
         # ═══════════════════════════════════════════════════════
-        special_command = self._detect_special_command(question)
+        special_command = self._detect_special_command(q_lower)
         
         if special_command:
             # Comandos de notas médicas (siempre aprobados)
-            if special_command in ["revision_nota", "elaboracion_nota", "valoracion", "calculo_dosis"]:
+            if special_command in ["revision_nota", "correccion_nota", "elaboracion_nota", "valoracion",
+                                   "calculo_dosis"]:
                 return {
                     "result": Result.APPROVED,
                     "domain": "análisis clínico",
@@ -61,7 +189,7 @@ class Wrapper:
             elif special_command == "apoyo_estudio":
                 domain_scores = self._get_domain_scores(q_lower)
                 if domain_scores:
-                    best_domain = max(domain_scores, key=domain_scores.get)
+                    best_domain = self._best_domain(domain_scores, q_lower)
                     return {
                         "result": Result.APPROVED,
                         "domain": best_domain,
@@ -78,7 +206,7 @@ class Wrapper:
         # ═══════════════════════════════════════════════════════
         # NIVEL 1: Detectar notas médicas completas
         # ═══════════════════════════════════════════════════════
-        if self._is_medical_note(question):
+        if self._is_medical_note(q_lower):
             return {
                 "result": Result.APPROVED,
                 "domain": "análisis clínico",
@@ -97,6 +225,10 @@ class Wrapper:
                 "suggestion": "Lisabella solo responde preguntas de ciencias médicas"
             }
         
+        # Acentos y errores de tipeo en términos médicos ("higado",
+        # "espironolactna") para los niveles que buscan keywords
+        q_lower = self.spelling.corregir(q_lower).texto
+        
         # ═══════════════════════════════════════════════════════
         # NIVEL 3: Detectar preguntas ultra-cortas (1-2 palabras)
         # ═══════════════════════════════════════════════════════
@@ -142,7 +274,7 @@ class Wrapper:
         
         # REGLA CRÍTICA: Si tiene ≥3 keywords médicos, APROBAR sin importar la estructura
         if total_keywords >= 3:
-            best_domain = max(domain_scores, key=domain_scores.get)
+            best_domain = self._best_domain(domain_scores, q_lower)
             confidence = min(0.92, 0.70 + (total_keywords * 0.06))
             return {
                 "result": Result.APPROVED,
@@ -152,7 +284,7 @@ class Wrapper:
         
         # Si encontró keywords Y tiene patrón válido → APROBADA
         if domain_scores and has_valid_pattern:
-            best_domain = max(domain_scores, key=domain_scores.get)
+            best_domain = self._best_domain(domain_scores, q_lower)
             confidence = min(0.95, 0.70 + (domain_scores[best_domain] * 0.08))
             return {
                 "result": Result.APPROVED,
@@ -162,7 +294,7 @@ class Wrapper:
         
         # Si encontró keywords pero sin patrón claro → Aceptar con confianza media si tiene suficientes
         if domain_scores:
-            best_domain = max(domain_scores, key=domain_scores.get)
+            best_domain = self._best_domain(domain_scores, q_lower)
             if domain_scores[best_domain] >= 2:
                 return {
                     "result": Result.APPROVED,
@@ -198,8 +330,11 @@ class Wrapper:
         # Comandos unificados y nuevos
         command_patterns = {
             "revision_nota": [
-                "revisar nota", "corregir nota", "auditar nota", "evaluar nota",
-                "analizar nota", "revision de nota", "correccion de nota"
+                "revisar nota", "auditar nota", "evaluar nota",
+                "analizar nota", "revision de nota"
+            ],
+            "correccion_nota": [
+                "corregir nota", "correccion de nota", "corrección de nota"
             ],
             "elaboracion_nota": [
                 "elaborar nota", "crear nota", "generar nota", "hacer nota",
@@ -225,14 +360,24 @@ class Wrapper:
         
         return None
     
+    def _matched_keywords(self, q_lower):
+        """(dominio, keyword) presentes en la pregunta, en el orden del diccionario"""
+        indice = snapshot.actual()["indice_keywords"]
+        trigramas = indice["trigramas"]
+        if len(q_lower) <= MAX_TRIGRAM_SCAN_CHARS:
+            textos = {q_lower[i:i + 3] for i in range(len(q_lower) - 2)}
+            candidatas = [p for t in textos & trigramas.keys() for p in trigramas[t]]
+        else:
+            candidatas = [p for t, posiciones in trigramas.items() if t in q_lower for p in posiciones]
+        entradas = indice["entradas"]
+        return [entradas[p] for p in sorted(candidatas + list(indice["cortas"])) if entradas[p][1] in q_lower]
+    
     def _get_domain_scores(self, q_lower):
         """Calcula scores por dominio basado en keywords"""
         domain_scores = {}
         
-        for domain, keywords in self.domains.get("keywords", {}).items():
-            matches = sum(1 for kw in keywords if kw in q_lower)
-            if matches > 0:
-                domain_scores[domain] = matches
+        for domain, _ in self._matched_keywords(q_lower):
+            domain_scores[domain] = domain_scores.get(domain, 0) + 1
         
         # Búsqueda adicional en regiones anatómicas
         if "anatomical_regions" in self.domains:
@@ -247,52 +392,63 @@ class Wrapper:
         
         return domain_scores
     
+    def _best_domain(self, domain_scores, q_lower):
+        """
+        Dominio con más keywords. Los empates se deciden por el orden del
+        diccionario, o por el clasificador de n-gramas en modo desempate.
+        """
+        best_domain = max(domain_scores, key=domain_scores.get)
+        if ngramas.NGRAMAS_MODO == "desempate":
+            tied = [d for d, score in domain_scores.items() if score == domain_scores[best_domain]]
+            model = ngramas.modelo()
+            if len(tied) > 1 and model:
+                best_domain = model.desempatar(q_lower, tied) or best_domain
+        return best_domain
+    
     def _get_detected_keywords(self, q_lower):
         """Obtiene lista de keywords detectados"""
         detected = []
         
-        for keywords in self.domains.get("keywords", {}).values():
-            for kw in keywords:
-                if kw in q_lower and kw not in detected:
-                    detected.append(kw)
+        for _, kw in self._matched_keywords(q_lower):
+            if kw not in detected:
+                detected.append(kw)
         
         return detected[:5]
     
     def _detect_specific_drugs(self, text):
         """Detectar fármacos específicos comunes"""
-        common_drugs = [
-            'espironolactona', 'metformina', 'losartán', 'losartan', 'enalapril',
-            'omeprazol', 'ibuprofeno', 'paracetamol', 'aspirina', 'atorvastatina',
-            'simvastatina', 'amlodipino', 'metoprolol', 'atenolol', 'furosemida',
-            'hidroclorotiazida', 'levotiroxina', 'insulina', 'warfarina', 'heparina',
-            'amoxicilina', 'azitromicina', 'ciprofloxacino', 'diclofenaco', 'vancomicina'
-        ]
-        
         detected = []
-        for drug in common_drugs:
+        for drug in FARMACOS_COMUNES:
             if drug in text:
                 detected.append(drug)
         
         return detected
     
     def _is_medical_note(self, text):
-        """Detectar si el texto es una nota médica completa"""
-        indicators = [
-            r'\bfecha[:\s]',
-            r'\bmotivo de consulta[:\s]',
-            r'\bexploración física[:\s]',
-            r'\bimpresión diagnóstica[:\s]',
-            r'\bplan[:\s]',
-            r'\bedad[:\s]\s*\d+',
-            r'\bvo\b.*\bcada\b',
-            r'\b\d+\s*mg\b',
-            r'\b\d+\s*mmhg\b',
-            r'\bfc[:\s]\s*\d+',
-            r'\bta[:\s]\s*\d+/\d+'
-        ]
+        """
+        Detectar si el texto es una nota médica completa.
+        Inspecciona como máximo MAX_SCAN_CHARS caracteres en tiempo lineal
+        y termina en cuanto encuentra NOTE_MIN_INDICATORS indicadores.
+        """
+        text = text[:MAX_SCAN_CHARS].lower()
+        matches = 0
+        
+        for _, anchor, validator in NOTE_INDICATORS:
+            if _find_anchor(text, anchor, 0, validator) != -1:
+                matches += 1
+                if matches >= NOTE_MIN_INDICATORS:
+                    return True
+        
+        for unit in NOTE_UNITS:
+            if _has_quantity_unit(text, unit):
+                matches += 1
+                if matches >= NOTE_MIN_INDICATORS:
+                    return True
+        
+        if _has_vo_cada(text):
+            matches += 1
         
-        matches = sum(1 for ind in indicators if re.search(ind, text.lower()))
-        return matches >= 3
+        return matches >= NOTE_MIN_INDICATORS
     
     def _extract_medical_term(self, text):
         """Extraer término médico principal de la pregunta"""
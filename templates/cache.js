@@ -0,0 +1,160 @@
+/*
+ * Cache local de respuestas de Lisabella (IndexedDB)
+ * ==================================================
+ *
+ * Las preguntas que se repiten entre sesiones volvían siempre a
+ * /ask_stream. AnswerCache guarda las respuestas completas en IndexedDB:
+ *
+ * - Clave: dominio|comando|modo|pregunta normalizada, la misma forma que
+ *   clave_respuesta del servidor (src/almacen.py) sin la corrección de
+ *   términos. Dominio y comando vienen del evento init (al guardar) o del
+ *   veredicto de /classify (al buscar).
+ * - Un índice por modo|pregunta normalizada: si la pregunta nunca se
+ *   guardó, la búsqueda no espera a /classify.
+ * - Sólo se guardan respuestas que el servidor marcó completas (done con
+ *   cacheable: sin errores del proveedor ni corte por max_tokens), con su
+ *   cache_token. Se muestran al instante; si el token cambió o pasó
+ *   ANSWER_CACHE_MAX_AGE_MS se refrescan en segundo plano.
+ * - LRU por bytes: al superar ANSWER_CACHE_MAX_BYTES se borran las usadas
+ *   hace más tiempo.
+ *
+ * Sin IndexedDB (navegación privada en algunos navegadores, cuota llena)
+ * todas las operaciones resuelven null y la página sigue sin cache.
+ */
+
+const ANSWER_CACHE_DB = 'lisabella';
+const ANSWER_CACHE_STORE = 'respuestas';
+const ANSWER_CACHE_MAX_BYTES = 5 * 1024 * 1024;
+const ANSWER_CACHE_MAX_AGE_MS = 7 * 24 * 3600 * 1000;
+
+// Igual que clave_respuesta: minúsculas, sin acentos ni no-ASCII, espacios simples, sin signos finales
+function normalizeQuestion(question) {
+    return question.toLowerCase()
+        .normalize('NFKD').replace(/[^\x00-\x7f]/g, '')
+        .replace(/\s+/g, ' ')
+        .replace(/^[ ¿?¡!.]+|[ ¿?¡!.]+$/g, '');
+}
+
+function questionCacheKey(question, mode) {
+    return `${mode || null}|${normalizeQuestion(question)}`;
+}
+
+function answerCacheKey(question, domain, specialCommand, mode) {
+    return `${domain}|${specialCommand || null}|${questionCacheKey(question, mode)}`;
+}
+
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function idbDone(transaction) {
+    return new Promise((resolve, reject) => {
+        transaction.oncomplete = () => resolve();
+        transaction.onabort = transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+class AnswerCache {
+    constructor({ maxBytes = ANSWER_CACHE_MAX_BYTES, maxAgeMs = ANSWER_CACHE_MAX_AGE_MS,
+                  factory = globalThis.indexedDB, now = () => Date.now() } = {}) {
+        this.maxBytes = maxBytes;
+        this.maxAgeMs = maxAgeMs;
+        this.factory = factory;
+        this.now = now;
+        this.db = null;
+    }
+
+    open() {
+        if (!this.db) {
+            this.db = new Promise(resolve => {
+                if (!this.factory) return resolve(null);
+                const request = this.factory.open(ANSWER_CACHE_DB, 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore(ANSWER_CACHE_STORE, { keyPath: 'key' });
+                    store.createIndex('question', 'question');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = request.onblocked = () => resolve(null);
+            }).catch(() => null);
+        }
+        return this.db;
+    }
+
+    // Entradas guardadas para la pregunta (con cualquier dominio o comando)
+    async candidates(question, mode) {
+        try {
+            const db = await this.open();
+            if (!db) return [];
+            const index = db.transaction(ANSWER_CACHE_STORE).objectStore(ANSWER_CACHE_STORE).index('question');
+            return await idbRequest(index.getAll(questionCacheKey(question, mode)));
+        } catch (error) {
+            return [];
+        }
+    }
+
+    // Entrada de la pregunta con ese dominio y comando (la marca como usada), o null
+    async get(question, domain, specialCommand, mode) {
+        try {
+            const db = await this.open();
+            if (!db) return null;
+            const transaction = db.transaction(ANSWER_CACHE_STORE, 'readwrite');
+            const store = transaction.objectStore(ANSWER_CACHE_STORE);
+            const entry = await idbRequest(store.get(answerCacheKey(question, domain, specialCommand, mode)));
+            if (entry) {
+                entry.usedAt = this.now();
+                store.put(entry);
+            }
+            await idbDone(transaction);
+            return entry || null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    // Vigente: mismo token del servidor y más nueva que maxAgeMs
+    isFresh(entry, token) {
+        return entry.token === token && this.now() - entry.savedAt < this.maxAgeMs;
+    }
+
+    async put(question, { domain, specialCommand, mode, token, answer }) {
+        try {
+            const db = await this.open();
+            if (!db || !token || !answer) return false;
+            const now = this.now();
+            const key = answerCacheKey(question, domain, specialCommand, mode);
+            const entry = {
+                key, question: questionCacheKey(question, mode), token, answer,
+                savedAt: now, usedAt: now,
+                // Los strings se guardan en UTF-16
+                bytes: (key.length + answer.length) * 2
+            };
+            if (entry.bytes > this.maxBytes) return false;
+            const transaction = db.transaction(ANSWER_CACHE_STORE, 'readwrite');
+            const store = transaction.objectStore(ANSWER_CACHE_STORE);
+            store.put(entry);
+            this.evict(store, await idbRequest(store.getAll()));
+            await idbDone(transaction);
+            return true;
+        } catch (error) {
+            return false;
+        }
+    }
+
+    // Borra las usadas hace más tiempo hasta quedar dentro de maxBytes
+    evict(store, entries) {
+        let total = entries.reduce((sum, entry) => sum + entry.bytes, 0);
+        entries.sort((a, b) => a.usedAt - b.usedAt);
+        for (const entry of entries) {
+            if (total <= this.maxBytes) break;
+            store.delete(entry.key);
+            total -= entry.bytes;
+        }
+    }
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { normalizeQuestion, questionCacheKey, answerCacheKey, AnswerCache };
+}
@@ -0,0 +1,231 @@
+/*
+ * Render de respuestas de Lisabella
+ * =================================
+ *
+ * formatMarkdown convierte el markdown de las respuestas a HTML (sin
+ * dependencias del DOM, también corre en node). StreamRenderer lo aplica de
+ * forma incremental durante el streaming: antes, cada chunk reemplazaba el
+ * innerHTML de la burbuja con la respuesta completa acumulada (O(n²) en
+ * parseo y layout a lo largo de una respuesta de 16k tokens).
+ *
+ * Un corte después de una línea completa no vacía que no es ítem de lista
+ * ni contiene '|' deja a formatMarkdown sin estado abierto (ni lista ni
+ * tabla), así que formatMarkdown(a + '\n' + b) === formatMarkdown(a) +
+ * formatMarkdown(b). Los bloques anteriores al último corte se agregan al
+ * DOM una sola vez; sólo el bloque abierto final se vuelve a renderizar.
+ *
+ * Benchmark: benchmarks/frontend/ (navegador y node).
+ */
+
+// Mismo resultado que asignar textContent y leer innerHTML, sin crear nodos
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '\u00a0': '&nbsp;' };
+
+function sanitizeHtml(text) {
+    return text.replace(/[&<>\u00a0]/g, ch => HTML_ESCAPES[ch]);
+}
+
+function formatMarkdown(text) {
+    if (!text) return '';
+
+    let lines = text.split('\n');
+    let result = '';
+    let inList = false;
+    let listType = '';
+    let inTable = false;
+    let tableRows = [];
+
+    for (let i = 0; i < lines.length; i++) {
+        let line = lines[i];
+
+        if (line.includes('|') && !inTable) {
+            if (i + 1 < lines.length && lines[i + 1].match(/^\|[\s:-]+\|/)) {
+                inTable = true;
+                tableRows = [];
+                if (inList) { 
+                    result += `</${listType}>`; 
+                    inList = false; 
+                }
+            }
+        }
+
+        if (inTable) {
+            if (line.includes('|')) {
+                tableRows.push(line);
+            } else {
+                if (tableRows.length > 0) {
+                    result += buildTable(tableRows);
+                    tableRows = [];
+                }
+                inTable = false;
+                i--;
+                continue;
+            }
+            continue;
+        }
+
+        if (line.match(/^#### /)) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<h4>' + sanitizeHtml(line.replace(/^#### /, '')) + '</h4>';
+        } else if (line.match(/^### /)) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<h3>' + sanitizeHtml(line.replace(/^### /, '')) + '</h3>';
+        } else if (line.match(/^## /)) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<h2>' + sanitizeHtml(line.replace(/^## /, '')) + '</h2>';
+        } else if (line.match(/^# /)) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<h1>' + sanitizeHtml(line.replace(/^# /, '')) + '</h1>';
+        }
+        else if (line.match(/^[\-\•\*] /)) {
+            if (!inList || listType !== 'ul') {
+                if (inList) result += `</${listType}>`;
+                result += '<ul>';
+                inList = true;
+                listType = 'ul';
+            }
+            result += '<li>' + sanitizeHtml(line.replace(/^[\-\•\*] /, '')) + '</li>';
+        }
+        else if (line.match(/^\d+\. /)) {
+            if (!inList || listType !== 'ol') {
+                if (inList) result += `</${listType}>`;
+                result += '<ol>';
+                inList = true;
+                listType = 'ol';
+            }
+            result += '<li>' + sanitizeHtml(line.replace(/^\d+\. /, '')) + '</li>';
+        }
+        else if (line.match(/^---+$/)) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<hr>';
+        }
+        else if (line.trim()) {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += sanitizeHtml(line) + '<br>';
+        } else {
+            if (inList) { result += `</${listType}>`; inList = false; }
+            result += '<br>';
+        }
+    }
+
+    if (inTable && tableRows.length > 0) {
+        result += buildTable(tableRows);
+    }
+
+    if (inList) result += `</${listType}>`;
+
+    result = result
+        .replace(/\*\*\*(.+?)\*\*\*/g, '<strong><em>$1</em></strong>')
+        .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')
+        .replace(/\*(.+?)\*/g, '<em>$1</em>')
+        .replace(/`(.+?)`/g, '<code>$1</code>');
+
+    return result;
+}
+
+function buildTable(rows) {
+    if (rows.length < 2) return '';
+
+    let html = '<div class="table-wrapper"><table>';
+    let isHeader = true;
+
+    for (let i = 0; i < rows.length; i++) {
+        let row = rows[i];
+
+        if (row.match(/^\|[\s:-]+\|/)) {
+            isHeader = false;
+            continue;
+        }
+
+        let cells = row.split('|').filter(cell => cell.trim());
+        if (cells.length === 0) continue;
+
+        html += '<tr>';
+        cells.forEach(cell => {
+            let tag = isHeader ? 'th' : 'td';
+            html += `<${tag}>${sanitizeHtml(cell.trim())}</${tag}>`;
+        });
+        html += '</tr>';
+
+        if (isHeader) isHeader = false;
+    }
+
+    html += '</table></div>';
+    return html;
+}
+
+// Líneas que pueden dejar abierta una lista o una tabla en formatMarkdown
+function isOpenBlockLine(line) {
+    return line.includes('|') || /^[\-\•\*] /.test(line) || /^\d+\. /.test(line);
+}
+
+/*
+ * Posición donde empieza el bloque abierto de `text` (buscando desde
+ * `from`): justo después del último salto de línea que cierra una línea
+ * segura no vacía y deja texto detrás. Retorna `from` si no hay corte.
+ */
+function lastSafeCut(text, from) {
+    let cut = from;
+    let start = from;
+    let newline = text.indexOf('\n', start);
+    while (newline !== -1 && newline + 1 < text.length) {
+        // Una línea vacía sola sería formatMarkdown('') === '' en vez de '<br>'
+        const line = text.slice(start, newline);
+        if (line && !isOpenBlockLine(line)) {
+            cut = newline + 1;
+        }
+        start = newline + 1;
+        newline = text.indexOf('\n', start);
+    }
+    return cut;
+}
+
+class StreamRenderer {
+    /*
+     * container: burbuja donde se renderiza la respuesta
+     * onRender: se llama después de cada actualización (p. ej. para el scroll)
+     * schedule: agenda el render; por defecto una vez por frame
+     */
+    constructor(container, { onRender = null, schedule = cb => requestAnimationFrame(cb) } = {}) {
+        this.container = container;
+        this.onRender = onRender;
+        this.schedule = schedule;
+        this.text = '';
+        this.closedUpTo = 0;
+        this.pending = false;
+        // Sólo el bloque abierto vive aquí; display: contents no altera el layout
+        this.openNode = document.createElement('div');
+        this.openNode.style.display = 'contents';
+        container.appendChild(this.openNode);
+    }
+
+    append(chunk) {
+        if (!chunk) return;
+        this.text += chunk;
+        if (!this.pending) {
+            this.pending = true;
+            this.schedule(() => this.flush());
+        }
+    }
+
+    flush() {
+        this.pending = false;
+        const cut = lastSafeCut(this.text, this.closedUpTo);
+        if (cut > this.closedUpTo) {
+            // Bloques cerrados: se parsean y se insertan una sola vez
+            const closed = this.text.slice(this.closedUpTo, cut - 1);
+            this.openNode.insertAdjacentHTML('beforebegin', formatMarkdown(closed));
+            this.closedUpTo = cut;
+        }
+        this.openNode.innerHTML = formatMarkdown(this.text.slice(this.closedUpTo));
+        if (this.onRender) this.onRender();
+    }
+
+    // Render final inmediato (antes de agregar el badge de la burbuja)
+    finish() {
+        this.flush();
+    }
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { sanitizeHtml, formatMarkdown, buildTable, lastSafeCut, StreamRenderer };
+}
@@ -0,0 +1,70 @@
+import multiprocessing
+import pytest
+from src.almacen import MAX_CARACTERES_CACHE_LOCAL, AlmacenCompartido, clave_respuesta, token_respuesta
+
+class Reloj:
+    def __init__(self):
+        self.t = 1_700_000_000.0
+
+    def __call__(self):
+        return self.t
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "almacen.bin")
+
+def _escribir(path, clave, valor):
+    AlmacenCompartido(path=path, mb=1, activo=True).guardar(clave, valor)
+
+class TestAlmacenCompartido:
+
+    def test_normalized_key_and_roundtrip(self, path):
+        almacen = AlmacenCompartido(path=path, mb=1, activo=True)
+        clave = clave_respuesta("¿Qué es la Insulina?", "endocrinología")
+        assert clave == clave_respuesta("que es  la insulina", "endocrinología")
+        assert clave != clave_respuesta("que es la insulina", "endocrinología", mode="secciones")
+        assert almacen.obtener(clave) is None
+        assert almacen.guardar(clave, "Hormona peptídica. " * 200)
+        assert almacen.obtener(clave) == "Hormona peptídica. " * 200
+
+    def test_visible_across_processes_and_restarts(self, path):
+        """Lo que escribe otro proceso se lee aquí; el archivo sobrevive al cierre"""
+        proceso = multiprocessing.get_context("fork").Process(target=_escribir, args=(path, "k", "valor"))
+        proceso.start()
+        proceso.join()
+        almacen = AlmacenCompartido(path=path, mb=1, activo=True)
+        assert almacen.obtener("k") == "valor"
+        almacen.cerrar()
+        assert AlmacenCompartido(path=path, mb=1, activo=True).obtener("k") == "valor"
+
+    def test_fixed_budget_evicts_oldest_and_expires(self, path, reloj):
+        """Un conjunto lleno desaloja la usada hace más tiempo; caducadas no se sirven"""
+        # 40 KB: un solo conjunto de dos ranuras de 16 KB
+        almacen = AlmacenCompartido(path=path, mb=0.04, vias=2, ranura_kb=16, ttl_s=100, activo=True, reloj=reloj)
+        assert almacen.conjuntos == 1
+        tam = almacen.tam_total
+        for i in range(2):
+            reloj.t += 1
+            almacen.guardar(f"k{i}", f"v{i}")
+        reloj.t += 1
+        assert almacen.obtener("k0") == "v0"
+        almacen.guardar("k2", "v2")
+        assert almacen.obtener("k1") is None
+        assert (almacen.obtener("k0"), almacen.obtener("k2")) == ("v0", "v2")
+        assert almacen.desalojos == 1 and almacen.tam_total == tam
+        reloj.t += 101
+        assert almacen.obtener("k2") is None
+        assert not almacen.guardar("grande", "x" * 10 ** 6 + str(list(range(10 ** 5))))
+
+    def test_browser_cache_token(self, monkeypatch):
+        """Estable entre variantes de escritura; cambia con el contexto o RESPUESTAS_VERSION"""
+        token = token_respuesta("¿Qué es la Insulina?", "endocrinología")
+        assert token == token_respuesta("que es  la insulina", "endocrinología")
+        assert token != token_respuesta("que es la insulina", "endocrinología", mode="secciones")
+        assert token_respuesta("x" * (MAX_CARACTERES_CACHE_LOCAL + 1), "endocrinología") is None
+        monkeypatch.setattr("src.almacen.RESPUESTAS_VERSION", "2")
+        assert token_respuesta("que es la insulina", "endocrinología") != token
@@ -0,0 +1,96 @@
+import pytest
+from src.amplitud_detector import (
+    CompuertaAmplitud, umbral_para_dominio, evaluar_y_reformular,
+    detectar_amplitud, score_many, extraer_features, FEATURES_AMPLITUD,
+    generar_reformulacion, _render_sugerencias
+)
+
+@pytest.fixture
+def compuerta():
+    return CompuertaAmplitud()
+
+class TestCompuertaAmplitud:
+
+    def test_broad_question_intercepted(self, compuerta):
+        """Pregunta amplia aprobada debe interceptarse con reformulación"""
+        response = compuerta.evaluar("Estructura anatómica del corazón", {"domain": "anatomía"})
+        assert response["status"] == "reformulate"
+        assert "Reformulaciones sugeridas" in response["response"]
+        stats = compuerta.get_stats()
+        assert stats["intercepted"] == 1
+        assert stats["upstream_calls_avoided"] == 1
+        assert stats["estimated_tokens_avoided"] > 3000
+
+    def test_specific_question_passes(self, compuerta):
+        """Pregunta específica debe continuar al proveedor"""
+        assert compuerta.evaluar("Irrigación arterial del hueso coxal", {"domain": "anatomía"}) is None
+        assert compuerta.get_stats()["evaluated"] == 1
+        assert compuerta.get_stats()["intercepted"] == 0
+
+    def test_special_command_bypass(self, compuerta):
+        """Comandos especiales nunca pasan por la compuerta"""
+        classification = {"domain": "anatomía", "special_command": "study_mode"}
+        assert compuerta.evaluar("apoyo en estudio estructura del corazón", classification) is None
+        assert compuerta.get_stats()["bypassed"] == 1
+
+    def test_preview_suggestion_not_counted(self, compuerta):
+        """La vista previa de /classify da la misma reformulación sin tocar los contadores"""
+        sugerencia = compuerta.sugerencia("Estructura anatómica del corazón", {"domain": "anatomía"})
+        assert sugerencia == compuerta.evaluar("Estructura anatómica del corazón", {"domain": "anatomía"})["response"]
+        assert compuerta.sugerencia("Irrigación arterial del hueso coxal", {"domain": "anatomía"}) is None
+        assert compuerta.get_stats()["evaluated"] == 1
+
+    def test_domain_thresholds(self):
+        """Especialidades clínicas exigen más amplitud que ciencias básicas"""
+        assert umbral_para_dominio("anatomía") == 7
+        assert umbral_para_dominio("cardiología") > umbral_para_dominio("anatomía")
+        assert umbral_para_dominio("dominio desconocido") == 7
+        es_amplia, _ = evaluar_y_reformular("anatomía del hígado", "anatomía", umbral=11)
+        assert not es_amplia
+
+class TestScorerAmplitud:
+
+    CASOS = [
+        ("Irrigación arterial del hueso coxal", 0),
+        ("Estructura anatómica del corazón", 10),
+        ("Mecanismo de acción del ácido acetilsalicílico", 0),
+        ("Todo sobre el sistema cardiovascular", 10),
+        ("anatomía del hígado", 7),
+    ]
+
+    def test_scores_unchanged(self):
+        """El scorer por features conserva los scores de referencia"""
+        for query, esperado in self.CASOS:
+            assert detectar_amplitud(query, "anatomía") == esperado
+
+    def test_score_many_matches_single(self):
+        """score_many debe coincidir con detectar_amplitud pregunta por pregunta"""
+        queries = [query for query, _ in self.CASOS]
+        assert [int(s) for s in score_many(queries)] == [detectar_amplitud(q, "anatomía") for q in queries]
+        assert len(score_many([])) == 0
+
+    def test_feature_vector(self):
+        """El vector de features sigue el orden de FEATURES_AMPLITUD"""
+        features = extraer_features("Todo sobre el sistema cardiovascular")
+        assert len(features) == len(FEATURES_AMPLITUD)
+        assert features[FEATURES_AMPLITUD.index("patron_ultra_amplio")] == 1
+
+class TestReformulacion:
+
+    def test_accent_insensitive_match(self):
+        """'corazon' sin acento usa las reformulaciones predefinidas de 'corazón'"""
+        mensaje = generar_reformulacion("estructura del corazon", "anatomía")
+        assert "Sistema de conducción: nodo SA" in mensaje
+        assert '"estructura del corazon"' in mensaje
+
+    def test_generic_reformulation(self):
+        """Órgano sin lista predefinida genera reformulaciones genéricas del dominio"""
+        mensaje = generar_reformulacion("todo sobre el intestino", "fisiología")
+        assert "Mecanismo de funcionamiento del intestino" in mensaje
+
+    def test_rendered_block_is_memoized(self):
+        """El bloque de sugerencias se reutiliza por (órgano, dominio)"""
+        generar_reformulacion("anatomía del hígado", "anatomía")
+        hits = _render_sugerencias.cache_info().hits
+        generar_reformulacion("anatomía completa del hígado", "anatomía")
+        assert _render_sugerencias.cache_info().hits == hits + 1
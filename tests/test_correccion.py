@@ -0,0 +1,49 @@
+import json
+import pytest
+from src.correccion import corregir_con_script, extraer_nota, parsear_script
+
+NOTA = """Fecha: 12/03/2025
+Dx: HAS descontrolada
+Plan: captopril 25 mg c/8
+Paciente con diabetis tipo 2"""
+
+def _script(*ediciones):
+    return "\n".join(json.dumps(dict(zip(("buscar", "reemplazar", "motivo"), e)), ensure_ascii=False)
+                     for e in ediciones)
+
+@pytest.fixture
+def script():
+    return _script(
+        ("HAS", "Hipertensión arterial sistémica", "Abreviatura no estándar"),
+        ("c/8", "VO cada 8 horas", "Falta vía de administración"),
+        ("diabetis", "diabetes", "Ortografía"),
+    )
+
+class TestCorreccionPorEdiciones:
+
+    def test_edits_applied_and_highlighted(self, script):
+        """Las ediciones se aplican en orden y se resaltan contra el original"""
+        correccion = corregir_con_script(NOTA, script)
+        assert correccion["ediciones"] == 3
+        assert "captopril 25 mg VO cada 8 horas" in correccion["corregida"]
+        assert "diabetes tipo 2" in correccion["corregida"]
+        assert "~~diabetis~~ **diabetes**" in correccion["response"]
+        assert "**Línea 2**" in correccion["response"]
+
+    @pytest.mark.parametrize("script", [
+        "## Errores Detectados\n1. HAS",
+        _script(("no está en la nota", "x", "")),
+        _script(("diabetis", "diabetes", ""), ("HAS", "Hipertensión", "")),
+        "",
+    ])
+    def test_invalid_script_falls_back(self, script):
+        """Texto libre, fragmentos inexistentes o fuera de orden invalidan el script"""
+        assert corregir_con_script(NOTA, script) is None
+
+    def test_no_errors_keeps_note(self):
+        correccion = corregir_con_script(NOTA, '{"sin_errores": true}')
+        assert correccion["corregida"] == NOTA
+        assert parsear_script('{"sin_errores": true}') == []
+
+    def test_command_prefix_removed(self):
+        assert extraer_nota("Corregir nota médica: " + NOTA) == NOTA
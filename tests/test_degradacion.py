@@ -0,0 +1,73 @@
+import pytest
+from src.degradacion import (ControlDegradacion, ProveedorDegradado, MAX_TOKENS_NORMAL,
+                             NIVEL_CACHE, NIVEL_RECHAZO, NIVEL_RECORTE)
+
+class Reloj:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+@pytest.fixture
+def control(reloj):
+    return ControlDegradacion(ventana_s=60, enfriamiento_s=10, max_tokens=4000, activa=True, reloj=reloj)
+
+def _registrar(control, exitos, errores):
+    for _ in range(exitos):
+        control.registrar(True)
+    for _ in range(errores):
+        control.registrar(False)
+
+class TestControlDegradacion:
+
+    def test_levels_follow_error_rate_and_recover_stepwise(self, control, reloj):
+        """Sube de inmediato con la tasa de errores y baja un escalón por enfriamiento"""
+        _registrar(control, 7, 3)
+        assert control.nivel == NIVEL_RECORTE
+        assert control.max_tokens() == 4000
+        assert not control.permite_reintentos()
+        _registrar(control, 0, 30)
+        assert control.nivel == NIVEL_RECHAZO
+        assert not control.permite_partes()
+
+        reloj.t += 61
+        niveles = []
+        for _ in range(5):
+            niveles.append(control.nivel)
+            reloj.t += 10
+        assert niveles == [3, 2, 1, 0, 0]
+        assert control.max_tokens() == MAX_TOKENS_NORMAL
+
+    def test_cache_then_reject_with_eta(self, control, reloj):
+        """En nivel cache se sirve una pregunta casi igual; sin coincidencia en rechazo → ETA"""
+        pregunta = "¿Cuál es el mecanismo de acción de la metformina?"
+        control.guardar(pregunta, "farmacología", None, "Activa la AMPK.")
+        control.guardar("Nota: paciente con metformina 850 mg", "análisis clínico", "valoracion", "Valoración")
+        assert control.admitir(pregunta, "farmacología", None) is None
+
+        _registrar(control, 3, 7)
+        assert control.nivel == NIVEL_CACHE
+        respuesta = control.admitir("cual es el mecanismo de accion de la metformina", "farmacología", None)
+        assert respuesta["response"].endswith("Activa la AMPK.")
+        assert "Servicio saturado" in respuesta["response"]
+        assert control.admitir("¿Qué es la insulina?", "farmacología", None) is None
+
+        _registrar(control, 0, 40)
+        with pytest.raises(ProveedorDegradado) as error:
+            control.admitir("Nota: paciente con metformina 850 mg", "análisis clínico", "valoracion")
+        # Los errores salen de la ventana en ~60 s, más el enfriamiento
+        assert 60 <= error.value.retry_after <= 72
+        assert control.get_stats()["rechazadas"] == 1
+
+    def test_queue_depth_degrades_without_errors(self, reloj):
+        stats = {"en_cola": 0, "max_cola": 2}
+        control = ControlDegradacion(cola=lambda: stats, activa=True, reloj=reloj)
+        assert control.nivel == 0
+        stats["en_cola"] = 2
+        assert control.nivel == 2
+        assert control.get_stats()["nombre"] == "sin_partes"
@@ -0,0 +1,67 @@
+import time
+import pytest
+from src.dosis import CalculadoraDosis
+
+@pytest.fixture
+def calculadora():
+    return CalculadoraDosis()
+
+class TestCalculadoraDosis:
+
+    def test_mg_kg_per_dose(self, calculadora):
+        """Paracetamol 10-15 mg/kg/dosis en 20 kg → 200-300 mg cada 6 h, con fuente citada"""
+        respuesta = calculadora.responder("calcular dosis de paracetamol para niño de 20 kg y 5 años")
+        assert "| Por dosis | 200 mg | 300 mg |" in respuesta
+        assert "cada 6 h" in respuesta
+        assert "Harriet Lane" in respuesta and calculadora.version in respuesta
+
+    def test_mg_kg_per_day_divided(self, calculadora):
+        """Amoxicilina 25-50 mg/kg/día dividida c/8 h, peso con coma decimal"""
+        datos = calculadora.interpretar("dosis por peso de amoxicilina, paciente de 12,5 kg")
+        assert datos["farmaco"] == "amoxicilina" and datos["peso_kg"] == 12.5
+        calculo = calculadora.calcular("amoxicilina", peso_kg=datos["peso_kg"])
+        assert calculo["tomas_dia"] == 3
+        assert calculo["diaria_max_mg"] == pytest.approx(625)
+
+    def test_maximum_dose_cap(self, calculadora):
+        """En adultos la dosis por peso se limita a la dosis máxima de la tabla"""
+        calculo = calculadora.calcular("ibuprofeno", peso_kg=80)
+        assert calculo["dosis_max_mg"] == 400
+        assert calculo["limitada_por_maximo"]
+
+    @pytest.mark.parametrize("question", [
+        "calcular dosis de warfarina para paciente de 70 kg",
+        "calcular dosis de paracetamol e ibuprofeno 20 kg",
+        "calcular dosis de vancomicina 70 kg con TFG 30",
+        "cálculo de dosis de ibuprofeno en lactante de 4 meses 6 kg",
+        "calcular dosis de amoxicilina",
+        "dosis por peso de ibuprofeno niño peso 44 libras",
+        "dosis de paracetamol para niño de 44 lb y 5 años",
+        "dosis de paracetamol para recién nacido peso 3500 g",
+        "calcular dosis de ibuprofeno para recien nacido de 3 kg de 10 dias",
+        "dosis de ibuprofeno para neonato de 3 kg",
+        "dosis de ibuprofeno para niño de 20 kg",
+    ])
+    def test_fallback_to_llm(self, calculadora, question):
+        """
+        Fármaco desconocido, varios fármacos, ajuste renal, edad mínima (también
+        en días o recién nacido), edad desconocida con edad mínima, sin peso o
+        peso sin kg → LLM
+        """
+        assert calculadora.responder(question) is None
+        assert calculadora.get_stats()["fallback"] == 1
+
+    def test_neonatal_age_and_kg_label(self, calculadora):
+        """Edad en días o semanas y "recién nacido" se entienden; "peso: 3 kg" es válido"""
+        assert calculadora.interpretar("lactante de 3 semanas")["edad_meses"] == pytest.approx(21 / 30.4)
+        assert calculadora.interpretar("neonato de 10 dias")["edad_meses"] == pytest.approx(10 / 30.4)
+        respuesta = calculadora.responder("dosis de paracetamol para recién nacido, peso: 3 kg")
+        assert "**Paciente**: 3 kg · recién nacido" in respuesta
+
+    def test_local_answer_is_fast(self, calculadora):
+        """Casos comunes se resuelven en menos de 1 ms"""
+        calculadora.responder("calcular dosis de paracetamol para paciente de 20 kg")
+        start = time.perf_counter()
+        for _ in range(100):
+            calculadora.responder("calcular dosis de paracetamol para paciente de 20 kg")
+        assert (time.perf_counter() - start) / 100 < 0.001
@@ -0,0 +1,77 @@
+import gzip
+import pytest
+from flask import Flask, request
+from src import estaticos
+
+PAGINA = """<!DOCTYPE html>
+<html>
+<!-- comentario -->
+<head>
+    <style>
+        /* tema */
+        .a   :hover { color:   red ; }
+    </style>
+</head>
+<body>
+    <strong>Hola</strong>   <em>mundo</em>
+    <script>
+        // comentario de línea
+        const url = 'http://x.y';
+        const html = `<b>uno</b>
+            dos`;
+
+        if (url) { console.log(html); }
+    </script>
+</body>
+</html>
+"""
+
+@pytest.fixture
+def variantes(tmp_path, monkeypatch):
+    fuente = tmp_path / "pagina.html"
+    fuente.write_text(PAGINA, encoding="utf-8")
+    variantes = estaticos.construir(str(fuente), str(tmp_path / "dist"))
+    monkeypatch.setattr(estaticos, "_actuales", variantes)
+    return fuente, variantes
+
+class TestEstaticos:
+
+    def test_minify_keeps_template_literals_and_inline_spacing(self):
+        minificada = estaticos.minificar(PAGINA)
+        assert "comentario" not in minificada and "tema" not in minificada
+        assert ".a :hover{color:red}" in minificada
+        assert "<strong>Hola</strong> <em>mundo</em>" in minificada
+        assert "const html = `<b>uno</b>\n            dos`;\nif (url)" in minificada
+        assert "const url = 'http://x.y';" in minificada
+
+    def test_saved_variants_reload_until_source_changes(self, variantes, tmp_path):
+        fuente, construidas = variantes
+        leidas = estaticos._leer(str(fuente), str(tmp_path / "dist"))
+        assert leidas == construidas
+        assert gzip.decompress(leidas["gzip"].cuerpo) == leidas["identity"].cuerpo
+        fuente.write_text(PAGINA + "<!-- v2 -->\n", encoding="utf-8")
+        assert estaticos._leer(str(fuente), str(tmp_path / "dist")) is None
+
+    def test_response_negotiates_encoding_and_revalidates(self, variantes):
+        _, construidas = variantes
+        app = Flask(__name__)
+        with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            respuesta = estaticos.respuesta(request)
+        assert respuesta.headers["Content-Encoding"] == "gzip" and respuesta.headers["Vary"] == "Accept-Encoding"
+        assert respuesta.get_data() == construidas["gzip"].cuerpo
+        with app.test_request_context(headers={"If-None-Match": respuesta.headers["ETag"], "Accept-Encoding": "gzip"}):
+            assert estaticos.respuesta(request).status_code == 304
+        with app.test_request_context():
+            respuesta = estaticos.respuesta(request)
+        assert "Content-Encoding" not in respuesta.headers and respuesta.headers["ETag"] == f'"{construidas["identity"].etag}"'
+
+    def test_local_scripts_are_inlined_and_tracked(self, tmp_path):
+        fuente = tmp_path / "pagina.html"
+        script = tmp_path / "render.js"
+        fuente.write_text('<body><script src="render.js"></script><script src="cdn.js"></script></body>', encoding="utf-8")
+        script.write_text("/*\n * cabecera\n */\nfunction render() {}\n", encoding="utf-8")
+        pagina = estaticos.construir(str(fuente), str(tmp_path / "dist"))["identity"].cuerpo.decode("utf-8")
+        assert '<script src="render.js">' not in pagina and "<script>function render() {}</script>" in pagina
+        assert '<script src="cdn.js"></script>' in pagina
+        script.write_text("function render() { return 1; }\n", encoding="utf-8")
+        assert estaticos._leer(str(fuente), str(tmp_path / "dist")) is None
@@ -0,0 +1,80 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from src import fair
+from src.fair import ClienteExcedido, PlanificadorJusto, identificar_cliente
+
+def _planificador(**kwargs):
+    opciones = dict(max_concurrentes=1, max_cola=10, espera_max=5, max_por_cliente=1,
+                    cola_por_cliente=5, ventana_s=60, max_por_ventana=100)
+    opciones.update(kwargs)
+    return PlanificadorJusto("generacion", **opciones)
+
+def _esperar(condicion, limite=5):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "el planificador no alcanzó el estado esperado"
+        time.sleep(0.001)
+
+def _en_hilo(planificador, cliente, orden, liberar, clase="ip"):
+    """Lanza una petición y espera a que esté en curso o en cola"""
+    stats = planificador.get_stats()
+    antes = stats["en_curso"] + stats["en_cola"]
+    def ejecutar():
+        with planificador.turno(cliente, clase):
+            orden.append(cliente)
+            liberar.wait()
+    hilo = threading.Thread(target=ejecutar)
+    hilo.start()
+    _esperar(lambda: sum(planificador.get_stats()[k] for k in ("en_curso", "en_cola")) > antes)
+    return hilo
+
+class TestPlanificadorJusto:
+
+    def test_other_client_not_stuck_behind_burst(self):
+        """Un cliente con ráfaga en cola no adelanta a quien llega después"""
+        planificador = _planificador()
+        orden, liberar = [], threading.Event()
+        hilos = [_en_hilo(planificador, c, orden, liberar) for c in ("a", "a", "a", "b")]
+        liberar.set()
+        for h in hilos:
+            h.join()
+        assert orden == ["a", "b", "a", "a"]
+
+    def test_client_over_share_rejected_fast(self):
+        planificador = _planificador(max_concurrentes=2, max_por_cliente=1, cola_por_cliente=0)
+        liberar = threading.Event()
+        hilo = _en_hilo(planificador, "a", [], liberar)
+        with pytest.raises(ClienteExcedido) as error:
+            planificador.entrar("a")
+        assert planificador.get_stats()["en_cola"] == 0
+        assert error.value.retry_after > 0
+        with planificador.turno("b"):
+            pass
+        liberar.set()
+        hilo.join()
+
+    def test_sliding_window_and_class_stats(self):
+        planificador = _planificador(max_por_ventana=2, ventana_s=30)
+        for _ in range(2):
+            with planificador.turno("a", "api"):
+                pass
+        with pytest.raises(ClienteExcedido) as error:
+            planificador.entrar("a", "api")
+        assert 0 < error.value.retry_after <= 31
+        clases = planificador.get_stats()["clases"]
+        assert clases["api"]["atendidas"] == 2
+        assert clases["api"]["rechazadas"] == 1
+
+    def test_forwarded_for_only_trusted_with_proxy_hops(self, monkeypatch):
+        app = Flask(__name__)
+        cabeceras = {"X-Forwarded-For": "1.1.1.1, 2.2.2.2, 3.3.3.3"}
+        with app.test_request_context(headers=cabeceras, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+            from flask import request
+            monkeypatch.setattr(fair, "TRUST_PROXY_HOPS", 0)
+            assert identificar_cliente(request)[0] == "ip:10.0.0.1"
+            monkeypatch.setattr(fair, "TRUST_PROXY_HOPS", 2)
+            assert identificar_cliente(request)[0] == "ip:2.2.2.2"
+            monkeypatch.setattr(fair, "TRUST_PROXY_HOPS", 5)
+            assert identificar_cliente(request)[0] == "ip:10.0.0.1"
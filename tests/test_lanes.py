@@ -0,0 +1,60 @@
+import threading
+import time
+import pytest
+from src.lanes import Carril, CarrilSaturado
+
+@pytest.fixture
+def carril():
+    return Carril("generacion", max_concurrentes=2, max_cola=1, espera_max=5)
+
+def _ocupar(carril, liberar, n):
+    """Abre `n` turnos en hilos que se mantienen hasta `liberar`"""
+    def turno():
+        with carril.turno():
+            liberar.wait()
+    hilos = [threading.Thread(target=turno) for _ in range(n)]
+    for h in hilos:
+        h.start()
+    time.sleep(0.05)
+    return hilos
+
+class TestCarril:
+
+    def test_excess_over_queue_rejected_immediately(self, carril):
+        """Lleno con cola llena: se rechaza sin esperar"""
+        liberar = threading.Event()
+        hilos = _ocupar(carril, liberar, 3)
+        stats = carril.get_stats()
+        assert (stats["en_curso"], stats["en_cola"]) == (2, 1)
+
+        inicio = time.perf_counter()
+        with pytest.raises(CarrilSaturado):
+            with carril.turno():
+                pass
+        assert time.perf_counter() - inicio < 0.05
+
+        liberar.set()
+        for h in hilos:
+            h.join()
+        stats = carril.get_stats()
+        assert (stats["atendidas"], stats["rechazadas"], stats["en_curso"]) == (3, 1, 0)
+        assert stats["max_cola_observada"] == 1
+
+    def test_independent_lanes(self, carril):
+        """Un carril de generación lleno no retrasa al carril rápido"""
+        rapido = Carril("rapido", max_concurrentes=1, max_cola=8)
+        liberar = threading.Event()
+        hilos = _ocupar(carril, liberar, 3)
+        inicio = time.perf_counter()
+        with rapido.turno():
+            pass
+        assert time.perf_counter() - inicio < 0.01
+        liberar.set()
+        for h in hilos:
+            h.join()
+
+    def test_slot_released_on_error(self, carril):
+        with pytest.raises(ValueError):
+            with carril.turno():
+                raise ValueError()
+        assert carril.get_stats()["en_curso"] == 0
@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from src.mapreduce import MAP_MAX_PARALELO, MAX_FRAGMENTOS, MapReduceNotas, dividir_en_fragmentos
+from src.tokens import estimar_tokens
+
+SECCION = "evolución estable, sin datos de alarma. " * 40
+
+NOTA = "\n".join(f"{encabezado}\n{SECCION}" for encabezado in (
+    "Motivo de consulta:", "Padecimiento actual:", "Exploración física:",
+    "Impresión diagnóstica:", "Plan:"
+)) * 4
+
+class FakeClient:
+    """Cliente sin red: cada resumen tarda `delay` segundos"""
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def generate_chunk(self, prompt, domain, max_tokens=1500):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return "resumen breve"
+
+@pytest.fixture
+def mapreduce():
+    return MapReduceNotas(FakeClient(), umbral_tokens=1000, tokens_fragmento=1200)
+
+class TestMapReduce:
+
+    def test_fragments_start_at_section_headers(self):
+        """Los fragmentos respetan los encabezados y el límite de tokens"""
+        fragmentos = dividir_en_fragmentos(NOTA, max_tokens=1200)
+        assert len(fragmentos) > 1
+        assert all(estimar_tokens(f) <= 1200 for f in fragmentos)
+        assert all(f.lower().startswith(("motivo", "padecimiento", "exploración", "impresión", "plan"))
+                   for f in fragmentos)
+        assert "".join("".join(fragmentos).split()) == "".join(NOTA.split())
+
+    def test_never_more_than_max_fragments(self, mapreduce):
+        """Secciones de 0.55× el límite no se empacan de a dos: se unen hasta MAX_FRAGMENTOS"""
+        seccion = "x" * int(2500 * 4 * 0.55)
+        nota = "\n".join(f"Plan:\n{seccion}" for _ in range(40))
+        mapreduce.tokens_fragmento = 2500
+        resultado = mapreduce.condensar(nota, "análisis clínico")
+        assert resultado["etapas"]["map"]["fragmentos"] <= MAX_FRAGMENTOS
+
+    def test_only_long_notes_for_final_commands(self, mapreduce):
+        assert mapreduce.aplica(NOTA, "valoracion")
+        assert not mapreduce.aplica(NOTA, "elaboracion_nota")
+        assert not mapreduce.aplica("Fecha: hoy\nPlan: reposo", "valoracion")
+
+    def test_map_runs_concurrently_and_reports_stages(self, mapreduce):
+        inicio = time.perf_counter()
+        resultado = mapreduce.condensar(NOTA, "análisis clínico")
+        elapsed = time.perf_counter() - inicio
+        etapas = resultado["etapas"]
+        rondas = -(-etapas["map"]["fragmentos"] // MAP_MAX_PARALELO)
+        assert mapreduce.client.max_active == min(etapas["map"]["fragmentos"], MAP_MAX_PARALELO) > 1
+        assert elapsed < 0.1 * (rondas + 1.5)
+        assert etapas["reduce"]["tokens_entrada"] < etapas["entrada"]["tokens"]
+        assert etapas["map"]["tokens_entrada"] > etapas["entrada"]["tokens"]
+
+    def test_map_concurrency_is_bounded(self):
+        """Una nota larga ocupa un solo turno: no más de max_paralelo llamadas a la vez"""
+        mapreduce = MapReduceNotas(FakeClient(delay=0.02), umbral_tokens=1000, tokens_fragmento=1200, max_paralelo=2)
+        resultado = mapreduce.condensar(NOTA, "análisis clínico")
+        assert resultado["etapas"]["map"]["fragmentos"] > 2
+        assert mapreduce.client.max_active == 2
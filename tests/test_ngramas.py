@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from src import ngramas
+from src.ngramas import ClasificadorNgramas, Sombra, entrenar
+from src.wrapper import Result
+
+MUESTRAS = [
+    ("corazón", "cardiología"), ("arritmia", "cardiología"), ("infarto", "cardiología"),
+    ("riñón", "nefrología"), ("glomérulo", "nefrología"), ("diálisis", "nefrología"),
+    ("metformina", "farmacología"), ("losartán", "farmacología"),
+]
+
+@pytest.fixture
+def modelo(tmp_path, monkeypatch):
+    path = str(tmp_path / "ngramas.npy")
+    entrenar(MUESTRAS, path)
+    clasificador = ClasificadorNgramas(path)
+    monkeypatch.setattr(ngramas, "_modelo", clasificador)
+    monkeypatch.setattr(ngramas, "_modelo_cargado", True)
+    return clasificador
+
+class TestNgramas:
+
+    def test_accent_and_typo_insensitive(self, modelo):
+        assert modelo.clasificar("¿Qué es una ARRITMIA cardiaca?")[0] == "cardiología"
+        assert modelo.clasificar("dialisis en enfermedad renal")[0] == "nefrología"
+        assert modelo.clasificar("dosis de losartan")[0] == "farmacología"
+        assert modelo.desempatar("infarto agudo", ["nefrología", "cardiología"]) == "cardiología"
+
+    def test_batch_matches_single(self, modelo):
+        """Los n-gramas no cruzan de una pregunta a otra; vacías incluidas"""
+        preguntas = ["corazón", "", "riñón poliquístico", "a", "metformina en diabetes"] * 60
+        lote = modelo.puntuar_lote(preguntas)
+        assert np.allclose(lote, np.stack([modelo.puntuar(p) for p in preguntas]), atol=1e-3)
+        assert [d for d, _ in modelo.clasificar_lote(preguntas)] == [modelo.clasificar(p)[0] for p in preguntas]
+
+    def test_shadow_reports_agreement(self, modelo, tmp_path):
+        """Sólo cuenta aprobadas por keywords y reformuladas; anota las aprobadas para reentrenar"""
+        log = tmp_path / "aprobadas.jsonl"
+        sombra = Sombra(log_path=str(log))
+        sombra.registrar("arritmia ventricular", {"result": Result.APPROVED, "domain": "cardiología", "confidence": 0.8})
+        sombra.registrar("glomérulo renal", {"result": Result.APPROVED, "domain": "anatomía", "confidence": 0.8})
+        sombra.registrar("nota", {"result": Result.APPROVED, "domain": "análisis clínico", "note_analysis": True})
+        stats = sombra.get_stats()
+        assert (stats["comparadas"], stats["concordancia"]) == (2, 0.5)
+        assert stats["confusiones"][0] == {"reglas": "anatomía", "modelo": "nefrología", "veces": 1}
+        assert len(log.read_text(encoding="utf-8").splitlines()) == 2
+
+    def test_shadow_batch_counts_like_single(self, modelo, tmp_path):
+        resultados = [("arritmia ventricular", {"result": Result.APPROVED, "domain": "cardiología", "confidence": 0.8}),
+                      ("glomérulo renal", {"result": Result.APPROVED, "domain": "anatomía", "confidence": 0.8}),
+                      ("riñón", {"result": Result.REFORMULATE}),
+                      ("invertir", {"result": Result.REJECTED})]
+        una, lote = Sombra(log_path=str(tmp_path / "una.jsonl")), Sombra(log_path=str(tmp_path / "lote.jsonl"))
+        for pregunta, resultado in resultados:
+            una.registrar(pregunta, resultado)
+        lote.registrar_lote(*zip(*resultados))
+        assert lote.get_stats() == una.get_stats()
+        assert (tmp_path / "lote.jsonl").read_text(encoding="utf-8") == (tmp_path / "una.jsonl").read_text(encoding="utf-8")
+
+    def test_deferred_shadow_counts_like_single(self, modelo, tmp_path):
+        """encolar no evalúa el modelo en la petición; vaciar cuenta igual que registrar"""
+        resultados = [("arritmia ventricular", {"result": Result.APPROVED, "domain": "cardiología", "confidence": 0.8}),
+                      ("riñón", {"result": Result.REFORMULATE}),
+                      ("invertir", {"result": Result.REJECTED})]
+        una, diferida = Sombra(log_path=""), Sombra(log_path="")
+        for pregunta, resultado in resultados:
+            una.registrar(pregunta, resultado)
+            diferida.encolar(pregunta, resultado)
+        assert diferida.get_stats()["pendientes"] == 2
+        diferida.vaciar()
+        assert {k: v for k, v in diferida.get_stats().items() if k != "pendientes"} == \
+            {k: v for k, v in una.get_stats().items() if k != "pendientes"}
@@ -0,0 +1,63 @@
+import pytest
+from src.nota_parser import parsear_nota, evaluar_componentes, revisar_nota, dividir_secciones
+
+NOTA = """Fecha: 12/03/2025 Hora: 10:30
+Servicio: Urgencias  Médico: Dra. Ruiz  Cédula Profesional: 1234567
+Nombre: Juan Pérez  Edad: 54 años  Sexo: masculino  Expediente: 88231
+Motivo de consulta: dolor torácico
+Padecimiento actual: inicia hace 2 horas con dolor opresivo retroesternal irradiado a brazo izquierdo y mandíbula,
+de intensidad 8/10, acompañado de diaforesis, náusea y disnea de medianos esfuerzos. Refiere episodios similares
+durante la última semana que cedían con el reposo. Niega síncope, palpitaciones o fiebre.
+Antecedentes: diabetes tipo 2 de 10 años de evolución e hipertensión arterial de 5 años. Alergias negadas. Tabaquismo positivo.
+Exploración física: TA: 150/90 mmHg FC: 104 lpm FR: 22 rpm Temp: 36.8 °C SatO2: 94%. Consciente, orientado.
+Impresión diagnóstica: síndrome coronario agudo (CIE-10 I21.9)
+Plan: ECG, troponinas. Ácido acetilsalicílico 300 mg VO dosis única. Atorvastatina 80 mg VO cada 24 horas. Pronóstico reservado. Firma."""
+
+@pytest.fixture
+def registro():
+    return parsear_nota(NOTA)
+
+class TestNotaParser:
+
+    def test_soap_sections(self):
+        """Encabezados SOAP de una letra y apartados con nombre"""
+        secciones, apartados = dividir_secciones("S: cefalea\nO: TA 120/80\nA: migraña\nP: reposo")
+        assert apartados == ["subjetivo", "objetivo", "analisis", "plan"]
+        assert secciones["analisis"] == "migraña"
+
+    def test_structured_record(self, registro):
+        """Signos vitales, identificadores y dosis extraídos de la nota"""
+        assert registro["signos_vitales"]["ta"] == "150/90"
+        assert registro["signos_vitales"]["sato2"] == "94"
+        assert registro["cedula"] == "1234567"
+        assert registro["expediente"] == "88231"
+        assert registro["cie10"] == ["I21.9"]
+        assert registro["paciente"]["edad"] == "54"
+        atorvastatina = [d for d in registro["dosis"] if d["farmaco"] == "atorvastatina"][0]
+        assert (atorvastatina["cantidad"], atorvastatina["via"], atorvastatina["intervalo_h"]) == ("80", "VO", 24)
+
+    def test_cie10_requires_diagnostic_context(self):
+        """B12 (vitamina) y T38.5 (temperatura) no cuentan como CIE-10"""
+        registro = parsear_nota("Exploración física: T38.5 °C\nPlan: vitamina B12 1 mg IM cada 24 horas")
+        assert registro["cie10"] == []
+        registro = parsear_nota("Nota de ingreso. Dx: E11.9, I10\nPlan: vitamina B12")
+        assert registro["cie10"] == ["E11.9", "I10"]
+
+    def test_present_and_missing_components(self, registro):
+        """La dosis única sin frecuencia deja incompleto el tratamiento farmacológico"""
+        presentes, faltantes = evaluar_componentes(registro)
+        nombres_presentes = [c for _, c, _ in presentes]
+        nombres_faltantes = [c for _, c, _ in faltantes]
+        assert "Cédula profesional" in nombres_presentes
+        assert "Signos vitales completos (TA, FC, FR, Temp, SatO₂)" in nombres_presentes
+        assert "Tratamiento farmacológico (dosis, vía, frecuencia)" in nombres_faltantes
+        assert "Antecedentes familiares" in nombres_faltantes
+
+    def test_compact_prompt(self):
+        """El proveedor recibe el checklist resuelto y sólo análisis/plan"""
+        revision = revisar_nota("revisar nota\n" + NOTA)
+        assert revision["componentes"].startswith("## ✅ Componentes Presentes")
+        assert "## ❌ Componentes Faltantes" in revision["componentes"]
+        assert "Juan Pérez" not in revision["prompt"]
+        assert "### Plan" in revision["prompt"]
+        assert revision["tokens_prompt"] < revision["tokens_nota"]
@@ -0,0 +1,42 @@
+import pickle
+import pytest
+from src.almacen import clave_respuesta
+from src.ortografia import IndiceOrtografico, damerau
+from src.wrapper import Result, Wrapper
+
+@pytest.fixture
+def indice():
+    return IndiceOrtografico.desde_diccionarios(
+        {"keywords": {"gastroenterología": ["hígado", "cirrosis"], "cardiología": ["arteria", "dolor torácico"]}},
+        {"farmacos": {"losartan": {"nombre": "Losartán", "sinonimos": ["cozaar"]}}},
+    )
+
+class TestOrtografia:
+
+    def test_accents_and_typos_are_corrected(self, indice):
+        assert indice.corregir("que es el higado").texto == "que es el hígado"
+        assert indice.corregir("dosis de espironolactna").cambios == (("espironolactna", "espironolactona"),)
+        assert indice.corregir("amoxicilna y cirosis").texto == "amoxicilina y cirrosis"
+        assert damerau("amoxicilna", "amoxicilina", 2) == 1
+
+    def test_common_words_are_not_overcorrected(self, indice):
+        """Formas del vocabulario, palabras cortas, otra primera letra y flexiones quedan igual"""
+        for texto in ("color de la piel", "presión arterial", "dolor de cabeza", "losartan 50 mg", "los datos"):
+            assert indice.corregir(texto).cambios == ()
+
+    def test_valid_flexions_are_not_swapped_at_distance_two(self):
+        """Otra terminación válida queda igual; un error a mitad de palabra se corrige"""
+        indice = IndiceOrtografico(["fisiológico", "gastroenterología"])
+        assert indice.corregir("fisiologia renal").cambios == ()
+        assert indice.corregir("gastrentrologia").texto == "gastroenterología"
+
+    def test_index_survives_pickle_with_own_cache(self, indice):
+        copia = pickle.loads(pickle.dumps(indice))
+        assert copia.buscar("hgiado") == indice.buscar("hígado")
+        assert copia._buscar is not indice._buscar
+
+    def test_wrapper_and_cache_key_use_corrected_text(self):
+        resultado = Wrapper().classify("dosis de espironolactna")
+        assert (resultado["result"], resultado["domain"]) == (Result.APPROVED, "farmacología")
+        assert clave_respuesta("dosis de espironolactna", "farmacología") == \
+            clave_respuesta("Dosis de espironolactona?", "farmacología")
@@ -0,0 +1,40 @@
+import time
+import pytest
+from src.planner import QueryPlanner
+
+class FakeClient:
+    """Cliente sin red: cada parte tarda `delay` segundos"""
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.budgets = []
+
+    def generate_chunk(self, prompt, domain, max_tokens=1500):
+        self.budgets.append(max_tokens)
+        time.sleep(self.delay)
+        return f"contenido ({domain})"
+
+@pytest.fixture
+def planner():
+    return QueryPlanner(FakeClient())
+
+class TestQueryPlanner:
+
+    def test_specific_question_not_planned(self, planner):
+        """Pregunta específica no se expande"""
+        assert planner.plan("Irrigación arterial del hueso coxal", "anatomía") is None
+
+    def test_broad_question_uses_reformulations(self, planner):
+        """Pregunta amplia se divide en las reformulaciones predefinidas"""
+        subquestions = planner.plan("Estructura anatómica del corazón", "anatomía")
+        assert len(subquestions) == 5
+        assert subquestions[1].startswith("Sistema de conducción")
+
+    def test_parts_generated_concurrently(self, planner):
+        """Latencia total cercana a una sola parte, con presupuesto pequeño por parte"""
+        subquestions = planner.plan("Estructura anatómica del corazón", "anatomía")
+        start = time.perf_counter()
+        answer = planner.answer("Estructura anatómica del corazón", "anatomía", subquestions)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.2 * 2.5
+        assert answer.index("## 1.") < answer.index("## 5.")
+        assert max(planner.client.budgets) <= 1000
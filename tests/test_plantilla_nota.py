@@ -0,0 +1,47 @@
+import json
+import pytest
+from src.plantilla_nota import RenderizadorNota, renderizar_bloque, renderizar_respuesta, BLOQUES_NOTA, FALTANTE
+
+CAMPOS = {
+    "fecha": "12/03/2025", "hora": "10:30", "servicio": "Urgencias", "medico": "Dra. Ruiz", "cedula": "1234567",
+    "nombre": "Juan Pérez", "edad": 54, "sexo": "M", "expediente": "88231",
+    "motivo": "Dolor en el pecho", "dx_principal": "Síndrome coronario agudo (I21.9)",
+    "dx_diferencial": ["Disección aórtica", "TEP"], "pronostico": "Reservado",
+}
+
+def _ndjson(campos):
+    return "\n".join(json.dumps({k: v}, ensure_ascii=False) for k, v in campos.items()) + "\n"
+
+@pytest.fixture
+def renderizador():
+    return RenderizadorNota()
+
+class TestRenderizadorNota:
+
+    def test_blocks_stream_as_fields_arrive(self, renderizador):
+        """El bloque de datos del documento sale en cuanto llega la cédula"""
+        texto = _ndjson({k: CAMPOS[k] for k in ("fecha", "hora", "servicio", "medico", "cedula")})
+        bloques = [b for i in range(0, len(texto), 5) for b in renderizador.feed(texto[i:i + 5])]
+        assert len(bloques) == 1
+        assert "Cédula Profesional: 1234567" in bloques[0]
+
+    def test_missing_fields_filled_on_finish(self, renderizador):
+        """Al cerrar el stream todos los bloques se completan con [COMPLETAR]"""
+        bloques = list(renderizador.stream([_ndjson(CAMPOS), "__STREAM_DONE__"]))
+        nota = "".join(bloques)
+        assert len(bloques) == len(BLOQUES_NOTA)
+        assert "- Disección aórtica\n- TEP" in nota
+        assert f"Abdomen: {FALTANTE}" in nota
+        assert "Gineco-obstétricos: No aplica" in nota
+
+    @pytest.mark.parametrize("sexo, gineco", [
+        ("M", "No aplica"), ("Masculino", "No aplica"), ("hombre", "No aplica"),
+        ("Mujer", FALTANTE), ("F", FALTANTE), ("", FALTANTE),
+    ])
+    def test_gineco_only_omitted_for_men(self, sexo, gineco):
+        indice = next(i for i, b in enumerate(BLOQUES_NOTA) if "{gineco}" in b)
+        assert f"Gineco-obstétricos: {gineco}" in renderizar_bloque(indice, {"sexo": sexo})
+
+    def test_non_field_response_passthrough(self):
+        """Si el modelo no responde en formato de campos (p. ej. error) se muestra tal cual"""
+        assert renderizar_respuesta("⚠️ **Error del sistema**") == "⚠️ **Error del sistema**"
@@ -0,0 +1,53 @@
+import pytest
+from src.secciones import DivisorSecciones, ahorro_entrada, construir_prompt, titulos_de
+
+NOTA = "Fecha: 12/03/2025\nPaciente masculino de 54 años con dolor torácico opresivo. " * 20
+
+RESPUESTA = """## 📋 Resumen del Caso
+Masculino de 54 años con dolor torácico.
+
+## 🎯 Hipótesis diagnósticas
+1. Síndrome coronario agudo
+```
+## no es encabezado
+```
+
+## 🔬 Estudios Sugeridos
+- ECG
+"""
+
+@pytest.fixture
+def divisor():
+    return DivisorSecciones(titulos_de("valoracion"))
+
+class TestDivisorSecciones:
+
+    def test_sections_emitted_as_they_complete(self, divisor):
+        """Cada sección sale cuando empieza la siguiente; el resto al cerrar"""
+        emitidas = []
+        for i in range(0, len(RESPUESTA), 7):
+            emitidas += list(divisor.feed(RESPUESTA[i:i + 7]))
+        assert [s["index"] for s in emitidas] == [0, 1]
+        emitidas += list(divisor.finish())
+        assert emitidas[1]["title"] == "## 🎯 Hipótesis Diagnósticas"
+        assert "## no es encabezado" in emitidas[1]["content"]
+        assert emitidas[2]["content"] == "- ECG"
+        assert divisor.faltantes == ["## 💊 Abordaje Terapéutico", "## ⚠️ Signos de Alarma"]
+
+    def test_note_sent_once(self):
+        """La nota aparece una vez en el prompt único y se reporta el ahorro"""
+        prompt = construir_prompt(NOTA, "valoracion")
+        assert prompt.count(NOTA) == 1
+        assert all(t in prompt for t in titulos_de("valoracion"))
+        ahorro = ahorro_entrada(NOTA, "valoracion", "system " * 100, "system " * 50)
+        assert ahorro["llamadas_evitadas"] == 4
+        assert ahorro["tokens_ahorrados"] > ahorro["tokens_entrada_una_llamada"]
+
+    def test_stream_stops_at_end_signal(self, divisor):
+        secciones = list(divisor.stream(["## 📋 Resumen del Caso\nTexto", "__STREAM_DONE__", "basura"]))
+        assert secciones == [{"index": 0, "title": "## 📋 Resumen del Caso", "content": "Texto"}]
+
+    def test_truncation_signal_is_not_content(self, divisor):
+        """La señal de max_tokens marca la respuesta como truncada sin aparecer en el texto"""
+        secciones = list(divisor.stream(["## 📋 Resumen del Caso\nTexto", "__STREAM_TRUNCATED__", "__STREAM_DONE__"]))
+        assert secciones[0]["content"] == "Texto" and divisor.truncada
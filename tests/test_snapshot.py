@@ -0,0 +1,65 @@
+import json
+import os
+import pytest
+import threading
+from src import snapshot
+from src.wrapper import Wrapper
+
+@pytest.fixture
+def fuentes(tmp_path, monkeypatch):
+    """domains.json / prohibited.json en un directorio temporal"""
+    rutas = {"domains": tmp_path / "domains.json", "prohibited": tmp_path / "prohibited.json"}
+    rutas["domains"].write_text(json.dumps({"domains": ["cardiología"], "keywords": {"cardiología": ["corazón"]}}))
+    rutas["prohibited"].write_text(json.dumps({"terms": ["invertir"]}))
+    monkeypatch.setattr(snapshot, "FUENTES", {k: str(v) for k, v in rutas.items()})
+    monkeypatch.setattr(snapshot, "_actual", None)
+    monkeypatch.setattr(snapshot, "_firma_rechazada", None)
+    monkeypatch.setattr(snapshot, "_estado", dict(snapshot._estado, recargas=0, errores=0))
+    return rutas, str(tmp_path / "snapshot.pkl")
+
+class TestSnapshot:
+
+    def test_compiled_snapshot_matches_json(self, fuentes):
+        """Mismo contenido que los JSON, con tuplas en lugar de listas, y se guarda en disco"""
+        _, path = fuentes
+        datos = snapshot.cargar(path)
+        assert datos["domains"]["keywords"] == {"cardiología": ("corazón",)}
+        assert datos["prohibited"]["terms"] == ("invertir",)
+        assert os.path.exists(path)
+        assert snapshot.cargar(path) is datos
+
+    def test_stale_snapshot_is_rebuilt(self, fuentes, monkeypatch):
+        """Si cambia una fuente, la firma no coincide y se recompila desde el JSON"""
+        rutas, path = fuentes
+        snapshot.cargar(path)
+        rutas["prohibited"].write_text(json.dumps({"terms": ["invertir", "acciones"]}))
+        monkeypatch.setattr(snapshot, "_actual", None)
+        assert snapshot.cargar(path)["prohibited"]["terms"] == ("invertir", "acciones")
+
+    def test_hot_reload_validates_before_swapping(self, fuentes):
+        """Una versión inválida se descarta; la válida se publica y Wrapper la ve"""
+        rutas, path = fuentes
+        version = snapshot.cargar(path)["diccionarios"]
+        assert not snapshot.recargar(path=path)
+        rutas["prohibited"].write_text(json.dumps({"terms": ["Invertir", "bolsa"]}))
+        assert not snapshot.recargar(path=path)
+        assert snapshot.get_stats()["version"] == version
+        assert "mayúsculas" in snapshot.get_stats()["ultimo_error"]
+
+        rutas["prohibited"].write_text(json.dumps({"terms": ["invertir", "criptomonedas"]}))
+        assert snapshot.recargar(path=path)
+        estado = snapshot.get_stats()
+        assert estado["version"] != version and (estado["recargas"], estado["errores"]) == (1, 1)
+        assert Wrapper().prohibited["terms"] == ("invertir", "criptomonedas")
+
+    def test_reload_before_first_load_does_not_deadlock(self, fuentes):
+        """recargar() sin snapshot vigente carga con el lock ya tomado"""
+        _, path = fuentes
+        hilo = threading.Thread(target=snapshot.recargar, kwargs={"path": path}, daemon=True)
+        hilo.start()
+        hilo.join(timeout=10)
+        assert not hilo.is_alive()
+        assert snapshot.actual()["prohibited"]["terms"] == ("invertir",)
+
+    def test_wrappers_share_dictionaries(self):
+        assert Wrapper().domains is Wrapper().domains
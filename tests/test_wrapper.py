@@ -1,3 +1,6 @@
+import random
+import re
+import time
 import pytest
 from src.wrapper import Wrapper, Result
 
@@ -33,3 +36,88 @@ class TestWrapper:
         """Pregunta ambigua debe REFORMULAR"""
         result = wrapper.classify("¿Qué es la salud?")
         assert result["result"] == Result.REFORMULATE
+    
+    def test_note_correction_command(self, wrapper):
+        """"corregir nota" va a correccion_nota, no a revision_nota"""
+        result = wrapper.classify("Corregir nota médica: Dx HAS, captopril 25 mg c/8")
+        assert result["result"] == Result.APPROVED
+        assert result["special_command"] == "correccion_nota"
+    
+    def test_keyword_index_matches_plain_scan(self, wrapper, monkeypatch):
+        """El índice por trigramas encuentra lo mismo que `kw in texto`, en el mismo orden"""
+        textos = ["¿dónde se ubica la arteria braquial?", "infarto agudo de miocardio con arritmia",
+                  "dolor torácico y disnea " * 200, "xy"]
+        for texto in textos:
+            esperadas = [(d, kw) for d, kws in wrapper.domains["keywords"].items() for kw in kws if kw in texto]
+            assert wrapper._matched_keywords(texto) == esperadas
+            monkeypatch.setattr("src.wrapper.MAX_TRIGRAM_SCAN_CHARS", 0)
+            assert wrapper._matched_keywords(texto) == esperadas
+            monkeypatch.undo()
+    
+    def test_classify_many_matches_classify(self, wrapper):
+        """Mismos veredictos y en el mismo orden, con repetidas y más de un tramo"""
+        preguntas = ["¿Dónde se ubica la arteria braquial?", "", "Estoy triste, ¿qué hago?",
+                     "¿Qué es la salud?", "¿Dónde se ubica la arteria braquial?"] * 120
+        lote = list(wrapper.classify_many(preguntas))
+        assert lote == [wrapper.classify(p) for p in preguntas]
+        lote[0]["domain"] = "otro"
+        assert lote[4]["domain"] == "anatomía"
+
+MB = 1024 * 1024
+
+# Indicadores originales (regex) contra los que se valida el escáner lineal
+LEGACY_NOTE_REGEXES = [
+    r'\bfecha[:\s]', r'\bmotivo de consulta[:\s]', r'\bexploración física[:\s]',
+    r'\bimpresión diagnóstica[:\s]', r'\bplan[:\s]', r'\bedad[:\s]\s*\d+', r'\bvo\b.*\bcada\b',
+    r'\b\d+\s*mg\b', r'\b\d+\s*mmhg\b', r'\bfc[:\s]\s*\d+', r'\bta[:\s]\s*\d+/\d+'
+]
+FUZZ_TOKENS = ["fecha", ":", " ", "\n", "\t", "motivo de consulta", "exploración física",
+               "impresión diagnóstica", "plan", "edad", "vo", "cada", "mg", "MG", "mmhg", "fc",
+               "ta", "/", "1", "80", "x", "_", "é"]
+
+def _legacy_is_note(text):
+    return sum(1 for ind in LEGACY_NOTE_REGEXES if re.search(ind, text.lower())) >= 3
+
+def _elapsed(fn, text):
+    start = time.perf_counter()
+    result = fn(text)
+    return result, time.perf_counter() - start
+
+class TestNoteDetection:
+    
+    def test_note_indicators(self, wrapper):
+        """Tres indicadores bastan; "vo" y "cada" sólo cuentan en la misma línea"""
+        assert wrapper._is_medical_note("Fecha: hoy\nEdad: 45 años\nTA: 120/80 mmHg")
+        assert wrapper._is_medical_note("Plan: paracetamol 500 mg vo cada 8 h")
+        assert not wrapper._is_medical_note("Plan: paracetamol 500 mg vo\ncada 8 h")
+        assert not wrapper._is_medical_note("¿Qué es la tensión arterial?")
+        assert wrapper._is_medical_note("Fecha: 1\nDosis 500mg\nFC 80lpm")
+    
+    def test_matches_legacy_regexes(self, wrapper):
+        """El escáner lineal decide igual que los regex originales"""
+        rng = random.Random(31)
+        for _ in range(5000):
+            text = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 30)))
+            assert wrapper._is_medical_note(text) == _legacy_is_note(text), repr(text)
+    
+    def test_large_note_approved(self, wrapper):
+        """Nota de 1 MB con indicadores al inicio se detecta como nota"""
+        note = "Fecha: 01/01/2025\nEdad: 60 años\nFC: 80 lpm\n" + "evolución estable. " * (MB // 19)
+        result, elapsed = _elapsed(wrapper.classify, note)
+        assert result.get("note_analysis")
+        assert elapsed < 0.5
+    
+    @pytest.mark.parametrize("text", [
+        "vo " * (MB // 3),
+        "1" * MB,
+        ("edad: " + " " * 50) * (MB // 56),
+        "fechas " * (MB // 7),
+    ])
+    def test_adversarial_latency_flat(self, wrapper, text):
+        """Entradas adversariales de 1 MB cuestan lo mismo que 64 KB (tope de escaneo)"""
+        wrapper._is_medical_note(text[:64 * 1024])
+        _, small = _elapsed(wrapper._is_medical_note, text[:64 * 1024])
+        detected, large = _elapsed(wrapper._is_medical_note, text)
+        assert not detected
+        assert large < 0.1
+        assert large < small * 5 + 0.01